@@ -0,0 +1,690 @@
+"""
+性能基准测试脚本
+
+用法:
+    python benchmark.py render --pdf input.pdf --dpi 400 --pages 10
+    python benchmark.py batch --pdf input.pdf --dpi 200 --pages 32 --sizes 1,2,4,8
+    python benchmark.py upload --image scan.png --repeat 10
+    python benchmark.py load --image page.png --workers 1,2,4 --concurrency 16 --requests 200
+    python benchmark.py pipeline --dpis 200,300 --pages 20 --modes thread,process,batch --baseline last.json
+    python benchmark.py startup --image page.png --server
+    python benchmark.py documents --pages 40 --pages-per-doc 2 --modes thread,process
+    python benchmark.py search --pages 3000 --docs 10 --queries 200
+"""
+import argparse
+import base64
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+
+def _summary(name: str, samples: list) -> str:
+    """格式化每页耗时统计 (毫秒)"""
+    ms = [s * 1000 for s in samples]
+    return (f"{name:<12} 平均 {statistics.mean(ms):8.1f} ms/页  "
+            f"中位数 {statistics.median(ms):8.1f} ms/页  "
+            f"最大 {max(ms):8.1f} ms/页")
+
+
+def bench_render(args):
+    """对比 PNG 往返 与 零拷贝 两种页面渲染->OCR输入路径"""
+    import paddle_ocr
+
+    doc = fitz.open(args.pdf)
+    page_count = min(args.pages, len(doc))
+    before, after = [], []
+
+    for page_num in range(page_count):
+        page = doc.load_page(page_num)
+
+        # 旧路径: 渲染 -> PNG 编码 -> cv2.imdecode
+        t0 = time.perf_counter()
+        pix = page.get_pixmap(dpi=args.dpi)
+        img_bytes = pix.tobytes("png")
+        img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+        before.append(time.perf_counter() - t0)
+        del pix, img_bytes, img
+
+        # 新路径: 渲染 -> 直接包装像素缓冲区
+        t0 = time.perf_counter()
+        pix = paddle_ocr.render_page(page, args.dpi)
+        img = paddle_ocr.pixmap_to_ndarray(pix)
+        after.append(time.perf_counter() - t0)
+        del pix, img
+
+    doc.close()
+
+    print(f"页数: {page_count}, DPI: {args.dpi}, 灰度: {paddle_ocr.RENDER_GRAYSCALE}")
+    print(_summary("PNG往返", before))
+    print(_summary("零拷贝", after))
+    print(f"加速比: {statistics.mean(before) / statistics.mean(after):.2f}x")
+
+
+def bench_batch(args):
+    """测量不同跨页批量大小下的吞吐量 (页/秒)"""
+    import paddle_ocr
+
+    doc = fitz.open(args.pdf)
+    page_nums = list(range(min(args.pages, len(doc))))
+    doc.close()
+
+    # 预热: 避免首次推理的模型加载/图编译开销计入第一组结果
+    paddle_ocr.process_pages(args.pdf, page_nums[:1], args.dpi)
+
+    print(f"页数: {len(page_nums)}, DPI: {args.dpi}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        t0 = time.perf_counter()
+        for i in range(0, len(page_nums), size):
+            paddle_ocr.process_pages(args.pdf, page_nums[i:i + size], args.dpi)
+        elapsed = time.perf_counter() - t0
+        print(f"批量 {size:>3} 页: {len(page_nums) / elapsed:6.2f} 页/秒 ({elapsed:.1f} 秒)")
+
+
+def bench_upload(args):
+    """对比 base64-JSON 与 原始二进制 两种上传方式的解码耗时和峰值内存"""
+    import io
+    from ocr_upload import _read_into, decode_image_buffer
+
+    with open(args.image, "rb") as f:
+        raw = f.read()
+    data_url = "data:image/png;base64," + base64.b64encode(raw).decode("ascii")
+    json_body = json.dumps({"messages": [{"content": [{"type": "image_url",
+                                                       "image_url": {"url": data_url}}]}]}).encode("utf-8")
+    del data_url
+
+    def via_base64():
+        # 旧路径: JSON 解析 -> split(',') -> b64decode -> imdecode
+        url = json.loads(json_body)["messages"][0]["content"][0]["image_url"]["url"]
+        img_bytes = base64.b64decode(url.split(',')[1])
+        return cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+    def via_binary():
+        # 新路径: 请求体读入预分配缓冲区 -> 零拷贝 imdecode
+        return decode_image_buffer(_read_into(io.BytesIO(raw), len(raw)))
+
+    print(f"图片: {args.image} ({len(raw) / 1024 / 1024:.1f} MB), base64 JSON 请求体 "
+          f"{len(json_body) / 1024 / 1024:.1f} MB")
+    for name, fn in (("base64-JSON", via_base64), ("二进制上传", via_binary)):
+        samples = []
+        tracemalloc.start()
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            img = fn()
+            samples.append(time.perf_counter() - t0)
+            del img
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<12} 平均 {statistics.mean(samples) * 1000:8.1f} ms  "
+              f"峰值内存 {peak / 1024 / 1024:7.1f} MB")
+
+
+def _wait_for_server(base_url: str, timeout: float, path: str = "/health/ready", interval: float = 0.5):
+    """轮询 path 直到返回 200 (默认等待引擎加载并预热完成)"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(interval)
+    raise TimeoutError(f"服务在 {timeout} 秒内未就绪: {base_url}")
+
+
+def _run_load(base_url: str, body: bytes, concurrency: int, total: int):
+    """以固定并发数发送 total 个识别请求，返回 (请求/秒, 各请求耗时, 失败数)"""
+    def one_request(_):
+        req = urllib.request.Request(base_url + "/predict/paddleocr", data=body,
+                                     headers={"Content-Type": "application/json"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                ok = resp.status == 200 and json.loads(resp.read()).get("status") == "000"
+        except OSError:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one_request, range(total)))
+    elapsed = time.perf_counter() - t0
+    return total / elapsed, [t for t, _ in outcomes], sum(1 for _, ok in outcomes if not ok)
+
+
+def bench_load(args):
+    """并发压测 /predict/paddleocr，对比不同引擎工作进程数下的吞吐量 (请求/秒)"""
+    with open(args.image, "rb") as f:
+        body = json.dumps({"images": [base64.b64encode(f.read()).decode("utf-8")]}).encode("utf-8")
+
+    if args.url:
+        # 压测已在运行的服务
+        targets = [(None, args.url.rstrip("/"))]
+    else:
+        targets = [(int(w), f"http://127.0.0.1:{args.port}") for w in args.workers.split(",")]
+
+    print(f"并发数: {args.concurrency}, 请求数: {args.requests}")
+    for workers, base_url in targets:
+        proc = None
+        if workers is not None:
+            server = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_async_server.py")
+            proc = subprocess.Popen([sys.executable, server, "--workers", str(workers),
+                                     "--cpu-threads", str(args.cpu_threads), "--port", str(args.port)])
+        try:
+            _wait_for_server(base_url, args.startup_timeout)
+            # 预热: 每个工作进程至少处理一次请求
+            _run_load(base_url, body, args.concurrency, args.concurrency)
+            rps, latencies, failures = _run_load(base_url, body, args.concurrency, args.requests)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+        ms = sorted(t * 1000 for t in latencies)
+        label = f"{workers} 个工作进程" if workers is not None else base_url
+        print(f"{label:<16} {rps:7.2f} 请求/秒  "
+              f"中位数 {statistics.median(ms):8.1f} ms  "
+              f"P95 {ms[int(len(ms) * 0.95) - 1]:8.1f} ms  失败 {failures}")
+
+
+def _engine_startup(image_path: str, warmup: bool, runs: int) -> dict:
+    """(新进程中) 测量冷启动: 导入推理库、加载模型、预热，以及之后第一次和后续推理的耗时"""
+    from ocr_engine import LazyEngine, run_image
+
+    img = cv2.imread(image_path)
+    t0 = time.perf_counter()
+    from paddleocr import PaddleOCR
+    import_s = time.perf_counter() - t0
+    engine = LazyEngine(lambda: PaddleOCR(lang="ch"), warmup=warmup)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        engine.get()
+    status = engine.status()
+    latencies = []
+    for _ in range(runs + 1):
+        t0 = time.perf_counter()
+        run_image(engine.get(), img)
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "import_s": import_s,
+        "load_s": status["load_seconds"],
+        "warmup_s": status["warmup_seconds"] or 0.0,
+        "first_s": latencies[0],
+        "steady_s": statistics.median(latencies[1:]),
+    }
+
+
+def _module_import_s(module: str) -> float:
+    """在新进程中导入模块的耗时 (秒)"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _server_startup(image_path: str, args, warmup: bool) -> dict:
+    """启动异步服务，测量端口可用 (存活)、引擎就绪的时间和就绪后前两个请求的耗时"""
+    with open(image_path, "rb") as f:
+        body = json.dumps({"images": [base64.b64encode(f.read()).decode("utf-8")]}).encode("utf-8")
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_async_server.py")
+    command = [sys.executable, server, "--workers", str(args.workers), "--port", str(args.port)]
+    if not warmup:
+        command.append("--no-warmup")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    try:
+        _wait_for_server(base_url, args.startup_timeout, "/health/live", interval=0.02)
+        live_s = time.perf_counter() - t0
+        _wait_for_server(base_url, args.startup_timeout, "/health/ready", interval=0.02)
+        ready_s = time.perf_counter() - t0
+        # 每个工作进程各处理一个请求，取其中最慢的作为首个请求延迟
+        _, first, failures = _run_load(base_url, body, args.workers, args.workers)
+        _, second, more_failures = _run_load(base_url, body, args.workers, args.workers)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"live_s": live_s, "ready_s": ready_s, "first_s": max(first), "steady_s": statistics.median(second),
+            "failures": failures + more_failures}
+
+
+def bench_startup(args):
+    """冷启动与首个请求延迟: 对比加载后是否预热"""
+    modes = [("预热", True), ("不预热", False)]
+    print("导入模块 (不加载模型):")
+    for module in ("paddle_ocr", "ocr_server", "ocr_openai_api", "ocr_async_server"):
+        print(f"  {module:<18} {_module_import_s(module) * 1000:8.1f} ms")
+
+    print(f"\n引擎冷启动 (每种方式 {args.repeat} 个新进程取中位数，单位 ms):")
+    print(f"{'方式':<8}{'导入推理库':>10}{'加载模型':>10}{'预热':>10}{'首次推理':>10}{'后续推理':>10}{'就绪+首次':>10}")
+    ctx = multiprocessing.get_context("spawn")
+    for label, warmup in modes:
+        trials = []
+        for _ in range(args.repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                trials.append(pool.submit(_engine_startup, args.image, warmup, args.runs).result())
+        m = {key: statistics.median(t[key] for t in trials) * 1000 for key in trials[0]}
+        total = m["import_s"] + m["load_s"] + m["warmup_s"] + m["first_s"]
+        print(f"{label:<{10 - len(label)}}{m['import_s']:>15.1f}{m['load_s']:>14.1f}{m['warmup_s']:>12.1f}"
+              f"{m['first_s']:>14.1f}{m['steady_s']:>14.1f}{total:>14.1f}")
+
+    if args.server:
+        print(f"\n异步服务 ({args.workers} 个工作进程，单位 ms):")
+        print(f"{'方式':<8}{'端口可用':>10}{'就绪':>10}{'首个请求':>10}{'后续请求':>10}")
+        for label, warmup in modes:
+            r = _server_startup(args.image, args, warmup)
+            note = f"  失败 {r['failures']}" if r["failures"] else ""
+            print(f"{label:<{10 - len(label)}}{r['live_s'] * 1000:>14.1f}{r['ready_s'] * 1000:>12.1f}"
+                  f"{r['first_s'] * 1000:>14.1f}{r['steady_s'] * 1000:>14.1f}{note}")
+
+
+# pipeline 基准中各执行方式对应的 paddle_ocr 配置
+PIPELINE_MODES = {
+    "thread": {"EXECUTION_MODE": "thread", "PAGE_BATCH_SIZE": 1},
+    "process": {"EXECUTION_MODE": "process", "PAGE_BATCH_SIZE": 1},
+    "batch": {"EXECUTION_MODE": "thread"},  # PAGE_BATCH_SIZE 由 --batch-size 指定
+}
+
+
+def make_scanned_pdf(path: str, pages: int, dpi: int, seed: int = 0):
+    """生成合成扫描件: 每页一张 A4 灰度 JPEG 整页图，含多行文字、轻微倾斜和噪点 (相同参数生成的文件相同)"""
+    rng = np.random.default_rng(seed)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    scale = dpi / 300
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    doc = fitz.open()
+    for page_num in range(pages):
+        img = np.full((height, width), 245, np.uint8)
+        cv2.putText(img, f"Page {page_num + 1}", (int(150 * scale), int(150 * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.6 * scale, 20, max(1, int(3 * scale)), cv2.LINE_AA)
+        y = int(300 * scale)
+        while y < height - 150 * scale:
+            words = [''.join(rng.choice(letters, rng.integers(2, 10))) for _ in range(rng.integers(4, 12))]
+            cv2.putText(img, ' '.join(words), (int(150 * scale), y), cv2.FONT_HERSHEY_SIMPLEX,
+                        1.0 * scale, 20, max(1, int(2 * scale)), cv2.LINE_AA)
+            # 偶尔空一行作为段落间距
+            y += int((110 if rng.random() < 0.15 else 60) * scale)
+        # 扫描件常见的轻微倾斜和噪点
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), float(rng.uniform(-0.8, 0.8)), 1.0)
+        img = cv2.warpAffine(img, matrix, (width, height), borderValue=245)
+        img = np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+        jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])[1]
+        page = doc.new_page(width=595.28, height=841.89)
+        page.insert_image(page.rect, stream=jpeg.tobytes())
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+def _run_pipeline(pdf_path: str, settings: dict, report_path: str):
+    """(独立进程中) 以给定配置完整运行一次 paddle_ocr 流水线，输出性能剖析报告"""
+    import paddle_ocr
+
+    for name, value in settings.items():
+        setattr(paddle_ocr, name, value)
+    # 每次都完整识别: 不读断点续跑日志和结果缓存
+    paddle_ocr.ENABLE_JOURNAL = False
+    paddle_ocr.ENABLE_CACHE = False
+    paddle_ocr.PROFILE_MODE = True
+    paddle_ocr.PROFILE_REPORT_PATH = report_path
+    output_text = os.path.join(os.path.dirname(report_path), "output.txt")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if paddle_ocr.EXECUTION_MODE == "thread":
+            # 线程模式在计时开始前加载模型；进程模式的工作进程加载模型计入耗时
+            paddle_ocr.get_ocr_engine()
+        paddle_ocr.create_searchable_pdf(pdf_path, output_text, save_text_only=True)
+
+
+def _stage_ms(report: dict, stage: str, key: str):
+    stage_info = report["stages"].get(stage)
+    return stage_info["wall_s"][key] * 1000 if stage_info else 0.0
+
+
+def bench_pipeline(args):
+    """在合成扫描件上对比线程 / 进程 / 跨页批量三种执行方式的吞吐量和各阶段耗时"""
+    os.makedirs(args.workdir, exist_ok=True)
+    modes = args.modes.split(",")
+    for mode in modes:
+        if mode not in PIPELINE_MODES:
+            raise SystemExit(f"未知的执行方式: {mode} (可选 {', '.join(PIPELINE_MODES)})")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {(r["dataset"], r["mode"]): r for r in json.load(f)["results"]}
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for dpi in (int(d) for d in args.dpis.split(",")):
+        dataset = f"scan_{args.pages}p_{dpi}dpi"
+        pdf_path = os.path.join(args.workdir, f"{dataset}_seed{args.seed}.pdf")
+        if not os.path.exists(pdf_path):
+            print(f"生成合成扫描件: {pdf_path}")
+            make_scanned_pdf(pdf_path, args.pages, dpi, args.seed)
+
+        print(f"\n{dataset} (工作线程/进程数 {args.workers})")
+        print(f"{'方式':<9}{'页/秒':>8}{'耗时(s)':>9}{'CPU(s)':>9}{'峰值内存(MB)':>13}"
+              f"{'推理P50(ms)':>12}{'推理P90(ms)':>12}{'渲染P50(ms)':>12}  对比基线")
+        for mode in modes:
+            settings = dict(PIPELINE_MODES[mode], MAX_WORKERS=args.workers)
+            if mode == "batch":
+                settings["PAGE_BATCH_SIZE"] = args.batch_size
+            if args.render_dpi:
+                settings["DPI"] = args.render_dpi
+            report_path = os.path.join(args.workdir, f"{dataset}_{mode}.json")
+            if os.path.exists(report_path):
+                os.remove(report_path)
+
+            # 每种方式在全新的进程中运行，峰值内存和 CPU 时间互不影响
+            proc = ctx.Process(target=_run_pipeline, args=(pdf_path, settings, report_path))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0 or not os.path.exists(report_path):
+                print(f"{mode:<9} 运行失败 (退出码 {proc.exitcode})")
+                continue
+            with open(report_path, encoding="utf-8") as f:
+                report = json.load(f)
+            report.pop("page_details", None)
+
+            delta = ""
+            base = baseline.get((dataset, mode))
+            if base and base["report"]["pages_per_sec"]:
+                change = report["pages_per_sec"] / base["report"]["pages_per_sec"] - 1
+                delta = f"{change:+.1%}" + ("  ⚠ 回退" if change < -args.tolerance else "")
+            print(f"{mode:<9}{report['pages_per_sec']:>8.2f}{report['wall_s']:>9.1f}{report['cpu_s']:>9.1f}"
+                  f"{report['peak_rss_mb'] or 0:>13.0f}{_stage_ms(report, 'inference', 'p50'):>12.1f}"
+                  f"{_stage_ms(report, 'inference', 'p90'):>12.1f}{_stage_ms(report, 'render', 'p50'):>12.1f}"
+                  f"  {delta}")
+            results.append({"dataset": dataset, "mode": mode, "report": report})
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"pages": args.pages, "seed": args.seed, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存至: {args.output} (可作为下次运行的 --baseline)")
+
+
+# documents 基准的三种处理方式
+DOCUMENT_LAYOUTS = ("单个大文件", "多文件共用池", "多文件逐个处理")
+
+
+def _run_documents(layout: str, paths: list, settings: dict, output_dir: str, queue):
+    """(独立进程中) 以给定方式识别文档，把耗时 (秒) 放入 queue"""
+    import paddle_ocr
+
+    for name, value in settings.items():
+        setattr(paddle_ocr, name, value)
+    paddle_ocr.ENABLE_JOURNAL = False
+    paddle_ocr.ENABLE_CACHE = False
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+            contextlib.redirect_stderr(devnull):
+        if paddle_ocr.EXECUTION_MODE == "thread":
+            paddle_ocr.get_ocr_engine()
+        t0 = time.perf_counter()
+        if layout == "多文件共用池":
+            paddle_ocr.process_documents(paths, output_dir, save_text_only=True)
+        else:
+            # 逐个处理相当于对每个文件各运行一次脚本 (进程模式下每个文件都重新加载模型)
+            for path in paths:
+                base = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+                paddle_ocr.create_searchable_pdf(path, base + ".txt", save_text_only=True)
+        queue.put(time.perf_counter() - t0)
+
+
+def bench_documents(args):
+    """同样的页数: 单个大PDF vs 多个小PDF (共用一个引擎池 / 逐个处理) 的吞吐量"""
+    doc_count = max(1, args.pages // args.pages_per_doc)
+    data_dir = os.path.join(args.workdir, f"docs_{doc_count}x{args.pages_per_doc}p_{args.dpi}dpi_seed{args.seed}")
+    small_paths = [os.path.join(data_dir, f"doc{i:03d}.pdf") for i in range(doc_count)]
+    large_path = os.path.join(data_dir, "all.pdf")
+    if not os.path.exists(large_path):
+        print(f"生成合成扫描件: {doc_count} 个 {args.pages_per_doc} 页的文件，以及合并后的 {large_path}")
+        os.makedirs(data_dir, exist_ok=True)
+        merged = fitz.open()
+        for i, path in enumerate(small_paths):
+            make_scanned_pdf(path, args.pages_per_doc, args.dpi, args.seed + i)
+            with fitz.open(path) as doc:
+                merged.insert_pdf(doc)
+        merged.save(large_path)
+        merged.close()
+
+    total_pages = doc_count * args.pages_per_doc
+    ctx = multiprocessing.get_context("spawn")
+    print(f"\n共 {total_pages} 页 ({doc_count} 个文件 x {args.pages_per_doc} 页)，工作线程/进程数 {args.workers}")
+    print(f"{'执行方式':<8}{'处理方式':<11}{'页/秒':>8}{'耗时(s)':>9}{'相对单个大文件':>16}")
+    for mode in args.modes.split(","):
+        settings = {"EXECUTION_MODE": mode, "MAX_WORKERS": args.workers, "PAGE_BATCH_SIZE": args.batch_size}
+        if args.render_dpi:
+            settings["DPI"] = args.render_dpi
+        reference = None
+        for layout in DOCUMENT_LAYOUTS:
+            paths = [large_path] if layout == "单个大文件" else small_paths
+            output_dir = os.path.join(data_dir, "out")
+            os.makedirs(output_dir, exist_ok=True)
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_run_documents, args=(layout, paths, settings, output_dir, queue))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                print(f"{mode:<12}{layout:<8} 运行失败 (退出码 {proc.exitcode})")
+                continue
+            elapsed = queue.get()
+            rate = total_pages / elapsed
+            reference = reference or rate
+            print(f"{mode:<12}{layout:<{15 - len(layout)}}{rate:>8.2f}{elapsed:>9.1f}{rate / reference:>15.0%}")
+
+
+def load_text_corpus(path: str) -> list:
+    """把 paddle_ocr 输出的文本文件切分为页: [[行, ...], ...] (跳过无文本的页)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    pages = []
+    for block in re.split(r'={60}\n第 \d+ 页\n={60}\n', content)[1:]:
+        lines = [line for line in block.strip().split("\n") if line.strip()]
+        if lines and lines != ["(此页无文本内容)"]:
+            pages.append(lines)
+    return pages
+
+
+def _search_queries(pages: list, count: int, rng: random.Random) -> list:
+    """从语料中抽取查询: [(类别, 查询串), ...]，各类别数量相同"""
+    kinds = ("2字", "4字", "6字", "两个词", "英文单词")
+    words = sorted({w for lines in pages for line in lines for w in re.findall(r'[A-Za-z]{4,}', line)})
+    queries = []
+    while len(queries) < count:
+        kind = kinds[len(queries) % len(kinds)]
+        if kind == "英文单词":
+            if words:
+                queries.append((kind, rng.choice(words)))
+            continue
+        lines = rng.choice(pages)
+        runs = [run for line in lines for run in re.findall(r'[\u4e00-\u9fff]{6,}', line)]
+        if len(runs) < 2:
+            continue
+        size = 3 if kind == "两个词" else int(kind[0])
+        picked = []
+        for run in rng.sample(runs, 2 if kind == "两个词" else 1):
+            start = rng.randrange(len(run) - size + 1)
+            picked.append(run[start:start + size])
+        queries.append((kind, " ".join(picked)))
+    return queries
+
+
+def _scan_search(corpus: list, query: str, limit: int) -> list:
+    """基线: 逐页逐行扫描全部文字 (相当于 grep 文本文件)，语义与 OcrIndex.search 相同"""
+    import ocr_index
+    terms = ocr_index.normalize_text(query).split()
+    hits = []
+    for path, page_num, lines in corpus:
+        normalized = [ocr_index.normalize_text(line) for line in lines]
+        if not all(any(term in text for text in normalized) for term in terms):
+            continue
+        hits.extend((path, page_num, line_no) for line_no, text in enumerate(normalized)
+                    if any(term in text for term in terms))
+        if len(hits) >= limit:
+            break
+    return hits[:limit]
+
+
+def bench_search(args):
+    """全文检索: 多千页语料上逐页写入索引的耗时，以及查询延迟 (对比逐行扫描)"""
+    import ocr_index
+    source = load_text_corpus(args.corpus)
+    if not source:
+        print(f"语料中没有文本: {args.corpus}")
+        return
+    rng = random.Random(args.seed)
+    # 循环使用语料页面，分布到多个文档中
+    per_doc = -(-args.pages // args.docs)
+    corpus = [(os.path.abspath(os.path.join(args.workdir, f"book{i // per_doc:03d}.pdf")), i % per_doc,
+               source[i % len(source)]) for i in range(args.pages)]
+
+    os.makedirs(args.workdir, exist_ok=True)
+    index_path = os.path.join(args.workdir, f"search_{args.pages}p.sqlite")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(index_path + suffix):
+            os.remove(index_path + suffix)
+    index = ocr_index.OcrIndex(index_path)
+    print(f"语料: {args.corpus} ({len(source)} 页)，索引 {args.pages} 页 / {args.docs} 个文档 -> {index_path}")
+
+    add_s = []
+    documents = {}
+    start = time.perf_counter()
+    for path, page_num, lines in corpus:
+        if path not in documents:
+            documents[path] = index.document(path)
+        result = {'page_num': page_num, 'width': 595, 'height': 842, 'dpi': 72,
+                  'ocr_results': [{"box": [[40, 40 + 17 * i], [400, 40 + 17 * i], [400, 52 + 17 * i],
+                                           [40, 52 + 17 * i]], "text": line, "confidence": 0.95}
+                                  for i, line in enumerate(lines)]}
+        t0 = time.perf_counter()
+        documents[path].add(result)
+        add_s.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    size_mb = sum(os.path.getsize(index_path + suffix) for suffix in ("", "-wal")
+                  if os.path.exists(index_path + suffix)) / 1024 / 1024
+    stats = index.stats()
+    print(f"逐页写入: {args.pages / elapsed:.0f} 页/秒，每页 P50 {np.percentile(add_s, 50) * 1000:.2f} ms "
+          f"P99 {np.percentile(add_s, 99) * 1000:.2f} ms；{stats['lines']} 行，{stats['postings']} 条倒排记录，"
+          f"{size_mb:.1f} MB")
+
+    queries = _search_queries(source, args.queries, rng)
+    by_kind = {}
+    mismatches = 0
+    for kind, query in queries:
+        t0 = time.perf_counter()
+        hits = index.search(query, args.limit)
+        index_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        expected = _scan_search(corpus, query, args.limit)
+        scan_ms = (time.perf_counter() - t0) * 1000
+        if [(h["document"], h["page_num"], h["line_no"]) for h in hits] != expected:
+            mismatches += 1
+        by_kind.setdefault(kind, []).append((index_ms, scan_ms, len(hits)))
+    index.close()
+
+    print(f"\n{len(queries)} 个查询 (每个最多 {args.limit} 条结果)，延迟 ms:")
+    print(f"{'查询类别':<8}{'索引P50':>9}{'索引P90':>9}{'索引P99':>9}{'扫描P50':>9}{'扫描P99':>9}{'平均命中':>9}")
+    for kind, rows in by_kind.items():
+        index_ms, scan_ms, counts = (np.array(column) for column in zip(*rows))
+        print(f"{kind:<{12 - len(kind)}}{np.percentile(index_ms, 50):>11.2f}{np.percentile(index_ms, 90):>11.2f}"
+              f"{np.percentile(index_ms, 99):>11.2f}{np.percentile(scan_ms, 50):>11.2f}"
+              f"{np.percentile(scan_ms, 99):>11.2f}{counts.mean():>11.1f}")
+    print(f"与逐行扫描结果不一致的查询: {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaddleOCR PDF 处理性能基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_render = sub.add_parser("render", help="页面渲染路径: PNG往返 vs 零拷贝")
+    p_render.add_argument("--pdf", default="input.pdf", help="测试用 PDF 文件")
+    p_render.add_argument("--dpi", type=int, default=400)
+    p_render.add_argument("--pages", type=int, default=10, help="最多测试的页数")
+    p_render.set_defaults(func=bench_render)
+
+    p_batch = sub.add_parser("batch", help="跨页批量推理: 不同批量大小的吞吐量")
+    p_batch.add_argument("--pdf", default="input.pdf", help="测试用 PDF 文件")
+    p_batch.add_argument("--dpi", type=int, default=200)
+    p_batch.add_argument("--pages", type=int, default=32, help="最多测试的页数")
+    p_batch.add_argument("--sizes", default="1,2,4,8", help="逗号分隔的批量大小")
+    p_batch.set_defaults(func=bench_batch)
+
+    p_upload = sub.add_parser("upload", help="图片上传解码: base64-JSON vs 原始二进制")
+    p_upload.add_argument("--image", required=True, help="测试用图片文件 (如 10MB 的扫描页)")
+    p_upload.add_argument("--repeat", type=int, default=10, help="重复次数")
+    p_upload.set_defaults(func=bench_upload)
+
+    p_load = sub.add_parser("load", help="异步服务压测: 吞吐量随工作进程数的变化")
+    p_load.add_argument("--image", required=True, help="测试用图片文件")
+    p_load.add_argument("--workers", default="1,2,4", help="逗号分隔的工作进程数，逐个启动服务测试")
+    p_load.add_argument("--cpu-threads", type=int, default=1, help="每个工作进程的推理线程数")
+    p_load.add_argument("--url", default=None, help="压测已运行的服务 (指定后不再自动启动服务)")
+    p_load.add_argument("--port", type=int, default=8867, help="自动启动服务时使用的端口")
+    p_load.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    p_load.add_argument("--requests", type=int, default=200, help="总请求数")
+    p_load.add_argument("--startup-timeout", type=float, default=300, help="等待服务就绪的秒数")
+    p_load.set_defaults(func=bench_load)
+
+    p_pipeline = sub.add_parser("pipeline", help="PDF 流水线: 合成扫描件上对比线程/进程/批量模式")
+    p_pipeline.add_argument("--dpis", default="200,300", help="逗号分隔的合成扫描件分辨率")
+    p_pipeline.add_argument("--pages", type=int, default=20, help="合成扫描件页数")
+    p_pipeline.add_argument("--seed", type=int, default=0, help="随机种子，相同参数生成相同的文件")
+    p_pipeline.add_argument("--modes", default="thread,process,batch", help="逗号分隔的执行方式")
+    p_pipeline.add_argument("--workers", type=int, default=4, help="工作线程/进程数")
+    p_pipeline.add_argument("--batch-size", type=int, default=4, help="batch 方式的跨页批量大小")
+    p_pipeline.add_argument("--render-dpi", type=int, default=None, help="识别DPI (默认使用 paddle_ocr.DPI)")
+    p_pipeline.add_argument("--workdir", default=".bench_data", help="合成文件和各次报告的目录")
+    p_pipeline.add_argument("--output", default="bench_pipeline.json", help="汇总结果文件")
+    p_pipeline.add_argument("--baseline", default=None, help="上次的汇总结果，用于对比吞吐量")
+    p_pipeline.add_argument("--tolerance", type=float, default=0.05, help="吞吐量下降超过此比例时标记回退")
+    p_pipeline.set_defaults(func=bench_pipeline)
+
+    p_startup = sub.add_parser("startup", help="冷启动: 模块导入、模型加载、预热与首个请求延迟")
+    p_startup.add_argument("--image", required=True, help="测试用图片文件")
+    p_startup.add_argument("--repeat", type=int, default=3, help="每种方式启动的新进程数")
+    p_startup.add_argument("--runs", type=int, default=5, help="首次推理后再推理的次数 (取中位数)")
+    p_startup.add_argument("--server", action="store_true", help="同时测量异步服务的存活/就绪时间和首个请求延迟")
+    p_startup.add_argument("--workers", type=int, default=2, help="异步服务的工作进程数")
+    p_startup.add_argument("--port", type=int, default=8867, help="启动服务时使用的端口")
+    p_startup.add_argument("--startup-timeout", type=float, default=300, help="等待服务就绪的秒数")
+    p_startup.set_defaults(func=bench_startup)
+
+    p_documents = sub.add_parser("documents", help="多文档: 单个大PDF vs 多个小PDF (共用引擎池 / 逐个处理)")
+    p_documents.add_argument("--pages", type=int, default=40, help="总页数")
+    p_documents.add_argument("--pages-per-doc", type=int, default=2, help="每个小文件的页数")
+    p_documents.add_argument("--dpi", type=int, default=150, help="合成扫描件分辨率")
+    p_documents.add_argument("--seed", type=int, default=0, help="随机种子")
+    p_documents.add_argument("--modes", default="thread,process", help="逗号分隔的执行方式 (thread/process)")
+    p_documents.add_argument("--workers", type=int, default=4, help="工作线程/进程数")
+    p_documents.add_argument("--batch-size", type=int, default=1, help="跨页批量推理的页数")
+    p_documents.add_argument("--render-dpi", type=int, default=None, help="识别DPI (默认使用 paddle_ocr.DPI)")
+    p_documents.add_argument("--workdir", default=".bench_data", help="合成文件目录")
+    p_documents.set_defaults(func=bench_documents)
+
+    p_search = sub.add_parser("search", help="全文检索: 多千页语料上的逐页索引耗时和查询延迟 (对比逐行扫描)")
+    p_search.add_argument("--corpus", default="output_ocr_text.txt", help="paddle_ocr 输出的文本文件，循环使用其中的页")
+    p_search.add_argument("--pages", type=int, default=3000, help="索引的总页数")
+    p_search.add_argument("--docs", type=int, default=10, help="分布到多少个文档")
+    p_search.add_argument("--queries", type=int, default=200, help="查询数 (从语料中随机抽取)")
+    p_search.add_argument("--limit", type=int, default=20, help="每个查询最多返回的结果数")
+    p_search.add_argument("--seed", type=int, default=0, help="随机种子")
+    p_search.add_argument("--workdir", default=".bench_data", help="索引文件目录")
+    p_search.set_defaults(func=bench_search)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
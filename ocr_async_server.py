@@ -0,0 +1,526 @@
+"""
+异步 OCR 服务 (ASGI, Starlette + uvicorn)
+
+与 ocr_server.py / ocr_openai_api.py 提供相同的接口，但推理在多个工作进程中进行，
+每个进程预先加载 (并预热) 自己的 PaddleOCR(lang="ch")，吞吐量可以随 CPU 核心数增长。
+服务先开始监听端口，工作进程在后台启动；全部就绪前 GET /health/ready 返回 503。
+图片解码和推理都在工作进程中完成，响应 JSON 的序列化在线程池中完成，事件循环只负责收发请求。
+
+用法:
+    python ocr_async_server.py --workers 4 --port 8866
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+import cv2
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from ocr_engine import warm_up
+from ocr_metrics import CONTENT_TYPE, REGISTRY, STAGE_SECONDS, Gauge, stage_timer
+from ocr_normalize import normalize_result
+
+# ==================== 配置区 ====================
+NUM_WORKERS = 4  # 引擎工作进程数，每个进程各加载一份模型
+WORKER_CPU_THREADS = 1  # 每个工作进程的推理线程数 (进程数 x 线程数 ≈ CPU核心数)
+MAX_PENDING_REQUESTS = 64  # 同时处理中的请求上限，超过时返回 429
+REQUEST_TIMEOUT = 120  # 单个请求等待识别结果的超时时间 (秒)，超时返回 503
+WARMUP_ENGINE = True  # 工作进程加载模型后先对合成图片推理一次，第一个真实请求不再承担初始化开销
+# ================================================
+
+# 模拟的模型列表
+MODELS = {
+    "paddleocr-v5": {
+        "id": "paddleocr-v5",
+        "object": "model",
+        "created": 1677610602,
+        "owned_by": "paddleocr"
+    }
+}
+
+# 工作进程内的引擎实例
+_worker_ocr = None
+
+
+def _init_worker(cpu_threads: int, warmup: bool):
+    """工作进程初始化: 限制推理线程数、加载模型并预热"""
+    global _worker_ocr
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = str(cpu_threads)
+    cv2.setNumThreads(cpu_threads)
+    from paddleocr import PaddleOCR
+    engine = PaddleOCR(lang="ch")
+    if warmup:
+        warm_up(engine)
+    _worker_ocr = engine
+
+
+def _worker_ready() -> int:
+    """预热任务: 确认工作进程已启动并加载模型"""
+    # 稍作停留，让同一轮的其他预热任务分配到其他进程
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def format_result(result) -> list:
+    """将引擎对单张图片的返回值格式化为 [{"box", "text", "confidence"}, ...]"""
+    return normalize_result(result).to_dicts()
+
+
+def _run_ocr_batch(imgs: list) -> list:
+    """对一批图片推理，返回与输入一一对应的原始结果"""
+    if hasattr(_worker_ocr, 'predict'):
+        return [[item] for item in _worker_ocr.predict(imgs)]
+    return [_worker_ocr.ocr(img) for img in imgs]
+
+
+def recognize_encoded(images: list) -> tuple:
+    """(在工作进程中) 解码并识别一批 base64 图片，返回每张图片的 (状态, 结果, 信息) 和各阶段耗时"""
+    # 工作进程的指标无法直接汇总，各阶段耗时 [(阶段, 秒), ...] 随结果带回主进程记录
+    timings = []
+    outputs = [None] * len(images)
+    valid_indices = []
+    valid_imgs = []
+    for i, image in enumerate(images):
+        start = time.perf_counter()
+        try:
+            nparr = np.frombuffer(base64.b64decode(image), np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        except Exception:
+            img = None
+        timings.append(('decode', time.perf_counter() - start))
+        if img is None:
+            outputs[i] = ("101", [], "Image decode failed")
+            continue
+        valid_indices.append(i)
+        valid_imgs.append(img)
+
+    if not valid_imgs:
+        return outputs, timings
+    try:
+        start = time.perf_counter()
+        raw_results = _run_ocr_batch(valid_imgs)
+        timings.append(('inference', time.perf_counter() - start))
+        for i, raw in zip(valid_indices, raw_results):
+            start = time.perf_counter()
+            outputs[i] = ("000", format_result(raw), "Success")
+            timings.append(('formatting', time.perf_counter() - start))
+    except Exception:
+        # 整批失败时逐张重试，只让出错的图片失败
+        for i, img in zip(valid_indices, valid_imgs):
+            try:
+                outputs[i] = ("000", format_result(_run_ocr_batch([img])[0]), "Success")
+            except Exception as e:
+                outputs[i] = ("500", [], str(e))
+    return outputs, timings
+
+
+# ==================== 事件循环侧 ====================
+
+executor = None
+_pending = 0
+# 工作进程启动状态: starting / ready / failed
+_workers_state = "starting"
+_workers_error = None
+_startup_seconds = None
+
+
+class ServiceBusy(Exception):
+    """处理中的请求已达上限"""
+
+
+async def json_response(payload, status_code: int = 200) -> Response:
+    """在线程池中序列化 JSON，避免大响应阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+
+    def serialize():
+        with stage_timer('serialization'):
+            return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    body = await loop.run_in_executor(None, serialize)
+    return Response(body, status_code=status_code, media_type="application/json")
+
+
+async def read_json(request):
+    """在线程池中解析请求体 JSON"""
+    body = await request.body()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, json.loads, body)
+
+
+def submit_images(images: list) -> asyncio.Future:
+    """把一批 base64 图片交给工作进程池，返回 (结果, 各阶段耗时) 的 Future；处理中的请求已达上限时抛出 ServiceBusy"""
+    global _pending
+    if _pending >= MAX_PENDING_REQUESTS:
+        raise ServiceBusy(f"处理中的请求已达上限 ({MAX_PENDING_REQUESTS})")
+    _pending += 1
+    future = asyncio.wrap_future(executor.submit(recognize_encoded, images))
+    # 完成、失败或超时取消后都释放名额
+    future.add_done_callback(_release_pending)
+    return future
+
+
+def _release_pending(_):
+    global _pending
+    _pending -= 1
+
+
+async def collect(future: asyncio.Future) -> list:
+    """等待 submit_images 的结果，记录工作进程中的各阶段耗时"""
+    outputs, timings = await asyncio.wait_for(future, timeout=REQUEST_TIMEOUT)
+    for stage, seconds in timings:
+        STAGE_SECONDS.observe(seconds, stage)
+    return outputs
+
+
+async def recognize(images: list) -> list:
+    """把一批 base64 图片交给工作进程池识别"""
+    return await collect(submit_images(images))
+
+
+REGISTRY.register(Gauge("ocr_pending_requests", "Requests waiting for the worker pool", lambda: _pending))
+
+
+async def predict(request):
+    try:
+        data = await read_json(request)
+        images = data.get('images', [])
+
+        if not images:
+            return await json_response({"status": "101", "msg": "No images provided"})
+
+        try:
+            outputs = await recognize(images)
+        except ServiceBusy as e:
+            return await json_response({"status": "429", "msg": str(e)}, 429)
+        except asyncio.TimeoutError:
+            return await json_response({"status": "503", "msg": "OCR request timed out"}, 503)
+
+        return await json_response({
+            "status": "000",
+            "msg": "Success",
+            "results": [{"data": data, "status": status, "msg": msg} for status, data, msg in outputs]
+        })
+
+    except Exception as e:
+        return await json_response({"status": "500", "msg": str(e)})
+
+
+def _is_binary_upload(request) -> bool:
+    """请求体是否为原始二进制或 multipart 上传 (同 ocr_upload.is_binary_upload)"""
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    return mimetype in ('application/octet-stream', 'multipart/form-data') or mimetype.startswith('image/')
+
+
+def _openai_error(message: str, type_: str, code: str) -> dict:
+    return {"error": {"message": message, "type": type_, "code": code}}
+
+
+def _image_lines(index: int, count: int, output: tuple):
+    """第 index 张 (从 1 开始，共 count 张) 图片的回复内容各行，多张图片时加分页标记 (同 ocr_openai_api.iter_content_lines)"""
+    status, ocr_results, _ = output
+    multi = count > 1
+    if multi:
+        if index > 1:
+            yield ""
+        yield f"===== 第 {index} 页 ====="
+    if status == "101":
+        if multi:
+            yield "(图片解码失败)"
+        return
+    lines = _clean_lines(ocr_results)
+    for item in lines:
+        yield item['text']
+    if multi and not lines:
+        yield "(此页无文本内容)"
+
+
+def _clean_lines(ocr_results: list) -> list:
+    """去掉空白行和连续重复的行 (同 ocr_openai_api.parse_ocr_result)，只保留文字和置信度"""
+    lines = []
+    prev_text = None
+    for item in ocr_results:
+        text = item['text']
+        if text.strip() and text != prev_text:
+            lines.append({"text": text, "confidence": item['confidence']})
+            prev_text = text
+    return lines
+
+
+def _content_lines(outputs: list):
+    """把各图片的识别行按顺序拼成回复内容的各行"""
+    for index, output in enumerate(outputs, 1):
+        yield from _image_lines(index, len(outputs), output)
+
+
+def _image_payload(image_url: str) -> str:
+    """去掉 data:image/...;base64, 前缀，得到交给工作进程解码的 base64 字符串"""
+    if image_url.startswith('data:'):
+        comma = image_url.find(',', 0, 64)
+        if comma >= 0:
+            return image_url[comma + 1:]
+    return image_url
+
+
+def stream_chat_completion(model: str, images: list, input_text):
+    """以 chat.completion.chunk 的 SSE 流返回识别结果，每张图片识别完成后逐行发送"""
+    # 每张图片单独交给工作进程 (多张图片并行识别)，在开始响应前提交，超过上限仍可返回 429
+    futures = []
+    try:
+        for image in images:
+            futures.append(submit_images([image]))
+    except ServiceBusy:
+        for future in futures:
+            future.cancel()
+        raise
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:8]}"
+    created = int(time.time())
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def generate():
+        yield chunk({"role": "assistant", "content": ""})
+        line_count = 0
+        try:
+            for index, future in enumerate(futures, 1):
+                output = (await collect(future))[0]
+                for text in _image_lines(index, len(futures), output):
+                    yield chunk({"content": text if line_count == 0 else "\n" + text})
+                    line_count += 1
+        except Exception as e:
+            error = _openai_error(str(e) or "OCR request timed out", "server_error", "ocr_error")
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+        finally:
+            for future in futures:
+                future.cancel()
+        if line_count == 0:
+            yield chunk({"content": input_text or "未识别到文字"})
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def chat_completions(request):
+    """兼容 OpenAI Chat Completions API 的 OCR 接口 (请求格式同 ocr_openai_api.py，支持多张图片和 stream)"""
+    if _is_binary_upload(request):
+        # 与 ocr_openai_api.py 一致: 聊天接口只接受 JSON 请求体
+        return await json_response(_openai_error(
+            "Chat completions expect a JSON body; send images as base64 image_url parts",
+            "invalid_request_error", "unsupported_media_type"), 415)
+    try:
+        data = await read_json(request)
+        messages = data.get('messages', [])
+        model = data.get('model', 'paddleocr-v5')
+        stream = bool(data.get('stream'))
+
+        # 提取所有消息中的图片 (按出现顺序) 和文本
+        images = []
+        input_text = None
+        for message in messages:
+            content = message.get('content')
+            if isinstance(content, str):
+                input_text = content
+            elif isinstance(content, list):
+                for item in content:
+                    if item.get('type') == 'text':
+                        input_text = item.get('text', '')
+                    elif item.get('type') == 'image_url':
+                        images.append(_image_payload(item.get('image_url', {}).get('url', '')))
+
+        try:
+            if stream:
+                return stream_chat_completion(model, images, input_text)
+            # 所有图片作为一批交给工作进程识别
+            outputs = await recognize(images) if images else []
+        except ServiceBusy as e:
+            return await json_response(_openai_error(str(e), "rate_limit_error", "queue_full"), 429)
+        except asyncio.TimeoutError:
+            return await json_response(_openai_error("OCR request timed out", "server_error", "timeout"), 503)
+
+        content_lines = list(_content_lines(outputs))
+        if input_text and not content_lines:
+            content_lines.append(input_text)
+        if not content_lines:
+            content_lines.append("未识别到文字")
+
+        recognized_text = "\n".join(content_lines)
+        return await json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:8]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": recognized_text
+                    },
+                    "finish_reason": "stop"
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 100,
+                "completion_tokens": len(recognized_text),
+                "total_tokens": 100 + len(recognized_text)
+            },
+            # 扩展字段: 每张图片的识别明细 (与请求中的图片顺序一致)
+            "ocr_images": [
+                {"index": index, "status": status, "msg": msg,
+                 "results": _clean_lines(ocr_results)}
+                for index, (status, ocr_results, msg) in enumerate(outputs)
+            ]
+        })
+
+    except Exception as e:
+        return await json_response(_openai_error(str(e), "internal_error", "ocr_error"), 500)
+
+
+async def list_models(request):
+    """列出可用模型 (兼容 OpenAI API)"""
+    return await json_response({"object": "list", "data": list(MODELS.values())})
+
+
+async def get_model(request):
+    """获取模型信息 (兼容 OpenAI API)"""
+    model_id = request.path_params['model_id']
+    if model_id in MODELS:
+        return await json_response(MODELS[model_id])
+    return await json_response({"error": "Model not found"}, 404)
+
+
+def _engine_status() -> dict:
+    return {
+        "state": _workers_state,
+        "ready": _workers_state == "ready",
+        "workers": NUM_WORKERS,
+        "startup_seconds": round(_startup_seconds, 3) if _startup_seconds is not None else None,
+        "error": _workers_error,
+    }
+
+
+async def health(request):
+    """存活检查: 事件循环可以响应请求即返回 200 (工作进程可能仍在加载模型)"""
+    return await json_response({
+        "status": "healthy",
+        "service": "paddleocr",
+        "workers": NUM_WORKERS,
+        "engine": _engine_status(),
+        "pending_requests": _pending,
+        "timestamp": int(time.time())
+    })
+
+
+async def health_ready(request):
+    """就绪检查: 所有工作进程加载并预热完成后返回 200，之前返回 503"""
+    status = _engine_status()
+    if not status['ready']:
+        return await json_response({"status": status['state'], "service": "paddleocr", "engine": status}, 503)
+    return await json_response({"status": "ready", "service": "paddleocr", "engine": status})
+
+
+async def metrics(request):
+    """Prometheus 指标 (各阶段耗时直方图，工作进程中的阶段由主进程汇总)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+async def index(request):
+    return PlainTextResponse("PaddleOCR Async Service is running!")
+
+
+async def start_workers():
+    """(后台任务) 等待所有工作进程加载模型并预热"""
+    global _workers_state, _workers_error, _startup_seconds
+    start = time.perf_counter()
+    try:
+        pids = set()
+        while len(pids) < NUM_WORKERS:
+            pids.update(await asyncio.gather(*(asyncio.wrap_future(executor.submit(_worker_ready))
+                                               for _ in range(NUM_WORKERS))))
+    except Exception as e:
+        _workers_state, _workers_error = "failed", str(e) or type(e).__name__
+        print(f"❌ 引擎工作进程启动失败: {_workers_error}")
+        return
+    _startup_seconds = time.perf_counter() - start
+    _workers_state = "ready"
+    print(f"✅ 引擎工作进程就绪: {len(pids)} 个 ({_startup_seconds:.1f} 秒)")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """启动时创建工作进程池，在后台加载模型，不阻塞端口监听"""
+    global executor
+    print(f"正在启动 {NUM_WORKERS} 个引擎工作进程...")
+    executor = ProcessPoolExecutor(
+        max_workers=NUM_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(WORKER_CPU_THREADS, WARMUP_ENGINE),
+    )
+    # 启动期间到达的请求在进程池中排队，等工作进程就绪后处理
+    startup = asyncio.create_task(start_workers())
+    try:
+        yield
+    finally:
+        startup.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/predict/paddleocr', predict, methods=['POST']),
+        Route('/v1/chat/completions', chat_completions, methods=['POST']),
+        Route('/v1/models', list_models, methods=['GET']),
+        Route('/v1/models/{model_id}', get_model, methods=['GET']),
+        Route('/health', health, methods=['GET']),
+        Route('/health/live', health, methods=['GET']),
+        Route('/health/ready', health_ready, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/', index, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="PaddleOCR 异步服务 (多进程引擎池)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8866)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="引擎工作进程数")
+    parser.add_argument("--cpu-threads", type=int, default=WORKER_CPU_THREADS,
+                        help="每个工作进程的推理线程数")
+    parser.add_argument("--no-warmup", action="store_true", help="工作进程加载模型后不做预热推理")
+    args = parser.parse_args()
+    NUM_WORKERS = args.workers
+    WORKER_CPU_THREADS = args.cpu_threads
+    WARMUP_ENGINE = not args.no_warmup
+
+    import uvicorn
+
+    print("=" * 60)
+    print("PaddleOCR 异步服务启动中...")
+    print(f"服务地址: http://127.0.0.1:{args.port}")
+    print(f"引擎工作进程: {NUM_WORKERS} x {WORKER_CPU_THREADS} 线程")
+    print("=" * 60)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
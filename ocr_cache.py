@@ -0,0 +1,133 @@
+"""
+按页面内容寻址的识别结果缓存
+
+键由页面内容摘要 (渲染像素或页面图片对象的哈希) 与 DPI/语言/模型版本共同决定，
+相同的页面 (封面、空白页、重复的样板页) 再次出现时直接返回缓存结果，无需推理。
+缓存存放在 SQLite 文件中，总大小超过上限时按最近最少使用 (LRU) 淘汰。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def make_cache_key(content_digest: str, settings: dict) -> str:
+    """由页面内容摘要和识别设置生成缓存键"""
+    settings_json = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{content_digest}|{settings_json}".encode('utf-8')).hexdigest()
+
+
+class PageResultCache:
+    """大小受限的 LRU 识别结果缓存（线程安全，多进程可共享同一文件）"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # cache_meta 中的总大小由触发器随增删改维护，写入时不必对整表求和；
+        # 已有的缓存文件第一次打开时按现有条目初始化
+        self._conn().executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS page_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_page_results_access ON page_results (last_access);
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total_bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO cache_meta (id, total_bytes)
+                SELECT 1, COALESCE(SUM(size), 0) FROM page_results;
+            CREATE TRIGGER IF NOT EXISTS page_results_insert AFTER INSERT ON page_results BEGIN
+                UPDATE cache_meta SET total_bytes = total_bytes + NEW.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS page_results_delete AFTER DELETE ON page_results BEGIN
+                UPDATE cache_meta SET total_bytes = total_bytes - OLD.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS page_results_update AFTER UPDATE OF size ON page_results BEGIN
+                UPDATE cache_meta SET total_bytes = total_bytes - OLD.size + NEW.size WHERE id = 1;
+            END;
+            COMMIT;
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """命中时返回缓存的 ocr_results，未命中返回 None"""
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM page_results WHERE key = ?", (key,)).fetchone()
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        conn.execute("UPDATE page_results SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, ocr_results: list):
+        """写入一页结果，必要时淘汰最久未使用的条目"""
+        value = json.dumps(ocr_results, ensure_ascii=False)
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        conn = self._conn()
+        # 用 UPSERT 而不是 INSERT OR REPLACE: REPLACE 删除旧行时不触发删除触发器，总大小会多算
+        conn.execute(
+            "INSERT INTO page_results (key, value, size, last_access) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+            " last_access = excluded.last_access",
+            (key, value, size, time.time()),
+        )
+        self._evict(conn)
+        conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """总大小超过上限时，从最久未使用的条目开始删除"""
+        total = conn.execute("SELECT total_bytes FROM cache_meta WHERE id = 1").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM page_results ORDER BY last_access"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM page_results WHERE key = ?", victims)
+
+    def stats(self) -> dict:
+        """本进程内的命中统计及缓存总体积"""
+        row = self._conn().execute(
+            "SELECT (SELECT COUNT(*) FROM page_results), total_bytes FROM cache_meta WHERE id = 1"
+        ).fetchone()
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': row[0],
+            'bytes': row[1],
+        }
@@ -0,0 +1,121 @@
+"""
+引擎的延迟创建与预热
+
+导入服务模块时不再加载模型: LazyEngine 在第一次 get() (或 start() 启动的后台线程) 时才创建引擎，
+多个线程同时调用只创建一次，其余线程等待同一次创建完成。
+创建后可以先对一张合成的文字图片推理一次 (预热)，让推理图的初始化、内存分配等一次性开销
+在服务接收流量前完成，第一个真实请求的延迟与后续请求接近。
+服务的 GET /health/ready 在预热完成前返回 503，编排系统据此决定何时转发流量。
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# 引擎状态
+IDLE = "idle"          # 尚未开始创建
+LOADING = "loading"    # 正在加载模型
+WARMING = "warming"    # 正在预热推理
+READY = "ready"        # 可以处理请求
+FAILED = "failed"      # 创建或预热失败 (下次 get() 会重试)
+
+
+def warmup_image() -> np.ndarray:
+    """预热用的合成图片: 白底黑字的两行文字，保证检测和识别模型都被执行"""
+    img = np.full((160, 640, 3), 255, np.uint8)
+    for i, text in enumerate(("PaddleOCR warm-up 0123456789", "ABCDEFGHIJKLM abcdefghijklm")):
+        cv2.putText(img, text, (16, 60 + 60 * i), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2, cv2.LINE_AA)
+    return img
+
+
+def run_image(engine, img):
+    """对一张图片推理一次 (兼容 3.x predict 和 2.x ocr)，返回原始结果"""
+    if hasattr(engine, 'predict'):
+        return list(engine.predict([img]))
+    return engine.ocr(img)
+
+
+def warm_up(engine):
+    """对合成图片推理一次"""
+    run_image(engine, warmup_image())
+
+
+class LazyEngine:
+    """线程安全的延迟创建引擎 (可选预热)"""
+
+    def __init__(self, factory, warmup: bool = True, name: str = "PaddleOCR"):
+        # factory() -> 引擎实例，在第一次 get() 时调用 (模型库也应在 factory 中导入)
+        self.factory = factory
+        self.warmup = warmup
+        self.name = name
+        self._engine = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._state = IDLE
+        self._error = None
+        self._load_s = None
+        self._warmup_s = None
+
+    def get(self):
+        """返回引擎，尚未创建时在当前线程创建并预热；创建失败时抛出异常"""
+        engine = self._engine
+        if engine is not None:
+            return engine
+        with self._lock:
+            if self._engine is None:
+                self._load()
+            return self._engine
+
+    def _load(self):
+        try:
+            self._state = LOADING
+            self._error = None
+            print(f"正在初始化 {self.name}...")
+            start = time.perf_counter()
+            engine = self.factory()
+            self._load_s = time.perf_counter() - start
+            if self.warmup:
+                self._state = WARMING
+                start = time.perf_counter()
+                warm_up(engine)
+                self._warmup_s = time.perf_counter() - start
+        except Exception as e:
+            self._state = FAILED
+            self._error = str(e) or type(e).__name__
+            raise
+        # 预热完成后才对其他线程可见
+        self._engine = engine
+        self._state = READY
+        warmup_note = f"，预热 {self._warmup_s:.1f} 秒" if self._warmup_s is not None else ""
+        print(f"✅ {self.name} 初始化完成 (加载 {self._load_s:.1f} 秒{warmup_note})")
+
+    def start(self):
+        """在后台线程中创建并预热引擎，立即返回 (重复调用无副作用，失败后再次调用会重试)"""
+        with self._start_lock:
+            if self._engine is not None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._background_load, name="ocr-engine-loader",
+                                            daemon=True)
+            self._thread.start()
+
+    def _background_load(self):
+        try:
+            self.get()
+        except Exception as e:
+            print(f"❌ {self.name} 初始化失败: {e}")
+
+    @property
+    def ready(self) -> bool:
+        return self._engine is not None
+
+    def status(self) -> dict:
+        """状态和加载/预热耗时 (秒)，供健康检查接口返回"""
+        return {
+            "state": self._state,
+            "ready": self.ready,
+            "load_seconds": round(self._load_s, 3) if self._load_s is not None else None,
+            "warmup_seconds": round(self._warmup_s, 3) if self._warmup_s is not None else None,
+            "error": self._error,
+        }
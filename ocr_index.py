@@ -0,0 +1,309 @@
+"""
+识别结果的全文检索索引
+
+识别完成的页面逐页写入 SQLite 倒排索引，之后可以按关键词查出命中的文档、页码和文字行的坐标，
+不再需要对输出的文本文件做 grep。
+- 分词: 文字先做 NFKC 规范化并转为小写；连续的中日韩文字切成相邻两字的二元组 (外加每段的最后一个字，
+  使单字查询也能命中)，英文和数字按单词切分；
+- 倒排表以 (词, 页) 为主键，查询时先求出包含所有词的页，再在这些页的文字行中逐行核对原文，
+  二元组相邻但原文不连续的误命中在这一步被排除；
+- 每页写入后立即提交 (WAL 模式)，识别过程中其他进程就能检索已完成的页；同一页重新写入时替换旧结果。
+英文按单词前缀匹配: 查询 "program" 能命中 "programming"，但查询词不能从单词中间开始。
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from ocr_store import OcrStore
+
+# 中日韩文字 (汉字、假名、谚文)
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_RE = re.compile(f'([{_CJK}]+)|([0-9a-z]+)')
+# 前缀查询的上界 (UTF-8 编码最大的字符)
+_PREFIX_END = '\U0010ffff'
+
+# 单条 SQL 中 IN (...) 的最多参数个数 (旧版 SQLite 上限为 999)
+_SQL_BATCH = 500
+
+DEFAULT_INDEX_PATH = ".ocr_index/search.sqlite"
+
+
+def normalize_text(text: str) -> str:
+    """NFKC 规范化 (全角转半角等)、转小写、合并连续空白"""
+    return ' '.join(unicodedata.normalize('NFKC', text).lower().split())
+
+
+def tokenize(text: str) -> set:
+    """规范化后的文字 -> 索引词集合"""
+    tokens = set()
+    for cjk, word in _TOKEN_RE.findall(text):
+        if word:
+            tokens.add(word)
+            continue
+        tokens.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        tokens.add(cjk[-1])
+    return tokens
+
+
+def query_tokens(term: str) -> list:
+    """查询词 -> [(词, 是否按前缀匹配), ...]"""
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(term):
+        if word:
+            tokens.append((word, True))
+        elif len(cjk) == 1:
+            # 单字出现在某个二元组的开头，或者是一段文字的最后一个字
+            tokens.append((cjk, True))
+        else:
+            tokens.extend((cjk[i:i + 2], False) for i in range(len(cjk) - 1))
+    return tokens
+
+
+class OcrIndex:
+    """SQLite 全文检索索引 (每个线程使用独立连接，多个进程可同时检索)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id INTEGER PRIMARY KEY,"
+            " path TEXT NOT NULL UNIQUE,"
+            " updated REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " page_id INTEGER PRIMARY KEY,"
+            " doc_id INTEGER NOT NULL,"
+            " page_num INTEGER NOT NULL,"
+            " width REAL, height REAL,"
+            " UNIQUE (doc_id, page_num));"
+            # 坐标为页面坐标 (点)，与渲染DPI无关
+            "CREATE TABLE IF NOT EXISTS lines ("
+            " page_id INTEGER NOT NULL,"
+            " line_no INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " x0 REAL, y0 REAL, x1 REAL, y1 REAL,"
+            " confidence REAL,"
+            " PRIMARY KEY (page_id, line_no)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " token TEXT NOT NULL,"
+            " page_id INTEGER NOT NULL,"
+            " PRIMARY KEY (token, page_id)) WITHOUT ROWID;"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- 写入 ---
+
+    def document(self, path: str, total_pages: int = None) -> "DocumentIndex":
+        """开始 (重新) 索引一个文档；给出总页数时删除超出页数的旧页"""
+        conn = self._conn()
+        key = os.path.abspath(path)
+        conn.execute("INSERT INTO documents (path, updated) VALUES (?, ?)"
+                     " ON CONFLICT (path) DO UPDATE SET updated = excluded.updated", (key, time.time()))
+        doc_id = conn.execute("SELECT doc_id FROM documents WHERE path = ?", (key,)).fetchone()[0]
+        if total_pages is not None:
+            stale = conn.execute("SELECT page_id FROM pages WHERE doc_id = ? AND page_num >= ?",
+                                 (doc_id, total_pages)).fetchall()
+            for (page_id,) in stale:
+                self._delete_page(conn, page_id)
+        conn.commit()
+        return DocumentIndex(self, doc_id)
+
+    def add_page(self, doc_id: int, result: dict):
+        """写入 (或替换) 一页识别结果并立即提交"""
+        conn = self._conn()
+        row = conn.execute("SELECT page_id FROM pages WHERE doc_id = ? AND page_num = ?",
+                           (doc_id, result['page_num'])).fetchone()
+        if row is not None:
+            self._delete_page(conn, row[0])
+        page_id = conn.execute("INSERT INTO pages (doc_id, page_num, width, height) VALUES (?, ?, ?, ?)",
+                               (doc_id, result['page_num'], result.get('width'), result.get('height'))).lastrowid
+        scale = 72 / (result.get('dpi') or 72)
+        lines = []
+        tokens = set()
+        for item in result.get('ocr_results') or []:
+            text = (item.get("text") or "").strip()
+            if not text:
+                continue
+            box = item.get("box")
+            if box:
+                xs = [point[0] * scale for point in box]
+                ys = [point[1] * scale for point in box]
+                bbox = (min(xs), min(ys), max(xs), max(ys))
+            else:
+                bbox = (None, None, None, None)
+            lines.append((page_id, len(lines), text, *bbox, item.get("confidence")))
+            tokens |= tokenize(normalize_text(text))
+        conn.executemany("INSERT INTO lines VALUES (?, ?, ?, ?, ?, ?, ?, ?)", lines)
+        conn.executemany("INSERT INTO postings VALUES (?, ?)", [(token, page_id) for token in tokens])
+        conn.commit()
+
+    def _delete_page(self, conn: sqlite3.Connection, page_id: int):
+        """删除一页: 由该页的原文重新分词得到它的索引词，按主键删除倒排记录"""
+        tokens = set()
+        for (text,) in conn.execute("SELECT text FROM lines WHERE page_id = ?", (page_id,)):
+            tokens |= tokenize(normalize_text(text))
+        conn.executemany("DELETE FROM postings WHERE token = ? AND page_id = ?",
+                         [(token, page_id) for token in tokens])
+        conn.execute("DELETE FROM lines WHERE page_id = ?", (page_id,))
+        conn.execute("DELETE FROM pages WHERE page_id = ?", (page_id,))
+
+    # --- 检索 ---
+
+    def search(self, query: str, limit: int = 50, document: str = None) -> list:
+        """检索包含查询中所有词 (以空白分隔) 的页，返回这些页中包含任一查询词的文字行
+        [{"document", "page_num", "line_no", "text", "bbox", "confidence"}, ...]，
+        按文档、页码、行号排序；bbox 为页面坐标 (点) [x0, y0, x1, y1]，document 限定只检索某个文档"""
+        terms = normalize_text(query).split()
+        tokens = {token for term in terms for token in query_tokens(term)}
+        if not tokens:
+            return []
+        conn = self._conn()
+        pages = self._candidate_pages(conn, tokens)
+        if not pages:
+            return []
+
+        # 候选页按文档、页码排序后逐页核对原文，取满 limit 条即停止
+        ordered = []
+        pages = sorted(pages)
+        doc_filter = os.path.abspath(document) if document is not None else None
+        for start in range(0, len(pages), _SQL_BATCH):
+            chunk = pages[start:start + _SQL_BATCH]
+            rows = conn.execute("SELECT pages.page_id, documents.path, pages.page_num FROM pages"
+                                " JOIN documents USING (doc_id)"
+                                f" WHERE pages.page_id IN ({','.join('?' * len(chunk))})", chunk)
+            ordered.extend(row for row in rows if doc_filter is None or row[1] == doc_filter)
+        ordered.sort(key=lambda row: (row[1], row[2]))
+
+        hits = []
+        for page_id, path, page_num in ordered:
+            lines = conn.execute("SELECT line_no, text, x0, y0, x1, y1, confidence FROM lines"
+                                 " WHERE page_id = ? ORDER BY line_no", (page_id,)).fetchall()
+            normalized = [normalize_text(line[1]) for line in lines]
+            # 二元组只保证每个词出现在页内，核对每个查询词确实连续出现在某一行
+            if not all(any(term in text for text in normalized) for term in terms):
+                continue
+            for (line_no, text, x0, y0, x1, y1, confidence), norm in zip(lines, normalized):
+                if any(term in norm for term in terms):
+                    hits.append({
+                        "document": path,
+                        "page_num": page_num,
+                        "line_no": line_no,
+                        "text": text,
+                        "bbox": [x0, y0, x1, y1] if x0 is not None else None,
+                        "confidence": confidence,
+                    })
+            if len(hits) >= limit:
+                break
+        return hits[:limit]
+
+    def _candidate_pages(self, conn: sqlite3.Connection, tokens: set) -> set:
+        """包含所有索引词的页 (从最短的倒排列表开始求交集)"""
+        postings = []
+        for token, prefix in tokens:
+            if prefix:
+                rows = conn.execute("SELECT DISTINCT page_id FROM postings WHERE token >= ? AND token < ?",
+                                    (token, token + _PREFIX_END))
+            else:
+                rows = conn.execute("SELECT page_id FROM postings WHERE token = ?", (token,))
+            page_ids = {row[0] for row in rows}
+            if not page_ids:
+                return set()
+            postings.append(page_ids)
+        postings.sort(key=len)
+        pages = postings[0]
+        for page_ids in postings[1:]:
+            pages &= page_ids
+            if not pages:
+                break
+        return pages
+
+    def stats(self) -> dict:
+        """已索引的文档数、页数、文字行数和索引词条数"""
+        conn = self._conn()
+        return {name: conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+                for name in ('documents', 'pages', 'lines', 'postings')}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class DocumentIndex:
+    """绑定到一个文档的索引写入器: 每页识别完成后调用 add(result)"""
+
+    def __init__(self, index: OcrIndex, doc_id: int):
+        self.index = index
+        self.doc_id = doc_id
+
+    def add(self, result: dict):
+        # 失败的页不写入索引，下次重新识别后再写入
+        if result.get('error'):
+            return
+        self.index.add_page(self.doc_id, result)
+
+
+def index_store(index: OcrIndex, store_path: str, document: str = None) -> int:
+    """把已有的 .ocrs 结果文件写入索引 (document 默认为结果文件路径)，返回写入的页数"""
+    with OcrStore(store_path) as store:
+        doc_index = index.document(document or store_path)
+        for result in store.iter_pages():
+            doc_index.add(result)
+        return len(store)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="识别结果全文检索")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="索引文件")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("search", help="检索关键词 (多个词以空格分隔，须出现在同一页)")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--document", default=None, help="只检索这个文档")
+    p = sub.add_parser("add", help="把 .ocrs 结果文件写入索引")
+    p.add_argument("stores", nargs="+")
+    p.add_argument("--document", default=None, help="结果文件对应的PDF (只有一个结果文件时可用)")
+    sub.add_parser("stats", help="索引规模")
+    args = parser.parse_args(argv)
+
+    index = OcrIndex(args.index)
+    if args.command == "search":
+        start = time.perf_counter()
+        hits = index.search(args.query, args.limit, args.document)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            bbox = ", ".join(f"{v:.0f}" for v in hit["bbox"]) if hit["bbox"] else "-"
+            print(f"{hit['document']} 第 {hit['page_num'] + 1} 页 [{bbox}] {hit['text']}")
+        print(f"共 {len(hits)} 条结果 ({elapsed_ms:.1f} ms)")
+    elif args.command == "add":
+        for store_path in args.stores:
+            pages = index_store(index, store_path, args.document if len(args.stores) == 1 else None)
+            print(f"✅ {store_path}: 已索引 {pages} 页")
+    else:
+        for name, count in index.stats().items():
+            print(f"{name}: {count}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+后台识别任务
+
+上千页的文档无法在一次 HTTP 请求内识别完: 提交文档后立即返回任务 ID，
+由有界的工作线程池在后台处理，客户端轮询进度 (已完成页数、页/秒、预计剩余时间)，
+完成后下载结果。任务保存在本地 SQLite 中，服务重启后排队中和已完成的任务都还在，
+重启前正在运行的任务重新排队 (配合断点续跑日志，只需识别剩余页面)。
+
+调度时优先级高的任务先运行，同一客户端同时运行的任务数受限，
+一本很大的书不会占满所有工作线程而让其他客户端的小文档一直排队。
+"""
+import os
+import sqlite3
+import threading
+import time
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# 各结果格式对应的输出文件名
+OUTPUT_FILES = {
+    'txt': 'output.txt',
+    'json': 'output.json',
+    'pdf': 'output.pdf',
+}
+
+
+def job_output_path(job: dict, fmt: str) -> str:
+    """任务某种格式结果的文件路径"""
+    return os.path.join(job['output_dir'], OUTPUT_FILES[fmt])
+
+
+class JobStore:
+    """SQLite 任务表（线程安全）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " client TEXT NOT NULL,"
+            " priority INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " input_path TEXT NOT NULL,"
+            " output_dir TEXT NOT NULL,"
+            " save_pdf INTEGER NOT NULL,"
+            " total_pages INTEGER,"
+            " pages_done INTEGER NOT NULL DEFAULT 0,"
+            " run_start_pages INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL,"
+            " started REAL,"
+            " finished REAL,"
+            " error TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority, created)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._conn()
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+
+    def create(self, job_id: str, client: str, priority: int, input_path: str,
+               output_dir: str, save_pdf: bool, total_pages: int = None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO jobs (id, client, priority, status, input_path, output_dir, save_pdf,"
+            " total_pages, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, client, priority, QUEUED, input_path, output_dir, int(save_pdf),
+             total_pages, time.time()),
+        )
+        conn.commit()
+
+    def get(self, job_id: str):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def queued(self) -> list:
+        """排队中的任务，按优先级从高到低、提交时间从早到晚"""
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created", (QUEUED,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_running(self) -> int:
+        """把上次退出时仍在运行的任务重新排队，返回任务数"""
+        conn = self._conn()
+        count = conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+        conn.commit()
+        return count
+
+    def mark_running(self, job_id: str):
+        self._update(job_id, status=RUNNING, started=time.time(), error=None)
+
+    def update_progress(self, job_id: str, pages_done: int, total_pages: int, run_start: bool = False):
+        if run_start:
+            # 记录本次运行开始时已完成的页数 (断点续跑)，用于计算速度
+            self._update(job_id, pages_done=pages_done, total_pages=total_pages,
+                         run_start_pages=pages_done)
+        else:
+            self._update(job_id, pages_done=pages_done, total_pages=total_pages)
+
+    def mark_done(self, job_id: str):
+        self._update(job_id, status=DONE, finished=time.time())
+
+    def mark_failed(self, job_id: str, error: str):
+        self._update(job_id, status=FAILED, finished=time.time(), error=error)
+
+
+class JobManager:
+    """有界工作线程池: 按优先级和每客户端并发上限调度任务"""
+
+    def __init__(self, store: JobStore, run_job, max_workers: int = 2, max_jobs_per_client: int = 1):
+        # run_job(job, progress) 执行一个任务，progress(已完成页数, 总页数) 汇报进度
+        self.store = store
+        self.run_job = run_job
+        self.max_jobs_per_client = max(1, max_jobs_per_client)
+        self._cond = threading.Condition()
+        self._running = {}  # client -> 正在运行的任务数
+
+        requeued = store.requeue_running()
+        if requeued:
+            print(f"任务恢复: {requeued} 个中断的任务已重新排队")
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"ocr-job-{i}", daemon=True)
+            for i in range(max(1, max_workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_id: str, client: str, priority: int, input_path: str,
+               output_dir: str, save_pdf: bool, total_pages: int = None):
+        """登记新任务并唤醒空闲的工作线程"""
+        self.store.create(job_id, client, priority, input_path, output_dir, save_pdf, total_pages)
+        with self._cond:
+            self._cond.notify()
+
+    def _next_job(self):
+        """取出下一个可运行的任务 (调用方持有锁)"""
+        for job in self.store.queued():
+            if self._running.get(job['client'], 0) < self.max_jobs_per_client:
+                self._running[job['client']] = self._running.get(job['client'], 0) + 1
+                self.store.mark_running(job['id'])
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self._running[job['client']] -= 1
+                    self._cond.notify_all()
+
+    def _run(self, job: dict):
+        job_id = job['id']
+        first_report = [True]
+
+        def progress(pages_done: int, total_pages: int):
+            self.store.update_progress(job_id, pages_done, total_pages, run_start=first_report[0])
+            first_report[0] = False
+
+        try:
+            self.run_job(job, progress)
+        except Exception as e:
+            print(f"\n任务 {job_id} 失败: {e}")
+            self.store.mark_failed(job_id, str(e))
+            return
+        self.store.mark_done(job_id)
+
+    def status(self, job_id: str):
+        """任务状态，包含进度、速度 (页/秒) 和预计剩余时间；任务不存在时返回 None"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        total = job['total_pages']
+        done = job['pages_done']
+        pages_per_sec = None
+        eta_seconds = None
+        if job['status'] == RUNNING and job['started']:
+            elapsed = time.time() - job['started']
+            processed = done - job['run_start_pages']
+            if processed > 0 and elapsed > 0:
+                pages_per_sec = processed / elapsed
+                if total:
+                    eta_seconds = (total - done) / pages_per_sec
+        elif job['status'] == DONE and job['started'] and job['finished'] > job['started']:
+            pages_per_sec = (done - job['run_start_pages']) / (job['finished'] - job['started'])
+
+        status = {
+            'job_id': job_id,
+            'status': job['status'],
+            'priority': job['priority'],
+            'pages_done': done,
+            'total_pages': total,
+            'progress': done / total if total else 0.0,
+            'pages_per_sec': round(pages_per_sec, 3) if pages_per_sec is not None else None,
+            'eta_seconds': round(eta_seconds, 1) if eta_seconds is not None else None,
+            'created': job['created'],
+            'started': job['started'],
+            'finished': job['finished'],
+            'error': job['error'],
+        }
+        if job['status'] == QUEUED:
+            queued = [q['id'] for q in self.store.queued()]
+            status['queue_position'] = queued.index(job_id) + 1 if job_id in queued else None
+        if job['status'] == DONE:
+            status['formats'] = [fmt for fmt in OUTPUT_FILES if os.path.exists(job_output_path(job, fmt))]
+        return status
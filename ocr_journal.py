@@ -0,0 +1,89 @@
+"""
+断点续跑日志
+
+每完成一页就向 <journal_dir>/<任务键>.jsonl 追加一行识别结果。
+任务键由输入文件的哈希和 DPI/引擎等设置决定，中断后用相同设置重新运行
+同一个文件时，会跳过日志中已完成的页面。
+"""
+import hashlib
+import json
+import os
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """分块计算文件的 SHA-256，避免把大文件整个读入内存"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def journal_key(input_path: str, settings: dict) -> str:
+    """由输入文件哈希和处理设置生成任务键"""
+    settings_json = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    settings_digest = hashlib.sha256(settings_json.encode('utf-8')).hexdigest()
+    return f"{file_digest(input_path)[:32]}-{settings_digest[:12]}"
+
+
+class PageJournal:
+    """追加写入的逐页结果日志 (JSON Lines)"""
+
+    # 写入日志的字段 (不包含页面图片)
+    FIELDS = ('page_num', 'width', 'height', 'dpi', 'ocr_results')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @classmethod
+    def for_input(cls, journal_dir: str, input_path: str, settings: dict) -> 'PageJournal':
+        """按输入文件和设置定位对应的日志文件"""
+        os.makedirs(journal_dir, exist_ok=True)
+        key = journal_key(input_path, settings)
+        return cls(os.path.join(journal_dir, f"{key}.jsonl"))
+
+    def load(self) -> dict:
+        """读取已完成的页面，返回 {page_num: 结果}；忽略中断时写了一半的行"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['page_num']] = record
+        return records
+
+    def append(self, result: dict):
+        """追加一页结果并立即刷新到磁盘"""
+        if self._file is None:
+            self._file = self._open_for_append()
+        record = {name: result.get(name) for name in self.FIELDS}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _open_for_append(self):
+        """以追加方式打开日志，若上次中断在行中间则先补一个换行"""
+        needs_newline = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        f = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            f.write("\n")
+        return f
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
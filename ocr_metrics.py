@@ -0,0 +1,180 @@
+"""
+服务指标
+
+各处理阶段 (解码、检测、识别、格式化、序列化等) 的耗时记入直方图，
+由 /metrics 以 Prometheus 文本格式输出。记录一次只是加锁后累加几个计数，
+不做任何 I/O，可以放在请求热路径上。
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的默认分桶 (秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """按标签区分的累积直方图（线程安全）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # 标签值 -> [各分桶计数, 总和, 次数]
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(counts), total, count)
+                        for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Counter:
+    """按标签区分的计数器（线程安全）"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """在输出指标时才取值的量 (如调度队列深度)，kind="counter" 用于读取别处维护的累计值"""
+
+    def __init__(self, name: str, documentation: str, read, kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(self.read())}"]
+
+
+class MetricsRegistry:
+    """一组指标，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 本进程的默认指标
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("ocr_stage_seconds", "Time spent in each processing stage", ("stage",)))
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram("ocr_request_seconds", "HTTP request handling time until the response starts", ("endpoint",)))
+REQUESTS_TOTAL = REGISTRY.register(
+    Counter("ocr_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "code")))
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """记录 with 块耗时到 ocr_stage_seconds{stage=...}"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def register_scheduler(scheduler):
+    """把调度器的队列深度和累计批次/图片数作为指标输出"""
+    REGISTRY.register(Gauge("ocr_scheduler_queue_depth", "Items waiting in the inference queue",
+                            lambda: scheduler.stats()['queue_depth']))
+    REGISTRY.register(Gauge("ocr_scheduler_batches_total", "Batches run by the inference scheduler",
+                            lambda: scheduler.stats()['batches'], kind="counter"))
+    REGISTRY.register(Gauge("ocr_scheduler_images_total", "Images recognized by the inference scheduler",
+                            lambda: scheduler.stats()['images'], kind="counter"))
+    REGISTRY.register(Gauge("ocr_scheduler_rejected_total", "Submissions rejected because the queue was full",
+                            lambda: scheduler.stats()['rejected'], kind="counter"))
+    REGISTRY.register(Gauge("ocr_scheduler_avg_queue_wait_seconds", "Average time items wait in the queue",
+                            lambda: scheduler.stats()['avg_queue_wait_ms'] / 1000))
+
+
+def instrument_flask(app):
+    """为 Flask 应用记录每个请求的耗时和状态码，并添加 GET /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, 'metrics_start', None)
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        if start is not None and endpoint != "/metrics":
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            REQUESTS_TOTAL.inc(endpoint, str(response.status_code))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus 指标"""
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
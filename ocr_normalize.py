@@ -0,0 +1,185 @@
+"""
+引擎识别结果的统一解析
+
+PaddleOCR 不同版本对单张图片的返回格式不同:
+- 3.x predict: 带 rec_texts / rec_scores / rec_polys (rec_boxes) 键的字典 (OCRResult)
+- 部分版本: 带同名属性的结果对象
+- 2.x ocr: [[box, (text, score)], ...]
+
+normalize_result 把它们统一转换为列式的 OcrLines (坐标和置信度为 NumPy 数组，文字为列表)，
+过滤、去重都在数组上完成，只有输出 JSON 时才按行生成字典。
+坐标在第一次用到 .boxes 时才转换为数组，只需要文字的调用方 (如聊天接口) 不承担这部分开销。
+每种结果类型 (即每种引擎版本的输出格式) 只判断一次格式，之后直接使用缓存的解析函数。
+"""
+import operator
+
+import numpy as np
+
+
+class OcrLines:
+    """一张图片的识别结果 (列式)"""
+
+    __slots__ = ('_boxes', 'scores', 'texts')
+
+    def __init__(self, boxes, scores, texts: list):
+        # boxes: (N, K, 2) 各行多边形顶点 (一般 K=4)，或引擎原样给出的逐行坐标列表；引擎未给出坐标时为 None
+        # scores: (N,) float64 置信度；texts: N 个字符串
+        self._boxes = boxes
+        self.scores = scores
+        self.texts = texts
+
+    @property
+    def boxes(self):
+        """(N, K, 2) 坐标数组，保留引擎输出的数值类型；无法组成数组时为 None"""
+        if self._boxes is not None and not isinstance(self._boxes, np.ndarray):
+            self._boxes = _as_boxes(self._boxes, len(self.texts))
+        return self._boxes
+
+    @classmethod
+    def empty(cls) -> "OcrLines":
+        return cls(None, np.zeros(0, dtype=np.float64), [])
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def select(self, mask) -> "OcrLines":
+        """按布尔掩码保留部分行"""
+        mask = np.asarray(mask, dtype=bool)
+        if mask.all():
+            return self
+        if not mask.any():
+            return OcrLines.empty()
+        texts = [text for text, keep in zip(self.texts, mask) if keep]
+        boxes = self._boxes
+        if isinstance(boxes, np.ndarray):
+            boxes = boxes[mask]
+        elif boxes is not None:
+            boxes = [box for box, keep in zip(boxes, mask) if keep]
+        return OcrLines(boxes, self.scores[mask], texts)
+
+    def drop_blank(self) -> "OcrLines":
+        """去掉空白文字的行"""
+        # 大多数页面没有空白行，先做一次快速检查
+        if all(map(str.strip, self.texts)):
+            return self
+        return self.select([bool(text.strip()) for text in self.texts])
+
+    def dedup_consecutive(self) -> "OcrLines":
+        """去掉与上一行文字相同的行"""
+        texts = self.texts
+        keep = [True] + list(map(operator.ne, texts[1:], texts[:-1]))
+        return self.select(keep) if texts else self
+
+    def with_boxes(self, boxes) -> "OcrLines":
+        return OcrLines(boxes, self.scores, self.texts)
+
+    def to_dicts(self, with_box: bool = True) -> list:
+        """转换为 [{"box", "text", "confidence"}, ...] (with_box=False 时不含 box)"""
+        if not self.texts:
+            return []
+        scores = self.scores.tolist()
+        if not with_box:
+            return [{"text": text, "confidence": score} for text, score in zip(self.texts, scores)]
+        boxes = self._boxes
+        if boxes is None:
+            boxes = [None] * len(self.texts)
+        elif isinstance(boxes, np.ndarray) or isinstance(boxes[0], np.ndarray):
+            # 逐行的小数组先拼成一个数组再整体 tolist，比逐个转换快
+            array = self.boxes
+            boxes = array.tolist() if array is not None else [_plain(box) for box in boxes]
+        return [{"box": box, "text": text, "confidence": score}
+                for box, text, score in zip(boxes, self.texts, scores)]
+
+    def text(self, sep: str = "\n") -> str:
+        return sep.join(self.texts)
+
+
+def _plain(box):
+    return box.tolist() if hasattr(box, 'tolist') else box
+
+
+def _as_boxes(value, count: int):
+    """把引擎给出的坐标统一为 (N, K, 2) 数组: 支持多边形顶点和 [x1, y1, x2, y2] 矩形，无法识别时返回 None"""
+    if value is None:
+        return None
+    try:
+        boxes = np.asarray(value)
+    except ValueError:  # 各行顶点数不同
+        return None
+    if boxes.dtype == object or boxes.ndim == 0 or len(boxes) != count:
+        return None
+    if boxes.ndim == 2 and boxes.shape[1] == 4:
+        x1, y1, x2, y2 = boxes.T
+        return np.stack([np.stack([x1, y1], -1), np.stack([x2, y1], -1),
+                         np.stack([x2, y2], -1), np.stack([x1, y2], -1)], axis=1)
+    if boxes.ndim == 3 and boxes.shape[2] == 2:
+        return boxes
+    return None
+
+
+def _columns(texts, scores, polys, rects) -> OcrLines:
+    texts = list(texts) if texts is not None else []
+    if not texts:
+        return OcrLines.empty()
+    # 多边形坐标原样保留，用到时再转换；只有矩形坐标 [x1, y1, x2, y2] 时直接展开为四个顶点
+    boxes = polys if polys is not None and len(polys) == len(texts) else _as_boxes(rects, len(texts))
+    return OcrLines(boxes, np.asarray(scores, dtype=np.float64).reshape(-1)[:len(texts)], texts)
+
+
+def _parse_mapping(item) -> OcrLines:
+    """3.x 字典格式 (OCRResult)"""
+    if 'rec_texts' not in item or 'rec_scores' not in item:
+        return OcrLines.empty()
+    return _columns(item['rec_texts'], item['rec_scores'], item.get('rec_polys'), item.get('rec_boxes'))
+
+
+def _parse_attributes(item) -> OcrLines:
+    """带 rec_texts / rec_scores 属性的结果对象"""
+    return _columns(item.rec_texts, item.rec_scores,
+                    getattr(item, 'rec_polys', None), getattr(item, 'rec_boxes', None))
+
+
+def _parse_legacy(item) -> OcrLines:
+    """2.x 列表格式 [[box, (text, score)], ...]"""
+    boxes, texts, scores = [], [], []
+    for line in item:
+        if line and len(line) >= 2:
+            info = line[1]
+            if isinstance(info, (tuple, list)) and len(info) >= 2:
+                boxes.append(line[0])
+                texts.append(info[0])
+                scores.append(info[1])
+    if not texts:
+        return OcrLines.empty()
+    return OcrLines(boxes, np.asarray(scores, dtype=np.float64), texts)
+
+
+def _parse_unknown(item) -> OcrLines:
+    return OcrLines.empty()
+
+
+def _detect_parser(item):
+    if isinstance(item, dict):
+        return _parse_mapping
+    if hasattr(item, 'rec_texts') and hasattr(item, 'rec_scores'):
+        return _parse_attributes
+    if isinstance(item, (list, tuple)):
+        return _parse_legacy
+    return _parse_unknown
+
+
+# 单张图片结果的类型 -> 解析函数
+_parsers = {}
+
+
+def normalize_result(result) -> OcrLines:
+    """把引擎对单张图片的返回值 ([结果] 或结果本身) 转换为 OcrLines"""
+    if not result:
+        return OcrLines.empty()
+    item = result[0] if isinstance(result, list) else result
+    if item is None:
+        return OcrLines.empty()
+    parser = _parsers.get(type(item))
+    if parser is None:
+        parser = _parsers[type(item)] = _detect_parser(item)
+    return parser(item)
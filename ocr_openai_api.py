@@ -1,17 +1,65 @@
-from flask import Flask, request, jsonify
-from paddleocr import PaddleOCR
-import base64
+from flask import Flask, Response, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import json
+import logging
 import numpy as np
 import cv2
 import time
 import uuid
 
+from ocr_engine import LazyEngine
+from ocr_metrics import instrument_flask, register_scheduler, stage_timer
+from ocr_normalize import OcrLines, normalize_result
+from ocr_scheduler import BatchScheduler, QueueFullError
+from ocr_upload import decode_base64_image, is_binary_upload, read_uploaded_images
+
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# 调度器: 每批最多图片数、收集一批的最长等待 (毫秒)、排队上限 (超过返回 429)
+MAX_BATCH_SIZE = 8
+MAX_BATCH_WAIT_MS = 10
+MAX_QUEUE_SIZE = 64
+# 一个请求的图片逐张等待队列空位，等待超过此秒数仍满时返回 429
+QUEUE_WAIT_TIMEOUT = 5
+# 单个请求等待识别结果的超时时间 (秒)，超时返回 503
+REQUEST_TIMEOUT = 120
+# 流式输出 (stream=true): 每次送入识别模型的文本行数，以及丢弃的低置信度阈值
+STREAM_LINE_GROUP = 4
+STREAM_DROP_SCORE = 0.5
+# 日志级别: 改为 "DEBUG" 输出每个请求的解析细节和识别文本 (会拖慢高并发下的请求)
+LOG_LEVEL = "INFO"
+# 引擎加载后先对合成图片推理一次，第一个真实请求不再承担初始化开销
+WARMUP_ENGINE = True
+
+
+def create_engine():
+    """创建 PaddleOCR 实例"""
+    from paddleocr import PaddleOCR
+    return PaddleOCR(lang="ch")
+
 
-# 初始化 PaddleOCR
-print("正在初始化 PaddleOCR...")
-ocr = PaddleOCR(lang="ch")
-print("PaddleOCR 初始化完成!")
+# 引擎在服务启动后于后台线程中加载 (或由第一次推理触发)，导入本模块时不加载模型
+engine = LazyEngine(create_engine, warmup=WARMUP_ENGINE)
+
+
+@stage_timer('inference')
+def run_ocr_batch(imgs: list) -> list:
+    """对一批图片推理，返回与输入一一对应的原始结果"""
+    ocr = engine.get()
+    if hasattr(ocr, 'predict'):
+        # 新版 predict 支持列表输入，整批推理
+        return [[item] for item in ocr.predict(imgs)]
+    return [ocr.ocr(img) for img in imgs]
+
+
+# 所有请求共享一个调度线程，引擎只在该线程中被调用
+scheduler = BatchScheduler(run_ocr_batch, max_batch_size=MAX_BATCH_SIZE,
+                           max_wait_ms=MAX_BATCH_WAIT_MS, max_queue_size=MAX_QUEUE_SIZE)
+# 请求耗时、各阶段耗时直方图和调度器状态由 GET /metrics 输出
+register_scheduler(scheduler)
+instrument_flask(app)
 
 # 模拟的模型列表
 MODELS = {
@@ -23,6 +71,161 @@ MODELS = {
     }
 }
 
+@stage_timer('formatting')
+def parse_ocr_result(result) -> OcrLines:
+    """将引擎对单张图片的返回值解析为 OcrLines，并去掉空白行和连续重复的行"""
+    lines = normalize_result(result).drop_blank().dedup_consecutive()
+    logger.debug("OCR文本行数: %d", len(lines))
+    return lines
+
+
+def sort_boxes(boxes) -> list:
+    """按阅读顺序 (从上到下、同一行从左到右) 排列检测到的文本框"""
+    boxes = sorted((np.asarray(box, dtype=np.float32) for box in boxes),
+                   key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_text_region(img, box):
+    """按四边形文本框透视裁剪出一行文字，竖排的行旋转为横排"""
+    width = int(max(np.linalg.norm(box[0] - box[1]), np.linalg.norm(box[2] - box[3])))
+    height = int(max(np.linalg.norm(box[0] - box[3]), np.linalg.norm(box[1] - box[2])))
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(box, target)
+    crop = cv2.warpPerspective(img, matrix, (width, height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if height >= width * 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def supports_split_inference() -> bool:
+    """引擎是否支持分开调用检测和识别 (2.x 的 ocr(det=, rec=)；3.x 的 predict 只能整体调用)"""
+    return not hasattr(engine.get(), 'predict')
+
+
+@stage_timer('detection')
+def detect_text(img) -> list:
+    """(调度线程) 只做文字检测，返回按阅读顺序排列的文本框"""
+    result = engine.get().ocr(img, rec=False)
+    return sort_boxes(result[0] if result and result[0] is not None else [])
+
+
+@stage_timer('recognition')
+def recognize_crops(crops: list) -> list:
+    """(调度线程) 对一组文本行图片只做识别，返回 [(文字, 置信度), ...]"""
+    ocr = engine.get()
+    recognizer = getattr(ocr, 'text_recognizer', None)
+    if recognizer is not None:
+        # 2.x 的识别器直接接受行图片列表并整批识别，返回 (结果, 耗时)
+        rec_results, _ = recognizer(crops)
+        return [(text, score) for text, score in rec_results]
+    # ocr(列表, det=False) 的含义随版本不同 (2.7 为多张图片，2.8 起为一张图片的各行)，逐行调用
+    return [ocr.ocr(crop, det=False, cls=False)[0][0] for crop in crops]
+
+
+def iter_recognized_lines(img, detection=None):
+    """检测完成后分组识别文本行，每组识别完立即逐行产出 (去掉连续重复的行)"""
+    # detection 为已提交的检测 Future，None 时轮到这张图片才提交检测
+    if detection is None:
+        detection = scheduler.call(detect_text, img, block=True)
+    boxes = detection.result(timeout=REQUEST_TIMEOUT)
+    prev_text = None
+    # 第一组只识别一行，首个文字的延迟接近检测耗时
+    starts = [0] + list(range(1, len(boxes), STREAM_LINE_GROUP))
+    for start, end in zip(starts, starts[1:] + [len(boxes)]):
+        if start >= end:
+            break
+        crops = [crop_text_region(img, box) for box in boxes[start:end]]
+        rec_results = scheduler.call(recognize_crops, crops, block=True).result(timeout=REQUEST_TIMEOUT)
+        for text, score in rec_results:
+            if text and score >= STREAM_DROP_SCORE and text != prev_text:
+                yield text
+                prev_text = text
+
+
+def iter_full_result_lines(future):
+    """不支持分步推理时，等待整张图片识别完成后逐行产出"""
+    yield from parse_ocr_result(future.result(timeout=REQUEST_TIMEOUT)).texts
+
+
+def iter_content_lines(sources: list):
+    """把各图片的识别行按顺序拼成回复内容的各行，多张图片时加分页标记"""
+    # sources 与图片一一对应: 逐行产出文字的可迭代对象，解码失败的图片为 None
+    multi = len(sources) > 1
+    for index, lines in enumerate(sources, 1):
+        if multi:
+            if index > 1:
+                yield ""
+            yield f"===== 第 {index} 页 ====="
+        if lines is None:
+            if multi:
+                yield "(图片解码失败)"
+            continue
+        has_text = False
+        for text in lines:
+            has_text = True
+            yield text
+        if multi and not has_text:
+            yield "(此页无文本内容)"
+
+
+def stream_chat_completion(model: str, imgs: list, input_text):
+    """以 chat.completion.chunk 的 SSE 流返回识别结果，每识别出一行发送一次"""
+    # 第一张图片的检测 (或所有图片的整图识别) 在开始响应前提交，队列满/超时仍可返回 429/503
+    if supports_split_inference():
+        sources = []
+        first_detection = True
+        for img in imgs:
+            if img is None:
+                sources.append(None)
+                continue
+            detection = scheduler.call(detect_text, img) if first_detection else None
+            first_detection = False
+            sources.append(iter_recognized_lines(img, detection))
+    else:
+        futures = scheduler.submit_many(imgs, timeout=QUEUE_WAIT_TIMEOUT)
+        sources = [iter_full_result_lines(future) if future is not None else None for future in futures]
+    
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:8]}"
+    created = int(time.time())
+    
+    def chunk(delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    def generate():
+        yield chunk({"role": "assistant", "content": ""})
+        line_count = 0
+        try:
+            for text in iter_content_lines(sources):
+                yield chunk({"content": text if line_count == 0 else "\n" + text})
+                line_count += 1
+        except Exception as e:
+            error = {"error": {"message": str(e) or "OCR request timed out",
+                               "type": "server_error", "code": "ocr_error"}}
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+        if line_count == 0:
+            yield chunk({"content": input_text or "未识别到文字"})
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/v1/models', methods=['GET'])
 def list_models():
     """列出可用模型 (兼容 OpenAI API)"""
@@ -67,13 +270,23 @@ def chat_completions():
         ]
     }
     """
+    if is_binary_upload(request):
+        # 聊天接口只接受 JSON 请求体，直接上传图片文件请使用 /v1/ocr
+        return jsonify({
+            "error": {
+                "message": "Chat completions expect a JSON body; upload image files to /v1/ocr",
+                "type": "invalid_request_error",
+                "code": "unsupported_media_type"
+            }
+        }), 415
     try:
         data = request.json
         messages = data.get('messages', [])
         model = data.get('model', 'paddleocr-v5')
+        stream = bool(data.get('stream'))
         
-        # 提取图片和文本
-        image_data = None
+        # 提取所有消息中的图片 (按出现顺序) 和文本
+        image_urls = []
         input_text = None
         
         for message in messages:
@@ -88,107 +301,52 @@ def chat_completions():
                     if item.get('type') == 'text':
                         input_text = item.get('text', '')
                     elif item.get('type') == 'image_url':
-                        image_url = item.get('image_url', {}).get('url', '')
-                        if image_url.startswith('data:image'):
-                            # 提取 base64 数据
-                            image_data = image_url.split(',')[1] if ',' in image_url else image_url
-                        else:
-                            image_data = image_url
+                        # data:image/...;base64, 前缀在解码时去掉，不额外拷贝整段字符串
+                        image_urls.append(item.get('image_url', {}).get('url', ''))
         
-        # OCR 识别结果
-        ocr_results = []
-        
-        # 如果有图片,进行 OCR 识别
-        if image_data:
+        # 解码图片，失败的图片记为 None
+        imgs = []
+        for image_url in image_urls:
             try:
-                # 解码图片
-                img_bytes = base64.b64decode(image_data)
-                nparr = np.frombuffer(img_bytes, np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if img is not None:
-                    # OCR识别
-                    result = ocr.ocr(img)
-                    
-                    print(f"[DEBUG] OCR原始结果类型: {type(result)}")
-                    
-                    # 格式化结果 - 处理多种返回格式
-                    if result:
-                        ocr_result = result[0] if isinstance(result, list) and len(result) > 0 else result
-                        
-                        print(f"[DEBUG] OCR result[0] 类型: {type(ocr_result)}")
-                        
-                        # 方式1: 字典格式 (新版PaddleOCR)
-                        if isinstance(ocr_result, dict):
-                            print(f"[DEBUG] 字典格式，键: {ocr_result.keys()}")
-                            
-                            if 'rec_texts' in ocr_result and 'rec_scores' in ocr_result:
-                                rec_texts = ocr_result['rec_texts']
-                                rec_scores = ocr_result['rec_scores']
-                                
-                                print(f"[DEBUG] 找到 rec_texts，数量: {len(rec_texts)}")
-                                
-                                prev_text = None
-                                for text, score in zip(rec_texts, rec_scores):
-                                    if text and text != prev_text:  # 去重
-                                        ocr_results.append({
-                                            "text": text,
-                                            "confidence": float(score)
-                                        })
-                                        prev_text = text
-                        
-                        # 方式2: 对象属性格式
-                        elif hasattr(ocr_result, 'rec_texts') and hasattr(ocr_result, 'rec_scores'):
-                            rec_texts = ocr_result.rec_texts
-                            rec_scores = ocr_result.rec_scores
-                            
-                            print(f"[DEBUG] 对象属性格式 - 文本数: {len(rec_texts)}")
-                            
-                            prev_text = None
-                            for text, score in zip(rec_texts, rec_scores):
-                                if text and text != prev_text:  # 去重
-                                    ocr_results.append({
-                                        "text": text,
-                                        "confidence": float(score)
-                                    })
-                                    prev_text = text
-                        
-                        # 方式3: 标准列表格式 [[[box], (text, score)], ...]
-                        elif isinstance(ocr_result, list):
-                            print(f"[DEBUG] 列表格式 - 行数: {len(ocr_result)}")
-                            
-                            prev_text = None
-                            for line in ocr_result:
-                                if line and len(line) >= 2:
-                                    text_info = line[1]
-                                    if isinstance(text_info, (tuple, list)) and len(text_info) >= 2:
-                                        text = text_info[0]
-                                        score = text_info[1]
-                                        
-                                        if text and text != prev_text:  # 去重
-                                            ocr_results.append({
-                                                "text": text,
-                                                "confidence": float(score)
-                                            })
-                                            prev_text = text
-                    
-                    print(f"[DEBUG] 最终OCR结果数: {len(ocr_results)}")
+                with stage_timer('decode'):
+                    imgs.append(decode_base64_image(image_url))
             except Exception as e:
-                print(f"[DEBUG] 图片处理错误: {e}")
+                logger.warning("图片解码错误: %s", e)
+                imgs.append(None)
         
-        print(f"[DEBUG] 准备返回 - OCR结果数: {len(ocr_results)}, 输入文本: {input_text is not None}")
+        if stream:
+            # 流式输出: 检测完成后逐行返回识别结果
+            return stream_chat_completion(model, imgs, input_text)
         
-        # 直接返回纯文本，不要任何Markdown或特殊格式
-        content_lines = []
+        # 所有图片交给调度器合并成批推理 (图片多于队列上限时逐张等待空位)
+        futures = scheduler.submit_many(imgs, timeout=QUEUE_WAIT_TIMEOUT)
         
-        # 方式1：只返回识别的文本（推荐，最简洁）
-        if ocr_results:
-            # 直接输出每行文本，不带序号和置信度
-            for item in ocr_results:
-                content_lines.append(item['text'])
+        # 逐张收集结果，ocr_images 为每张图片的识别明细 (扩展字段)
+        ocr_images = []
+        sources = []
+        for index, future in enumerate(futures):
+            if future is None:
+                ocr_images.append({"index": index, "status": "101", "msg": "Image decode failed", "results": []})
+                sources.append(None)
+                continue
+            try:
+                lines = parse_ocr_result(future.result(timeout=REQUEST_TIMEOUT))
+                ocr_images.append({"index": index, "status": "000", "msg": "Success",
+                                   "results": lines.to_dicts(with_box=False)})
+            except FutureTimeoutError:
+                scheduler.cancel(futures)
+                raise
+            except Exception as e:
+                logger.warning("图片 %d 识别失败: %s", index, e)
+                lines = OcrLines.empty()
+                ocr_images.append({"index": index, "status": "500", "msg": str(e), "results": []})
+            sources.append(lines.texts)
+        
+        # 直接返回纯文本，不要任何Markdown或特殊格式；多张图片时按顺序拼接并加分页标记
+        content_lines = list(iter_content_lines(sources))
         
         # 如果有输入文本但没有OCR结果
-        if input_text and not ocr_results:
+        if input_text and not content_lines:
             content_lines.append(input_text)
         
         # 如果什么都没有
@@ -197,13 +355,15 @@ def chat_completions():
         
         recognized_text = "\n".join(content_lines)
         
-        print(f"[DEBUG] 最终文本长度: {len(recognized_text)} 字符")
-        print(f"[DEBUG] 文本行数: {len(content_lines)}")
-        if len(recognized_text) > 200:
-            print(f"[DEBUG] 文本前100字符: {recognized_text[:100]}")
-            print(f"[DEBUG] 文本后100字符: {recognized_text[-100:]}")
-        else:
-            print(f"[DEBUG] 完整文本: {recognized_text}")
+        # 调试日志只在开启 DEBUG 级别时才切片、格式化识别文本
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("图片数: %d, 输入文本: %s, 文本长度: %d 字符, 行数: %d",
+                         len(imgs), input_text is not None, len(recognized_text), len(content_lines))
+            if len(recognized_text) > 200:
+                logger.debug("文本前100字符: %s", recognized_text[:100])
+                logger.debug("文本后100字符: %s", recognized_text[-100:])
+            else:
+                logger.debug("完整文本: %s", recognized_text)
         
         # 返回标准 OpenAI 格式的响应
         response = {
@@ -225,13 +385,100 @@ def chat_completions():
                 "prompt_tokens": 100,
                 "completion_tokens": len(recognized_text),
                 "total_tokens": 100 + len(recognized_text)
-            }
+            },
+            # 扩展字段: 每张图片的识别明细 (与请求中的图片顺序一致)
+            "ocr_images": ocr_images
         }
         
-        print(f"[DEBUG] 返回response - content长度: {len(response['choices'][0]['message']['content'])}")
+        with stage_timer('serialization'):
+            return jsonify(response)
         
-        return jsonify(response)
+    except QueueFullError as e:
+        return jsonify({
+            "error": {
+                "message": str(e),
+                "type": "rate_limit_error",
+                "code": "queue_full"
+            }
+        }), 429
+    except FutureTimeoutError:
+        return jsonify({
+            "error": {
+                "message": "OCR request timed out",
+                "type": "server_error",
+                "code": "timeout"
+            }
+        }), 503
+    except Exception as e:
+        return jsonify({
+            "error": {
+                "message": str(e),
+                "type": "internal_error",
+                "code": "ocr_error"
+            }
+        }), 500
+
+@app.route('/v1/ocr', methods=['POST'])
+def ocr_image():
+    """
+    简化的 OCR 接口，支持三种请求体:
+    - application/json: {"image": "<base64>"}
+    - application/octet-stream (或 image/*): 请求体即图片文件
+    - multipart/form-data: 上传的第一个文件
+    """
+    try:
+        if is_binary_upload(request):
+            # 直接从请求体解码，省去 base64 膨胀和多次整图拷贝
+            with stage_timer('decode'):
+                imgs = read_uploaded_images(request)
+            img = imgs[0] if imgs else None
+        else:
+            image_data = (request.json or {}).get('image')
+            with stage_timer('decode'):
+                img = decode_base64_image(image_data) if image_data else None
+        
+        if img is None:
+            return jsonify({
+                "error": {
+                    "message": "No valid image provided",
+                    "type": "invalid_request_error",
+                    "code": "invalid_image"
+                }
+            }), 400
+        
+        result = scheduler.submit(img).result(timeout=REQUEST_TIMEOUT)
+        lines = parse_ocr_result(result)
+        with stage_timer('serialization'):
+            return jsonify({
+                "object": "ocr.result",
+                "results": lines.to_dicts(with_box=False),
+                "text": lines.text()
+            })
         
+    except RequestEntityTooLarge as e:
+        return jsonify({
+            "error": {
+                "message": e.description,
+                "type": "invalid_request_error",
+                "code": "payload_too_large"
+            }
+        }), 413
+    except QueueFullError as e:
+        return jsonify({
+            "error": {
+                "message": str(e),
+                "type": "rate_limit_error",
+                "code": "queue_full"
+            }
+        }), 429
+    except FutureTimeoutError:
+        return jsonify({
+            "error": {
+                "message": "OCR request timed out",
+                "type": "server_error",
+                "code": "timeout"
+            }
+        }), 503
     except Exception as e:
         return jsonify({
             "error": {
@@ -248,21 +495,44 @@ def index():
         "version": "1.0.0",
         "endpoints": {
             "models": "/v1/models",
-            "chat": "/v1/chat/completions"
+            "chat": "/v1/chat/completions",
+            "ocr": "/v1/ocr",
+            "stats": "/stats",
+            "metrics": "/metrics",
+            "live": "/health/live",
+            "ready": "/health/ready"
         },
         "description": "OpenAI-compatible OCR service powered by PaddleOCR"
     })
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """调度器状态: 队列深度、批量大小、排队等待时间"""
+    return jsonify(scheduler.stats())
+
 @app.route('/health', methods=['GET'])
+@app.route('/health/live', methods=['GET'])
 def health():
-    """健康检查"""
+    """存活检查: 服务进程可以响应请求即返回 200 (引擎可能仍在加载)"""
     return jsonify({
         "status": "healthy",
         "service": "paddleocr",
+        "engine": engine.status(),
         "timestamp": int(time.time())
     })
 
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """就绪检查: 引擎加载并预热完成后返回 200，之前返回 503"""
+    # 以 WSGI 服务器部署 (不经过 __main__) 时，第一次就绪检查触发后台加载
+    engine.start()
+    status = engine.status()
+    if not status['ready']:
+        return jsonify({"status": status['state'], "service": "paddleocr", "engine": status}), 503
+    return jsonify({"status": "ready", "service": "paddleocr", "engine": status})
+
 if __name__ == '__main__':
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     print("=" * 60)
     print("PaddleOCR OpenAI-Compatible API 服务启动中...")
     print("服务地址: http://127.0.0.1:8866")
@@ -270,6 +540,12 @@ if __name__ == '__main__':
     print("\n可用端点:")
     print("  - GET  /v1/models              - 列出模型")
     print("  - POST /v1/chat/completions    - OpenAI 兼容的聊天接口(OCR)")
-    print("  - GET  /health                 - 健康检查")
+    print("  - POST /v1/ocr                 - 简化的 OCR 接口 (base64/二进制/multipart)")
+    print("  - GET  /stats                  - 调度器状态")
+    print("  - GET  /metrics                - Prometheus 指标 (各阶段耗时直方图)")
+    print("  - GET  /health/live            - 存活检查 (/health 同)")
+    print("  - GET  /health/ready           - 就绪检查 (引擎预热完成前返回 503)")
     print("=" * 60)
+    # 先开始监听端口，引擎在后台加载和预热
+    engine.start()
     app.run(host='0.0.0.0', port=8866, debug=False, threaded=True)
@@ -0,0 +1,183 @@
+"""
+PDF 流水线性能剖析
+
+开启 paddle_ocr.PROFILE_MODE 后，每页记录各阶段 (加载、渲染、编码、缓存查询、格式转换、推理、
+结果整理等) 的墙钟时间和 CPU 时间以及所在进程的峰值内存，随页面结果带回主进程 (进程模式下同样适用)；
+运行结束后汇总为 JSON 报告，给出各阶段的总耗时和 P50/P90/P99 分位数，
+以及预分类、写盘等运行级阶段的耗时、总 CPU 时间和峰值内存。
+
+阶段 CPU 时间按线程统计 (time.thread_time)，推理库内部计算线程的 CPU 时间不计入；
+报告中的 cpu_s 是整个运行 (含已退出的工作进程) 的 CPU 时间。
+"""
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计峰值内存
+    resource = None
+
+
+def peak_rss_mb(children: bool = False):
+    """本进程 (或已退出子进程中最大) 的峰值常驻内存 (MB)，无法统计时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def process_cpu_s() -> float:
+    """本进程及已退出子进程的 CPU 时间 (用户态 + 内核态，秒)"""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class PageProfile:
+    """单页 (或一批页面) 各阶段的墙钟/CPU耗时"""
+
+    def __init__(self):
+        self.stages = {}  # 阶段 -> [墙钟秒, CPU秒]，同名阶段累加
+
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def add(self, name: str, wall: float, cpu: float):
+        entry = self.stages.setdefault(name, [0.0, 0.0])
+        entry[0] += wall
+        entry[1] += cpu
+
+    def add_share(self, other: "PageProfile", fraction: float):
+        """按比例计入整批共享阶段 (如一批页面的推理) 的耗时"""
+        for name, (wall, cpu) in other.stages.items():
+            self.add(name, wall * fraction, cpu * fraction)
+
+    def to_dict(self) -> dict:
+        return {
+            'stages': {name: {'wall_s': wall, 'cpu_s': cpu} for name, (wall, cpu) in self.stages.items()},
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+class _NullProfile:
+    """未开启剖析时使用: 各阶段不计时"""
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def add(self, name: str, wall: float, cpu: float):
+        pass
+
+    def add_share(self, other, fraction: float):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+
+
+def _distribution(values: list) -> dict:
+    """总和、均值、分位数和最大值"""
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.size == 0:
+        return {'total': 0.0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {
+        'total': round(float(arr.sum()), 6),
+        'mean': round(float(arr.mean()), 6),
+        'p50': round(float(p50), 6),
+        'p90': round(float(p90), 6),
+        'p99': round(float(p99), 6),
+        'max': round(float(arr.max()), 6),
+    }
+
+
+class RunProfiler:
+    """汇总一次运行: 各页的阶段耗时、运行级阶段 (预分类、识别、写盘) 和总体资源占用"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.pages = []
+        self.phases = PageProfile()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = process_cpu_s()
+
+    def phase(self, name: str):
+        """运行级阶段计时 (在主线程中使用)"""
+        return self.phases.stage(name)
+
+    def add_page(self, result: dict):
+        """记录一页的剖析数据 (取出 result 中的 profile 字段)"""
+        profile = result.pop('profile', None)
+        if profile is None:
+            return
+        self.pages.append({
+            'page_num': result['page_num'],
+            'route': result.get('route'),
+            'dpi': result.get('dpi'),
+            'cache_hit': result.get('cache_hit'),
+            **profile,
+        })
+
+    def report(self) -> dict:
+        """生成报告 (须在工作进程退出后调用，否则其 CPU 时间和内存不计入)"""
+        wall = time.perf_counter() - self._start_wall
+        names = []
+        for page in self.pages:
+            names.extend(name for name in page['stages'] if name not in names)
+
+        stages = {}
+        for name in names:
+            timings = [page['stages'][name] for page in self.pages if name in page['stages']]
+            stages[name] = {
+                'pages': len(timings),
+                'wall_s': _distribution([t['wall_s'] for t in timings]),
+                'cpu_s': _distribution([t['cpu_s'] for t in timings]),
+            }
+
+        peaks = [page['peak_rss_mb'] for page in self.pages] + [peak_rss_mb(), peak_rss_mb(children=True)]
+        peaks = [peak for peak in peaks if peak is not None]
+        return {
+            'config': self.config,
+            'pages': len(self.pages),
+            'wall_s': round(wall, 3),
+            'pages_per_sec': round(len(self.pages) / wall, 3) if wall > 0 else None,
+            'cpu_s': round(process_cpu_s() - self._start_cpu, 3),
+            'peak_rss_mb': round(max(peaks), 1) if peaks else None,
+            'phases': {name: {'wall_s': round(w, 6), 'cpu_s': round(c, 6)}
+                       for name, (w, c) in self.phases.stages.items()},
+            'page_wall_s': _distribution([sum(t['wall_s'] for t in page['stages'].values())
+                                          for page in self.pages]),
+            'stages': stages,
+            'page_details': self.pages,
+        }
+
+
+def save_report(report: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def print_summary(report: dict):
+    """输出各阶段耗时汇总表"""
+    print(f"\n性能剖析: {report['pages']} 页，{report['wall_s']:.1f} 秒 "
+          f"({report['pages_per_sec'] or 0:.2f} 页/秒)，CPU {report['cpu_s']:.1f} 秒，"
+          f"峰值内存 {report['peak_rss_mb'] or 0:.0f} MB")
+    print(f"{'阶段':<14}{'页数':>6}{'总耗时(s)':>11}{'P50(ms)':>10}{'P90(ms)':>10}{'P99(ms)':>10}{'CPU(s)':>9}")
+    for name, stage in report['stages'].items():
+        wall = stage['wall_s']
+        print(f"{name:<14}{stage['pages']:>6}{wall['total']:>11.2f}{wall['p50'] * 1000:>10.1f}"
+              f"{wall['p90'] * 1000:>10.1f}{wall['p99'] * 1000:>10.1f}{stage['cpu_s']['total']:>9.2f}")
+    for name, phase in report['phases'].items():
+        print(f"[运行] {name:<9}{'':>6}{phase['wall_s']:>11.2f}{'':>30}{phase['cpu_s']:>9.2f}")
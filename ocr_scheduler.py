@@ -0,0 +1,161 @@
+"""
+推理调度器
+
+HTTP 请求线程不直接调用引擎，而是把解码好的图片放入有界队列并等待 Future；
+单独的引擎线程在 max_wait_ms 内尽量收集请求 (最多 max_batch_size 张图片) 合并推理。
+队列满时 submit 立即抛出 QueueFullError，由服务返回 429，避免延迟无限增长；
+一个请求带很多图片时用 submit_many 逐张等待空位，只有队列持续满载才失败。
+call 可以把检测、识别等其他引擎操作也放到调度线程中按到达顺序执行。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueueFullError(Exception):
+    """调度队列已满"""
+
+
+class BatchScheduler:
+    """单引擎微批调度器（引擎只在调度线程中被调用）"""
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 10,
+                 max_queue_size: int = 64):
+        # batch_fn(images) -> 与输入一一对应的结果列表
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        self._tasks = 0
+        self._rejected = 0
+        self._last_batch_size = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._thread = threading.Thread(target=self._loop, name="ocr-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, block: bool = False, timeout: float = None) -> Future:
+        """提交一张图片，返回结果的 Future；队列已满时抛出 QueueFullError (block=True 时最多等待 timeout 秒)"""
+        return self._put((image, None, ()), block, timeout)
+
+    def submit_many(self, images: list, timeout: float = None) -> list:
+        """依次提交多张图片 (None 项原样返回 None)，每张最多等待 timeout 秒空位；
+        图片数可以超过队列上限，调度线程边处理边腾出空位。某张提交失败时取消已提交的图片并抛出 QueueFullError"""
+        futures = []
+        try:
+            for image in images:
+                futures.append(None if image is None else self.submit(image, block=True, timeout=timeout))
+        except QueueFullError:
+            self.cancel(futures)
+            raise
+        return futures
+
+    @staticmethod
+    def cancel(futures: list):
+        """取消尚未开始推理的 Future (调度线程会跳过它们)"""
+        for future in futures:
+            if future is not None:
+                future.cancel()
+
+    def call(self, fn, *args, block: bool = False) -> Future:
+        """在调度线程中执行 fn(*args) (不参与合并)，返回结果的 Future；队列已满时抛出 QueueFullError"""
+        return self._put((None, fn, args), block)
+
+    def _put(self, work: tuple, block: bool, timeout: float = None) -> Future:
+        future = Future()
+        try:
+            self._queue.put((*work, future, time.perf_counter()), block=block, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise QueueFullError(f"调度队列已满 ({self.max_queue_size})")
+        return future
+
+    def _loop(self):
+        task = None
+        while True:
+            item = task or self._queue.get()
+            task = None
+            if item[1] is not None:
+                self._run_task(item)
+                continue
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item[1] is not None:
+                    # 其他引擎操作不合并，当前批次结束后再执行
+                    task = item
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run_task(self, item: tuple):
+        _, fn, args, future, _ = item
+        if not future.set_running_or_notify_cancel():
+            return
+        with self._stats_lock:
+            self._tasks += 1
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run(self, batch: list):
+        # 已被请求方取消的图片不再推理
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        waits = [started - enqueued for *_, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._images += len(batch)
+            self._last_batch_size = len(batch)
+            self._total_wait += sum(waits)
+            self._max_wait = max(self._max_wait, max(waits))
+
+        try:
+            results = self.batch_fn([image for image, *_ in batch])
+            if len(results) != len(batch):
+                raise ValueError("批量推理结果数量与输入不一致")
+        except Exception:
+            # 整批失败时逐张重试，只让出错的请求失败
+            for image, _, _, future, _ in batch:
+                try:
+                    future.set_result(self.batch_fn([image])[0])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        for (_, _, _, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        """队列深度、批量大小与排队等待时间"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_size': self.max_queue_size,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self._batches,
+                'images': self._images,
+                'tasks': self._tasks,
+                'rejected': self._rejected,
+                'last_batch_size': self._last_batch_size,
+                'avg_batch_size': self._images / self._batches if self._batches else 0.0,
+                'avg_queue_wait_ms': self._total_wait / self._images * 1000 if self._images else 0.0,
+                'max_queue_wait_ms': self._max_wait * 1000,
+            }
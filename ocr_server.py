@@ -1,54 +1,379 @@
-from flask import Flask, request, jsonify
-from paddleocr import PaddleOCR
-import base64
-import numpy as np
-import cv2
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import fitz  # PyMuPDF
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import paddle_ocr
+from ocr_engine import LazyEngine
+from ocr_jobs import DONE, OUTPUT_FILES, JobManager, JobStore, job_output_path
+from ocr_metrics import instrument_flask, register_scheduler, stage_timer
+from ocr_normalize import normalize_result
+from ocr_scheduler import BatchScheduler, QueueFullError
+from ocr_upload import decode_base64_image, is_binary_upload, read_uploaded_images
 
 app = Flask(__name__)
 
-# 初始化 PaddleOCR (使用最简参数)
-print("正在初始化 PaddleOCR...")
-ocr = PaddleOCR(lang="ch")
-print("PaddleOCR 初始化完成!")
+# 每次送入引擎的最大图片数，并发请求的图片会由调度器合并成批
+MAX_BATCH_SIZE = 8
+# 调度器收集一批图片的最长等待时间 (毫秒)
+MAX_BATCH_WAIT_MS = 10
+# 排队图片数上限；一个请求的图片逐张等待空位，等待超过 QUEUE_WAIT_TIMEOUT 秒仍满时返回 429
+MAX_QUEUE_SIZE = 64
+QUEUE_WAIT_TIMEOUT = 5
+# 单个请求等待识别结果的超时时间 (秒)，超时返回 503
+REQUEST_TIMEOUT = 120
+# PDF 接口: 并发渲染/识别的页面线程数，以及已提交但尚未返回给客户端的最大页数
+PDF_PAGE_WORKERS = 4
+PDF_MAX_PAGES_IN_FLIGHT = 16
+# PDF 接口允许的 dpi 查询参数范围，超出时返回 400
+PDF_MIN_DPI = 72
+PDF_MAX_DPI = 600
+# /predict/pdf 和 /jobs 上传文档的大小上限 (字节)，应用配置了 MAX_CONTENT_LENGTH 时以其为准；超过时返回 413
+MAX_PDF_UPLOAD_BYTES = 512 * 1024 * 1024
+# 后台任务: 任务目录 (上传的文档、结果和任务库)、同时运行的任务数、每个客户端同时运行的任务数
+JOBS_DIR = ".ocr_jobs"
+JOB_WORKERS = 2
+MAX_JOBS_PER_CLIENT = 1
+# 引擎加载后先对合成图片推理一次，第一个真实请求不再承担初始化开销
+WARMUP_ENGINE = True
+
+
+def create_engine():
+    """创建 PaddleOCR 实例 (使用最简参数)"""
+    from paddleocr import PaddleOCR
+    return PaddleOCR(lang="ch")
+
+
+# 引擎在服务启动后于后台线程中加载 (或由第一次推理触发)，导入本模块时不加载模型
+engine = LazyEngine(create_engine, warmup=WARMUP_ENGINE)
+
+
+@stage_timer('formatting')
+def format_result(result) -> list:
+    """将引擎对单张图片的返回值格式化为 [{"box", "text", "confidence"}, ...]"""
+    return normalize_result(result).to_dicts()
+
+
+@stage_timer('inference')
+def run_ocr_batch(imgs: list) -> list:
+    """对一批图片推理，返回与输入一一对应的原始结果"""
+    ocr = engine.get()
+    if hasattr(ocr, 'predict'):
+        # 新版 predict 支持列表输入，整批推理
+        return [[item] for item in ocr.predict(imgs)]
+    # OCR识别 (新版本不需要 cls 参数)
+    return [ocr.ocr(img) for img in imgs]
+
+
+# 所有请求共享一个调度线程，引擎只在该线程中被调用
+scheduler = BatchScheduler(run_ocr_batch, max_batch_size=MAX_BATCH_SIZE,
+                           max_wait_ms=MAX_BATCH_WAIT_MS, max_queue_size=MAX_QUEUE_SIZE)
+# 请求耗时、各阶段耗时直方图和调度器状态由 GET /metrics 输出
+register_scheduler(scheduler)
+instrument_flask(app)
+
+
+class ScheduledEngine:
+    """供 paddle_ocr 流水线使用的引擎: 把页面图片交给调度器，与图片请求共用同一个模型"""
+
+    def ocr(self, img, **kwargs):
+        # PDF 页面在队列满时等待空位而不是失败
+        return scheduler.submit(img, block=True).result()
+
 
 @app.route('/predict/paddleocr', methods=['POST'])
 def predict():
     try:
-        data = request.json
-        images = data.get('images', [])
+        if is_binary_upload(request):
+            # 原始二进制 / multipart 上传: 直接从请求体解码，不经过 base64 和 JSON
+            with stage_timer('decode'):
+                imgs = read_uploaded_images(request)
+        else:
+            data = request.json
+            imgs = []
+            for image in data.get('images', []):
+                try:
+                    with stage_timer('decode'):
+                        imgs.append(decode_base64_image(image))
+                except Exception:
+                    imgs.append(None)
         
-        if not images:
+        if not imgs:
             return jsonify({"status": "101", "msg": "No images provided"})
         
-        # 解码第一张图片
-        img_data = base64.b64decode(images[0])
-        nparr = np.frombuffer(img_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # 解码失败的图片单独报错
+        entries = [None] * len(imgs)
+        valid_indices = []
+        valid_imgs = []
+        for i, img in enumerate(imgs):
+            if img is None:
+                entries[i] = {"data": [], "status": "101", "msg": "Image decode failed"}
+                continue
+            valid_indices.append(i)
+            valid_imgs.append(img)
         
-        # OCR识别 (新版本不需要 cls 参数)
-        result = ocr.ocr(img)
+        # 交给调度器排队，与其他请求的图片合并推理 (图片多于队列上限时逐张等待空位)
+        try:
+            futures = scheduler.submit_many(valid_imgs, timeout=QUEUE_WAIT_TIMEOUT)
+        except QueueFullError as e:
+            return jsonify({"status": "429", "msg": str(e)}), 429
         
-        # 格式化结果
-        formatted_results = []
-        if result and result[0]:
-            for line in result[0]:
-                box = line[0]  # 坐标
-                text_info = line[1]  # (文字, 置信度)
-                formatted_results.append({
-                    "box": box,
-                    "text": text_info[0],
-                    "confidence": text_info[1]
-                })
+        # 结果按原顺序放回
+        for i, future in zip(valid_indices, futures):
+            try:
+                entries[i] = {"data": format_result(future.result(timeout=REQUEST_TIMEOUT)),
+                              "status": "000", "msg": "Success"}
+            except FutureTimeoutError:
+                scheduler.cancel(futures)
+                return jsonify({"status": "503", "msg": "OCR request timed out"}), 503
+            except Exception as e:
+                entries[i] = {"data": [], "status": "500", "msg": str(e)}
         
-        return jsonify({
-            "status": "000",
-            "msg": "Success",
-            "results": [{"data": formatted_results}]
-        })
+        with stage_timer('serialization'):
+            return jsonify({
+                "status": "000",
+                "msg": "Success",
+                "results": entries
+            })
         
+    except RequestEntityTooLarge as e:
+        return jsonify({"status": "413", "msg": e.description}), 413
     except Exception as e:
         return jsonify({"status": "500", "msg": str(e)})
 
+def save_upload(path: str):
+    """把上传的文件 (原始请求体或 multipart 中的第一个文件) 分块写入 path
+    超过上传上限时抛出 RequestEntityTooLarge (已写入的部分由调用方删除)"""
+    limit = request.max_content_length or MAX_PDF_UPLOAD_BYTES
+    # 先按 Content-Length 拒绝，multipart 也不必先解析落盘
+    if request.content_length is not None and request.content_length > limit:
+        raise RequestEntityTooLarge(f"Upload exceeds the limit of {limit} bytes")
+    if request.mimetype == 'multipart/form-data':
+        files = list(request.files.values())
+        upload = files[0].stream if files else None
+    else:
+        upload = request.stream
+    written = 0
+    with open(path, 'wb') as f:
+        if upload is not None:
+            for chunk in iter(lambda: upload.read(1 << 20), b''):
+                # 没有 Content-Length (分块传输) 时边写边计数
+                written += len(chunk)
+                if written > limit:
+                    break
+                f.write(chunk)
+    if written > limit:
+        raise RequestEntityTooLarge(f"Upload exceeds the limit of {limit} bytes")
+
+
+def count_pdf_pages(path: str):
+    """返回 PDF 页数，不是有效 PDF 时返回 None"""
+    try:
+        with fitz.open(path) as doc:
+            return len(doc)
+    except Exception:
+        return None
+
+
+def _page_payload(result: dict) -> dict:
+    """单页结果中返回给客户端的部分 (不含页面图片)"""
+    return {
+        "page": result['page_num'] + 1,
+        "width": result['width'],
+        "height": result['height'],
+        "dpi": result.get('dpi'),
+        "route": result.get('route'),
+        "status": "500" if result.get('error') else "000",
+        "data": result['ocr_results'],
+    }
+
+
+@app.route('/predict/pdf', methods=['POST'])
+def predict_pdf():
+    """
+    整个 PDF 识别，每完成一页立即返回该页结果 (按页码顺序)
+    
+    请求体: PDF 文件 (application/pdf / application/octet-stream 原始请求体，
+    或 multipart/form-data 中的文件)；可选查询参数 dpi、format=ndjson|sse
+    """
+    try:
+        dpi = int(request.args.get('dpi', paddle_ocr.DPI))
+    except ValueError:
+        dpi = None
+    if dpi is None or not PDF_MIN_DPI <= dpi <= PDF_MAX_DPI:
+        return jsonify({"status": "101",
+                        "msg": f"dpi must be an integer between {PDF_MIN_DPI} and {PDF_MAX_DPI}"}), 400
+    
+    # 流水线按路径打开文档，先把上传内容写入临时文件
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        save_upload(pdf_path)
+    except RequestEntityTooLarge:
+        os.remove(pdf_path)
+        raise
+    total_pages = count_pdf_pages(pdf_path)
+    if total_pages is None:
+        os.remove(pdf_path)
+        return jsonify({"status": "101", "msg": "Invalid PDF"}), 400
+    
+    use_sse = (request.args.get('format') == 'sse'
+               or request.accept_mimetypes.best == 'text/event-stream')
+    
+    def encode(event: str, payload: dict) -> str:
+        data = json.dumps(payload, ensure_ascii=False)
+        return f"event: {event}\ndata: {data}\n\n" if use_sse else data + "\n"
+    
+    def generate():
+        start = time.time()
+        page_nums = list(range(total_pages))
+        with ThreadPoolExecutor(max_workers=PDF_PAGE_WORKERS) as executor:
+            # 各批页面在处理前才预分类，第一页不必等待整个文档分类完成
+            results = paddle_ocr.iter_page_results(executor, pdf_path, page_nums, dpi,
+                                                   max_in_flight=PDF_MAX_PAGES_IN_FLIGHT,
+                                                   ordered=True, classify=paddle_ocr.CLASSIFY_PAGES)
+            for result in results:
+                yield encode("page", _page_payload(result))
+        yield encode("done", {"status": "000", "pages": total_pages,
+                              "elapsed": round(time.time() - start, 3)})
+    
+    def cleanup():
+        try:
+            os.remove(pdf_path)
+        except OSError:
+            pass
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 响应结束 (含客户端中途断开) 后删除临时文件
+    response.call_on_close(cleanup)
+    return response
+
+def run_job(job: dict, progress):
+    """(后台线程) 识别任务的文档，输出文本、JSON 以及可选的可搜索 PDF"""
+    text_path = job_output_path(job, 'txt')
+    paddle_ocr.create_searchable_pdf(
+        job['input_path'], text_path,
+        job_output_path(job, 'pdf') if job['save_pdf'] else None,
+        output_json_path=job_output_path(job, 'json'),
+        save_text_only=not job['save_pdf'],
+        progress=progress,
+    )
+    if not os.path.exists(text_path):
+        raise RuntimeError("识别未生成结果文件")
+
+
+_job_manager = None
+_init_lock = threading.Lock()
+
+
+def init_service() -> JobManager:
+    """让 PDF 流水线使用调度器，打开任务库并恢复未完成的任务 (只执行一次)，返回任务管理器
+    由 __main__ 或第一个请求调用，导入本模块不会创建任务库或启动任务线程"""
+    global _job_manager
+    if _job_manager is None:
+        with _init_lock:
+            if _job_manager is None:
+                paddle_ocr.ocr_engine = ScheduledEngine()
+                _job_manager = JobManager(JobStore(os.path.join(JOBS_DIR, "jobs.sqlite")), run_job,
+                                          max_workers=JOB_WORKERS, max_jobs_per_client=MAX_JOBS_PER_CLIENT)
+    return _job_manager
+
+
+@app.before_request
+def _ensure_service():
+    # 以 WSGI 服务器部署 (不经过 __main__) 时由第一个请求完成初始化
+    init_service()
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({"status": "413", "msg": e.description}), 413
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    提交后台识别任务，立即返回任务 ID
+    
+    请求体同 /predict/pdf；可选查询参数 priority (越大越优先，默认 0)、pdf=1 (同时生成可搜索 PDF)。
+    请求头 X-Client-Id 标识客户端 (默认按来源 IP)，同一客户端同时运行的任务数受 MAX_JOBS_PER_CLIENT 限制。
+    """
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(job_dir)
+    input_path = os.path.join(job_dir, "input.pdf")
+    try:
+        save_upload(input_path)
+    except RequestEntityTooLarge:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    total_pages = count_pdf_pages(input_path)
+    if total_pages is None:
+        os.remove(input_path)
+        os.rmdir(job_dir)
+        return jsonify({"status": "101", "msg": "Invalid PDF"}), 400
+    
+    client = request.headers.get('X-Client-Id') or request.remote_addr or "anonymous"
+    init_service().submit(job_id, client, request.args.get('priority', default=0, type=int),
+                       input_path, job_dir, request.args.get('pdf') == '1', total_pages)
+    return jsonify({"status": "000", "msg": "Success", "job_id": job_id,
+                    "total_pages": total_pages}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """任务状态: 已完成页数、页/秒、预计剩余秒数"""
+    status = init_service().status(job_id)
+    if status is None:
+        return jsonify({"status": "404", "msg": "Job not found"}), 404
+    return jsonify({"status": "000", "msg": "Success", "job": status})
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """下载任务结果，format=txt|json|pdf"""
+    fmt = request.args.get('format', 'txt')
+    if fmt not in OUTPUT_FILES:
+        return jsonify({"status": "101", "msg": f"Unknown format: {fmt}"}), 400
+    job = init_service().store.get(job_id)
+    if job is None:
+        return jsonify({"status": "404", "msg": "Job not found"}), 404
+    if job['status'] != DONE:
+        return jsonify({"status": "409", "msg": f"Job is {job['status']}"}), 409
+    path = job_output_path(job, fmt)
+    if not os.path.exists(path):
+        return jsonify({"status": "404", "msg": f"No {fmt} result for this job"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True,
+                     download_name=f"{job_id}.{fmt}")
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """调度器状态: 队列深度、批量大小、排队等待时间"""
+    return jsonify(scheduler.stats())
+
+@app.route('/health', methods=['GET'])
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    """存活检查: 服务进程可以响应请求即返回 200 (引擎可能仍在加载)"""
+    return jsonify({"status": "alive", "engine": engine.status(), "timestamp": int(time.time())})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """就绪检查: 引擎加载并预热完成后返回 200，之前返回 503"""
+    # 以 WSGI 服务器部署 (不经过 __main__) 时，第一次就绪检查触发后台加载
+    engine.start()
+    status = engine.status()
+    if not status['ready']:
+        return jsonify({"status": status['state'], "engine": status}), 503
+    return jsonify({"status": "ready", "engine": status})
+
 @app.route('/', methods=['GET'])
 def index():
     return "PaddleOCR Service is running!"
@@ -57,5 +382,10 @@ if __name__ == '__main__':
     print("=" * 60)
     print("PaddleOCR 服务启动中...")
     print("服务地址: http://127.0.0.1:8866")
+    print("指标: GET /metrics (Prometheus 格式)")
+    print("健康检查: GET /health/live (存活) / GET /health/ready (引擎已预热)")
     print("=" * 60)
+    # 先开始监听端口，引擎在后台加载和预热
+    init_service()
+    engine.start()
     app.run(host='0.0.0.0', port=8866, debug=False, threaded=True)
\ No newline at end of file
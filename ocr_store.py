@@ -0,0 +1,227 @@
+"""
+列式存储的识别结果文件 (.ocrs)
+
+文本输出只有文字，而且读取第 800 页要从头扫描整个文件。本格式按页保存文字、坐标和置信度，
+文件尾部带页面索引，读取时用 mmap 映射文件、只解析索引，任意一页都能直接定位 (O(1))，
+坐标和置信度是直接指向映射内存的 NumPy 数组，不复制、不解析。
+
+文件布局 (小端，各段按 8 字节对齐):
+    MAGIC                              8 字节文件头
+    页面数据块 (按写入顺序，每页一块):
+        offsets  int32[n + 1]          各行文字在 text 段中的字节偏移
+        scores   float32[n]            置信度
+        boxes    float32[n, 4, 2]      四个顶点的像素坐标 (没有坐标的行为 NaN，整页都没有坐标时省略)
+        text     UTF-8                 各行文字首尾相接
+    页面索引  PAGE_DTYPE[页数]          按页码排序
+    页码表    int64[最大页码 + 1]        页码 -> 索引行号，-1 表示没有该页
+    尾部      uint64 x 3 + MAGIC        索引偏移、页数、页码表长度
+
+写入过程中文件名带 .tmp 后缀，close() 写完索引后才改为正式文件名；中断或出错时调用 abort() 删除临时文件，
+之前的正式文件保持不变。
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from ocr_normalize import OcrLines
+
+MAGIC = b"OCRSTOR1"
+_TRAILER = struct.Struct("<QQQ8s")
+
+PAGE_DTYPE = np.dtype([
+    ('page_num', '<i8'),
+    ('width', '<f4'),
+    ('height', '<f4'),
+    ('dpi', '<i4'),
+    ('flags', '<u4'),
+    ('lines', '<i8'),       # 行数
+    ('offset', '<i8'),      # 页面数据块在文件中的偏移
+    ('text_bytes', '<i8'),  # text 段的字节数
+])
+
+# flags
+HAS_BOXES = 1
+ERROR = 2
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def _page_boxes(results: list):
+    """各行坐标 -> (n, 4, 2) float32，没有坐标的行填 NaN；没有任何坐标时返回 None，非四边形取外接矩形"""
+    boxes = [item.get("box") for item in results]
+    if not any(box for box in boxes):
+        return None
+    array = np.full((len(boxes), 4, 2), np.nan, dtype='<f4')
+    for i, box in enumerate(boxes):
+        if not box:
+            continue
+        points = np.asarray(box, dtype=np.float64).reshape(-1, 2)
+        if len(points) != 4:
+            (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+            points = [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+        array[i] = points
+    return array
+
+
+class OcrStoreWriter:
+    """逐页追加写入 .ocrs 文件 (页面可以乱序写入，索引在 close() 时按页码排序)"""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self._tmp_path = output_path + ".tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._pages = []  # 索引行
+        self.page_count = 0
+
+    def add(self, result: dict):
+        """追加一页结果 (paddle_ocr 的页面结果字典，同一页码重复写入时以最后一次为准)"""
+        results = [item for item in (result.get('ocr_results') or []) if item.get("text")]
+        encoded = [item["text"].encode('utf-8') for item in results]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i4')
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        scores = np.array([item.get("confidence") or 0.0 for item in results], dtype='<f4')
+        boxes = _page_boxes(results)
+        text = b"".join(encoded)
+
+        offset = self._file.tell()
+        for array in (offsets, scores, boxes):
+            if array is not None:
+                data = array.tobytes()
+                self._file.write(data + _padding(len(data)))
+        self._file.write(text + _padding(len(text)))
+
+        flags = (HAS_BOXES if boxes is not None else 0) | (ERROR if result.get('error') else 0)
+        self._pages.append((result['page_num'], result.get('width') or 0, result.get('height') or 0,
+                            result.get('dpi') or 0, flags, len(encoded), offset, len(text)))
+        self.page_count += 1
+
+    def close(self):
+        """写入页面索引和页码表，然后把临时文件改为正式文件名"""
+        if self._file is None:
+            return
+        # 同一页码只保留最后写入的一次
+        latest = {page[0]: page for page in self._pages}
+        index = np.array(sorted(latest.values()), dtype=PAGE_DTYPE)
+        slots = np.full(int(index['page_num'].max()) + 1 if len(index) else 0, -1, dtype='<i8')
+        slots[index['page_num']] = np.arange(len(index))
+
+        index_offset = self._file.tell()
+        self._file.write(index.tobytes())
+        self._file.write(slots.tobytes())
+        self._file.write(_TRAILER.pack(index_offset, len(index), len(slots), MAGIC))
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.output_path)
+
+    def abort(self):
+        """放弃写入: 删除临时文件，已有的正式文件保持不变"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 写入过程中出错时不能用残缺的结果替换之前完整的文件
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class OcrStore:
+    """只读打开 .ocrs 文件: 映射整个文件，只解析尾部索引，按页码直接读取任意一页"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC) + _TRAILER.size:
+                raise ValueError(f"不是有效的识别结果文件: {path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, page_count, slot_count, magic = _TRAILER.unpack_from(self._mm, size - _TRAILER.size)
+        if self._mm[:len(MAGIC)] != MAGIC or magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"不是有效的识别结果文件: {path}")
+        self.index = np.frombuffer(self._mm, PAGE_DTYPE, page_count, index_offset)
+        self._slots = np.frombuffer(self._mm, '<i8', slot_count, index_offset + self.index.nbytes)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, page_num: int) -> bool:
+        return 0 <= page_num < len(self._slots) and self._slots[page_num] >= 0
+
+    @property
+    def page_nums(self) -> list:
+        return self.index['page_num'].tolist()
+
+    def _entry(self, page_num: int):
+        if page_num not in self:
+            raise KeyError(page_num)
+        return self.index[self._slots[page_num]]
+
+    def lines(self, page_num: int) -> OcrLines:
+        """一页的识别结果 (坐标和置信度是映射内存上的只读数组，没有坐标的行为 NaN)"""
+        entry = self._entry(page_num)
+        count = int(entry['lines'])
+        offset = int(entry['offset'])
+        offsets = np.frombuffer(self._mm, '<i4', count + 1, offset)
+        offset += offsets.nbytes + len(_padding(offsets.nbytes))
+        scores = np.frombuffer(self._mm, '<f4', count, offset)
+        offset += scores.nbytes + len(_padding(scores.nbytes))
+        boxes = None
+        if entry['flags'] & HAS_BOXES:
+            boxes = np.frombuffer(self._mm, '<f4', count * 8, offset).reshape(count, 4, 2)
+            offset += boxes.nbytes + len(_padding(boxes.nbytes))
+        text = self._mm[offset:offset + int(entry['text_bytes'])]
+        bounds = offsets.tolist()
+        texts = [text[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
+        return OcrLines(boxes, scores, texts)
+
+    def page(self, page_num: int) -> dict:
+        """一页的结果字典，字段与 paddle_ocr 的页面结果相同 (page_num, width, height, dpi, ocr_results)"""
+        entry = self._entry(page_num)
+        lines = self.lines(page_num)
+        ocr_results = lines.to_dicts()
+        if lines.boxes is not None:
+            # 写入时没有坐标的行还原为 None
+            for i in np.flatnonzero(np.isnan(lines.boxes[:, 0, 0])):
+                ocr_results[i]['box'] = None
+        result = {
+            'page_num': page_num,
+            'width': float(entry['width']),
+            'height': float(entry['height']),
+            'dpi': int(entry['dpi']),
+            'ocr_results': ocr_results,
+        }
+        if entry['flags'] & ERROR:
+            result['error'] = True
+        return result
+
+    def iter_pages(self):
+        """按页码顺序逐页产出结果字典"""
+        for page_num in self.page_nums:
+            yield self.page(page_num)
+
+    def close(self):
+        # 还有数组引用映射内存时不能关闭，交给垃圾回收
+        self.index = self._slots = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
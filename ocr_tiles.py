@@ -0,0 +1,193 @@
+"""
+超大页面的分块识别
+
+A3、工程图纸等页面在高DPI下渲染出几千万像素，整页送入引擎既占用大量内存，
+检测模型又会把过大的图片整体缩小，小字因此丢失。分块模式把页面划分为相互重叠的方块，
+逐块渲染识别后再把各块的识别框平移回整页像素坐标合并:
+- 重叠区的同一行文字会被相邻两块各识别一次，按几何重叠去重，优先保留没有被块边缘截断的框；
+- 比重叠宽度还长、被块边缘截断成两段的行，按水平相邻关系拼接为一行 (文字按重叠部分去重)；
+- 合并后按从上到下、从左到右重新排序。
+本模块只处理像素坐标，渲染由调用方 (paddle_ocr.py) 完成。
+"""
+import numpy as np
+
+from ocr_normalize import OcrLines
+
+# 框到块边缘的距离小于此像素数，且该边不是页面边缘时，视为被块边缘截断
+EDGE_MARGIN_PX = 3
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: int) -> list:
+    """把 width x height 像素的页面划分为边长不超过 tile_size、相邻重叠至少 overlap 像素的块，
+    返回按行优先排列的 [(x0, y0, x1, y1), ...]"""
+    xs = _tile_starts(width, tile_size, overlap)
+    ys = _tile_starts(height, tile_size, overlap)
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height)) for y in ys for x in xs]
+
+
+def _tile_starts(length: int, tile_size: int, overlap: int) -> list:
+    if length <= tile_size:
+        return [0]
+    # 块数取满足重叠要求的最小值，再把起点均匀铺开，最后一块与页面边缘对齐
+    step = tile_size - overlap
+    count = -(-(length - overlap) // step)
+    return [round(i * (length - tile_size) / (count - 1)) for i in range(count)]
+
+
+def merge_tile_lines(parts: list, page_size: tuple, dedup_threshold: float = 0.6) -> OcrLines:
+    """合并各块的识别结果为整页结果
+    parts: [(OcrLines, (x0, y0, x1, y1)), ...]，OcrLines 的坐标为块内像素坐标，矩形为块在整页中的像素范围
+    page_size: 整页像素尺寸 (宽, 高)，用于区分块边缘和页面边缘
+    dedup_threshold: 两个框的交集占较小框面积的比例达到此值视为同一行"""
+    parts = [(lines, tile) for lines, tile in parts if len(lines)]
+    if not parts:
+        return OcrLines.empty()
+    if any(lines.boxes is None for lines, _ in parts):
+        # 没有坐标时无法按位置合并，按块顺序拼接
+        return OcrLines(None, np.concatenate([lines.scores for lines, _ in parts]),
+                        [text for lines, _ in parts for text in lines.texts])
+
+    width, height = page_size
+    boxes, tile_ids, cut = [], [], []
+    for index, (lines, (x0, y0, x1, y1)) in enumerate(parts):
+        shifted = lines.boxes.astype(np.float64) + (x0, y0)
+        if shifted.shape[1] != 4:
+            shifted = _rect_polygons(_bounds(shifted))
+        bounds = _bounds(shifted)
+        # 每条边: 块的这条边在页面内部，且框贴着这条边
+        cut.append(((x0 > 0) & (bounds[:, 0] <= x0 + EDGE_MARGIN_PX))
+                   | ((y0 > 0) & (bounds[:, 1] <= y0 + EDGE_MARGIN_PX))
+                   | ((x1 < width) & (bounds[:, 2] >= x1 - EDGE_MARGIN_PX))
+                   | ((y1 < height) & (bounds[:, 3] >= y1 - EDGE_MARGIN_PX)))
+        boxes.append(shifted)
+        tile_ids.append(np.full(len(lines), index))
+    boxes = np.concatenate(boxes)
+    tile_ids = np.concatenate(tile_ids)
+    cut = np.concatenate(cut)
+    scores = np.concatenate([lines.scores for lines, _ in parts])
+    texts = [text for lines, _ in parts for text in lines.texts]
+    bounds = _bounds(boxes)
+
+    keep = _suppress_duplicates(bounds, tile_ids, cut, dedup_threshold)
+    boxes, scores, bounds, cut, tile_ids = boxes[keep], scores[keep], bounds[keep], cut[keep], tile_ids[keep]
+    texts = [texts[i] for i in keep]
+    boxes, scores, texts, bounds = _join_split_lines(boxes, scores, texts, bounds, cut, tile_ids)
+
+    order = _reading_order(bounds)
+    return OcrLines(boxes[order], scores[order], [texts[i] for i in order])
+
+
+def _bounds(boxes: np.ndarray) -> np.ndarray:
+    """(N, K, 2) 多边形 -> (N, 4) 外接矩形 [x0, y0, x1, y1]"""
+    return np.concatenate([boxes.min(axis=1), boxes.max(axis=1)], axis=1)
+
+
+def _rect_polygons(bounds: np.ndarray) -> np.ndarray:
+    x0, y0, x1, y1 = bounds.T
+    return np.stack([np.stack([x0, y0], -1), np.stack([x1, y0], -1),
+                     np.stack([x1, y1], -1), np.stack([x0, y1], -1)], axis=1)
+
+
+def _suppress_duplicates(bounds: np.ndarray, tile_ids: np.ndarray, cut: np.ndarray,
+                         threshold: float) -> np.ndarray:
+    """相邻块重复识别的行只保留一个 (优先未截断、面积大的框)，返回保留行的下标 (保持原顺序)"""
+    count = len(bounds)
+    # 只有落在重叠区 (与其他块的框相交) 的行才需要两两比较
+    candidates = _overlap_candidates(bounds, tile_ids)
+    if len(candidates) < 2:
+        return np.arange(count)
+    b = bounds[candidates]
+    ids = tile_ids[candidates]
+    inter_w = np.minimum(b[:, None, 2], b[None, :, 2]) - np.maximum(b[:, None, 0], b[None, :, 0])
+    inter_h = np.minimum(b[:, None, 3], b[None, :, 3]) - np.maximum(b[:, None, 1], b[None, :, 1])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    smaller = np.maximum(np.minimum(area[:, None], area[None, :]), 1e-6)
+    # 两段都被截断且水平方向互不包含时，是同一长行的前后两段，留给 _join_split_lines 拼接
+    m = EDGE_MARGIN_PX
+    contains = (b[:, None, 0] <= b[None, :, 0] + m) & (b[:, None, 2] >= b[None, :, 2] - m)
+    c = cut[candidates]
+    split = c[:, None] & c[None, :] & ~contains & ~contains.T
+    duplicate = (inter / smaller >= threshold) & (ids[:, None] != ids[None, :]) & ~split
+
+    dropped = np.zeros(count, dtype=bool)
+    # 按优先级依次保留，被保留的框抑制与它重复的框
+    for i in sorted(range(len(candidates)), key=lambda i: (cut[candidates[i]], -area[i])):
+        if dropped[candidates[i]]:
+            continue
+        dropped[candidates[duplicate[i]]] = True
+    return np.flatnonzero(~dropped)
+
+
+def _overlap_candidates(bounds: np.ndarray, tile_ids: np.ndarray) -> np.ndarray:
+    """与其他块的某个框相交的行的下标"""
+    tiles = np.unique(tile_ids)
+    # 每块所有框的外接范围，先粗筛掉离其他块很远的行
+    extents = np.array([np.concatenate([bounds[tile_ids == t, :2].min(axis=0),
+                                        bounds[tile_ids == t, 2:].max(axis=0)]) for t in tiles])
+    near = ((bounds[:, None, 0] < extents[None, :, 2]) & (bounds[:, None, 2] > extents[None, :, 0])
+            & (bounds[:, None, 1] < extents[None, :, 3]) & (bounds[:, None, 3] > extents[None, :, 1])
+            & (tiles[None, :] != tile_ids[:, None]))
+    return np.flatnonzero(near.any(axis=1))
+
+
+def _join_split_lines(boxes, scores, texts, bounds, cut, tile_ids):
+    """把被块的竖直边缘截断成几段的同一行拼接起来 (段与段在重叠区内水平相交、垂直方向对齐)"""
+    pieces = np.flatnonzero(cut)
+    if len(pieces) < 2:
+        return boxes, scores, texts, bounds
+    groups = []  # [[外接矩形, 文字, 最低置信度, 段的下标列表, 最后一段所在块], ...]
+    for i in sorted(pieces, key=lambda i: bounds[i, 0]):
+        x0, y0, x1, y1 = bounds[i]
+        for group in groups:
+            gx0, gy0, gx1, gy1 = group[0]
+            v_overlap = min(y1, gy1) - max(y0, gy0)
+            if (group[4] != tile_ids[i] and x0 < gx1 and x1 > gx1
+                    and v_overlap >= 0.5 * min(y1 - y0, gy1 - gy0)):
+                group[0] = (gx0, min(y0, gy0), x1, max(y1, gy1))
+                group[1] = _join_text(group[1], texts[i])
+                group[2] = min(group[2], scores[i])
+                group[3].append(i)
+                group[4] = tile_ids[i]
+                break
+        else:
+            groups.append([tuple(bounds[i]), texts[i], scores[i], [i], tile_ids[i]])
+
+    joined = [group for group in groups if len(group[3]) > 1]
+    if not joined:
+        return boxes, scores, texts, bounds
+    # 拼接后的行放在第一段的位置，其余段删除
+    boxes, scores, texts, bounds = boxes.copy(), scores.copy(), list(texts), bounds.copy()
+    removed = set()
+    for rect, text, score, members, _ in joined:
+        first = members[0]
+        bounds[first] = rect
+        boxes[first] = _rect_polygons(np.array([rect]))[0]
+        texts[first] = text
+        scores[first] = score
+        removed.update(members[1:])
+    keep = np.array([i not in removed for i in range(len(texts))])
+    return boxes[keep], scores[keep], [text for text, k in zip(texts, keep) if k], bounds[keep]
+
+
+def _join_text(left: str, right: str) -> str:
+    """拼接左右两段文字，去掉重叠区内被两段重复识别的部分 (左段结尾与右段开头的最长公共部分)"""
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + right
+
+
+def _reading_order(bounds: np.ndarray) -> list:
+    """按从上到下、同一行内从左到右排序 (顶边相差不到半个行高视为同一行)"""
+    order = list(np.lexsort((bounds[:, 0], bounds[:, 1])))
+    tolerance = 0.5 * float(np.median(bounds[:, 3] - bounds[:, 1])) if len(bounds) else 0.0
+    # 与 PaddleOCR 的排序规则相同: 相邻两行顶边接近且左右颠倒时交换
+    for i in range(len(order) - 1):
+        for j in range(i, -1, -1):
+            a, b = order[j], order[j + 1]
+            if abs(bounds[b, 1] - bounds[a, 1]) < tolerance and bounds[b, 0] < bounds[a, 0]:
+                order[j], order[j + 1] = b, a
+            else:
+                break
+    return order
@@ -0,0 +1,90 @@
+"""
+HTTP 上传图片的解码
+
+除 JSON 中的 base64 字符串外，服务还接受 application/octet-stream (或 image/*) 原始请求体
+和 multipart/form-data 文件上传。二进制上传直接读入预先分配的缓冲区，
+再以零拷贝方式交给 cv2.imdecode，省去 base64 膨胀 (约 33%) 以及 JSON 解析、
+字符串切分和 b64decode 带来的多次整图拷贝。
+"""
+import base64
+import io
+import os
+
+import cv2
+import numpy as np
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# 按原始二进制处理的请求体类型
+BINARY_MIMETYPES = ('application/octet-stream', 'multipart/form-data')
+# 二进制上传的请求体上限 (字节)，应用配置了 MAX_CONTENT_LENGTH 时以其为准；超过时返回 413，不分配缓冲区
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+
+
+def decode_image_buffer(buf):
+    """从字节缓冲区 (bytes/bytearray/memoryview) 解码图片，失败时返回 None"""
+    if buf is None or len(buf) == 0:
+        return None
+    return cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+
+
+def decode_base64_image(image_base64: str):
+    """解码 base64 图片 (可带 data:image/...;base64, 前缀)，失败时返回 None"""
+    comma = image_base64.find(',', 0, 64) if image_base64.startswith('data:') else -1
+    if comma >= 0:
+        image_base64 = image_base64[comma + 1:]
+    try:
+        return decode_image_buffer(base64.b64decode(image_base64))
+    except ValueError:
+        return None
+
+
+def _read_into(stream, size: int, limit: int = None):
+    """把流读入预先分配的缓冲区，返回实际读到部分的 memoryview；size 超过 limit 时抛出 RequestEntityTooLarge"""
+    if limit is not None and size > limit:
+        raise RequestEntityTooLarge(f"Upload of {size} bytes exceeds the limit of {limit} bytes")
+    if not hasattr(stream, 'readinto'):
+        return stream.read(size)
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        try:
+            n = stream.readinto(view[pos:])
+        except io.UnsupportedOperation:
+            return bytes(view[:pos]) + stream.read(size - pos)
+        if not n:
+            break
+        pos += n
+    return view[:pos]
+
+
+def _read_file(file_storage):
+    """读取 multipart 中的一个文件，内存中的文件直接引用其缓冲区"""
+    stream = file_storage.stream
+    if hasattr(stream, 'getbuffer'):
+        return stream.getbuffer()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return _read_into(stream, size)
+
+
+def is_binary_upload(request) -> bool:
+    """请求体是否为原始二进制或 multipart 上传"""
+    return request.mimetype in BINARY_MIMETYPES or request.mimetype.startswith('image/')
+
+
+def read_uploaded_images(request) -> list:
+    """解码二进制/multipart 上传的图片，按上传顺序返回，解码失败的项为 None"""
+    if request.mimetype == 'multipart/form-data':
+        return [decode_image_buffer(_read_file(f)) for _, f in request.files.items(multi=True)]
+
+    # Content-Length 由客户端给出，先检查上限再按它分配缓冲区
+    limit = request.max_content_length or MAX_UPLOAD_BYTES
+    length = request.content_length
+    if length is None:
+        data = request.stream.read(limit + 1)
+        if len(data) > limit:
+            raise RequestEntityTooLarge(f"Upload exceeds the limit of {limit} bytes")
+        return [decode_image_buffer(data)]
+    return [decode_image_buffer(_read_into(request.stream, length, limit))]
@@ -1,25 +1,148 @@
 import fitz  # PyMuPDF
-from paddleocr import PaddleOCR
+import argparse
+import glob
 import os
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import time
 import cv2
 import numpy as np
 import threading
+import hashlib
+import math
+import re
+import json
+from contextlib import nullcontext
+from ocr_journal import PageJournal
+from ocr_cache import PageResultCache, make_cache_key
+from ocr_index import OcrIndex
+from ocr_normalize import OcrLines, normalize_result
+from ocr_profile import NULL_PROFILE, PageProfile, RunProfiler, print_summary, save_report
+from ocr_store import OcrStore, OcrStoreWriter
+from ocr_tiles import merge_tile_lines, tile_grid
 
 # --- 配置 ---
 INPUT_PDF_PATH = "input.pdf"
 OUTPUT_TEXT_PATH = "output_ocr_text.txt"  # 输出文本文件
 OUTPUT_PDF_PATH = "output_searchable.pdf"  # 可选：同时输出PDF
 DPI = 400  # 推荐200，300会更清晰但慢很多
-MAX_WORKERS = 4  # 线程数，根据CPU核心数调整
+MAX_WORKERS = 4  # 线程数/进程数，根据CPU核心数调整
+EXECUTION_MODE = "thread"  # "thread"=线程池共享一个引擎, "process"=进程池每个进程一个引擎
+WORKER_CPU_THREADS = 1  # 进程模式下每个工作进程的推理线程数 (进程数 x 线程数 ≈ CPU核心数)
 SAVE_TEXT_ONLY = True  # True=只保存文本, False=同时保存文本和PDF
+RENDER_GRAYSCALE = False  # True=以灰度渲染页面，像素数据减少为1/3
+PAGE_BATCH_SIZE = 1  # 每次送入引擎的页数，>1 时跨页批量推理 (内存占用随之增加)
+REC_BATCH_SIZE = 6  # 识别模型每批处理的文本行数
+STREAMING_MODE = False  # True=边识别边按页序写盘，内存占用与总页数无关
+MAX_PAGES_IN_FLIGHT = 16  # 流式模式下同时处理中(含等待写盘)的最大页数
+PDF_FLUSH_PAGES = 50  # 流式模式下每写入多少页PDF就保存一次到磁盘
+ENABLE_JOURNAL = True  # True=逐页记录断点续跑日志，中断后重新运行只识别剩余页面
+JOURNAL_DIR = ".ocr_journal"  # 断点续跑日志目录
+ENABLE_CACHE = True  # True=按页面内容缓存识别结果，相同页面不再重复推理
+CACHE_PATH = ".ocr_cache/page_results.sqlite"  # 结果缓存文件
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 结果缓存容量上限，超出后按LRU淘汰
+CLASSIFY_PAGES = True  # True=预先分类页面：已有文字层的页直接提取文本，空白页跳过OCR
+MIN_NATIVE_TEXT_CHARS = 10  # 文字层至少有多少个字符才直接提取
+NATIVE_TEXT_MAX_IMAGE_COVERAGE = 0.5  # 图片覆盖页面超过此比例视为扫描页，仍然OCR
+BLANK_PROBE_DPI = 24  # 空白页检测的低分辨率渲染DPI
+BLANK_STD_THRESHOLD = 3.0  # 低分辨率灰度图的像素标准差低于此值视为空白页
+ADAPTIVE_DPI = False  # True=按页面字号逐页选择DPI，DPI 作为上限
+ADAPTIVE_MIN_DPI = 150  # 自适应模式下的最低DPI
+ADAPTIVE_PROBE_DPI = 72  # 估计字高时的低分辨率探测渲染DPI
+TARGET_TEXT_HEIGHT_PX = 32  # 自适应模式下字符高度的目标像素数
+ADAPTIVE_DPI_STEP = 25  # 自适应DPI向上取整的步长
+ADAPTIVE_DPI_LOG = True  # 逐页输出所选DPI和估计节省的时间
+USE_EMBEDDED_IMAGES = True  # True=整页扫描图直接取出原图识别，不再重新栅格化页面
+EMBEDDED_IMAGE_MIN_COVERAGE = 0.9  # 图片至少覆盖页面的比例才视为整页扫描图
+OCR_LANG = "ch"  # 识别语言
+PROFILE_MODE = False  # True=记录每页各阶段的墙钟/CPU耗时和峰值内存，结束后输出JSON报告
+PROFILE_REPORT_PATH = "ocr_profile.json"  # 性能剖析报告
+MAX_OPEN_DOCS = 8  # 每个线程/进程最多同时打开的PDF数，多文档处理时按最近使用淘汰
+SEARCHABLE_PDF_SUFFIX = "_searchable"  # 多文档处理时可搜索PDF的文件名后缀 (<文件名>_searchable.pdf)
+TILED_MODE = False  # True=超大页面分块渲染识别，内存占用与块大小而非页面大小相关
+TILE_MIN_PIXELS = 20_000_000  # 页面在渲染DPI下超过此像素数才分块 (A4@400DPI 约1550万，A3 约3100万)
+TILE_SIZE = 1600  # 块的边长 (像素)，过大的图片会被检测模型整体缩小，小字随之丢失
+TILE_OVERLAP = 200  # 相邻块重叠的像素数，应大于最高的文字行，保证每行至少完整落在一个块内
+TILE_BATCH_SIZE = 4  # 每次渲染并送入引擎的块数 (同时存在的块图片数)
+TILE_DEDUP_THRESHOLD = 0.6  # 重叠区中两个框的交集占较小框面积超过此比例视为同一行
+ENABLE_INDEX = False  # True=每页识别完成后写入全文检索索引 (python ocr_index.py search 关键词)
+INDEX_PATH = ".ocr_index/search.sqlite"  # 全文检索索引文件
 
-# 初始化 PaddleOCR (第一次运行会自动下载模型)
-print("正在初始化 PaddleOCR (首次运行会下载模型,请稍候)...")
-ocr_engine = PaddleOCR(lang="ch", show_log=False)
-print("PaddleOCR 初始化完成!")
+# 需要同步到工作进程的配置项 (spawn 模式下子进程会重新导入本模块)
+_WORKER_CONFIG_NAMES = ('SAVE_TEXT_ONLY', 'RENDER_GRAYSCALE', 'WORKER_CPU_THREADS', 'REC_BATCH_SIZE',
+                        'OCR_LANG', 'DPI', 'ENABLE_CACHE', 'CACHE_PATH', 'CACHE_MAX_BYTES',
+                        'ADAPTIVE_DPI', 'ADAPTIVE_MIN_DPI', 'ADAPTIVE_PROBE_DPI',
+                        'TARGET_TEXT_HEIGHT_PX', 'ADAPTIVE_DPI_STEP',
+                        'USE_EMBEDDED_IMAGES', 'EMBEDDED_IMAGE_MIN_COVERAGE', 'PROFILE_MODE',
+                        'MAX_OPEN_DOCS', 'TILED_MODE', 'TILE_MIN_PIXELS', 'TILE_SIZE', 'TILE_OVERLAP',
+                        'TILE_BATCH_SIZE', 'TILE_DEDUP_THRESHOLD')
+
+
+def create_ocr_engine(cpu_threads: int = None):
+    """创建 PaddleOCR 实例"""
+    # 推理库在这里才导入，只用到渲染/预分类等功能的调用方 (如服务、基准脚本) 导入本模块时不必加载它
+    from paddleocr import PaddleOCR
+    kwargs = {'rec_batch_num': REC_BATCH_SIZE}
+    if cpu_threads:
+        kwargs['cpu_threads'] = cpu_threads
+    return PaddleOCR(lang=OCR_LANG, show_log=False, **kwargs)
+
+
+def engine_version() -> str:
+    """推理库版本 (作为结果缓存和断点续跑日志键的一部分)"""
+    try:
+        import paddleocr
+    except ImportError:
+        return 'unknown'
+    return getattr(paddleocr, '__version__', 'unknown')
+
+
+# PaddleOCR 实例在第一次使用时创建 (第一次运行会自动下载模型)；批量处理的第一页本身就会完成初始化，不另做预热
+# 工作进程由 _init_process_worker 创建自己的引擎，导入模块时不加载模型
+ocr_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine():
+    """获取本进程的 PaddleOCR 实例，首次调用时初始化"""
+    global ocr_engine
+    if ocr_engine is None:
+        with _engine_lock:
+            if ocr_engine is None:
+                print("正在初始化 PaddleOCR (首次运行会下载模型,请稍候)...")
+                ocr_engine = create_ocr_engine()
+                print("PaddleOCR 初始化完成!")
+    return ocr_engine
+
+# 结果缓存同样按进程在首次使用时打开
+_page_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """获取本进程的结果缓存，未启用时返回 None"""
+    global _page_cache
+    if not ENABLE_CACHE:
+        return None
+    if _page_cache is None:
+        with _cache_lock:
+            if _page_cache is None:
+                _page_cache = PageResultCache(CACHE_PATH, CACHE_MAX_BYTES)
+    return _page_cache
+
+# 全文检索索引只在主进程中写入
+_search_index = None
+
+
+def get_search_index():
+    """获取全文检索索引，未启用时返回 None"""
+    global _search_index
+    if not ENABLE_INDEX:
+        return None
+    if _search_index is None:
+        _search_index = OcrIndex(INDEX_PATH)
+    return _search_index
 
 # 线程局部存储，每个线程维护自己的文档对象
 thread_local = threading.local()
@@ -27,14 +150,221 @@ thread_local = threading.local()
 # --- 核心函数 ---
 
 def get_thread_doc(doc_path: str):
-    """获取线程局部的PDF文档对象"""
-    if not hasattr(thread_local, 'doc'):
-        thread_local.doc = fitz.open(doc_path)
-    return thread_local.doc
+    """获取线程局部的PDF文档对象（按路径缓存，每个线程/进程每个文件只打开一次）"""
+    if not hasattr(thread_local, 'docs'):
+        thread_local.docs = OrderedDict()
+    docs = thread_local.docs
+    doc = docs.get(doc_path)
+    if doc is None:
+        doc = docs[doc_path] = fitz.open(doc_path)
+        # 同一个池处理多个文档时，关闭最久未用的文档
+        while len(docs) > MAX_OPEN_DOCS:
+            docs.popitem(last=False)[1].close()
+    else:
+        docs.move_to_end(doc_path)
+    return doc
+
+
+def _init_process_worker(doc_path: str, config: dict):
+    """进程池初始化：同步配置、限制推理线程、创建本进程独立的引擎并打开PDF (doc_path 为 None 时不预先打开)"""
+    global ocr_engine, _page_cache
+    globals().update(config)
+    _page_cache = None  # fork 继承来的 SQLite 连接不能跨进程使用
+
+    threads = str(WORKER_CPU_THREADS)
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = threads
+    cv2.setNumThreads(WORKER_CPU_THREADS)
+
+    ocr_engine = create_ocr_engine(cpu_threads=WORKER_CPU_THREADS)
+    if doc_path:
+        get_thread_doc(doc_path)
+
+
+def create_executor(doc_path: str = None):
+    """按 EXECUTION_MODE 创建线程池或进程池 (多文档共用一个池时不指定 doc_path)"""
+    if EXECUTION_MODE == "process":
+        config = {name: globals()[name] for name in _WORKER_CONFIG_NAMES}
+        return ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            initializer=_init_process_worker,
+            initargs=(doc_path, config),
+        )
+    # 线程模式下所有线程共享主进程的引擎，先在主线程完成初始化
+    get_ocr_engine()
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+def pixmap_to_ndarray(pix: fitz.Pixmap) -> np.ndarray:
+    """将 Pixmap 的像素缓冲区直接包装为 NumPy 数组（零拷贝，返回的数组依赖 pix 存活）"""
+    samples = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+    if pix.n == 1:
+        return np.ndarray((pix.height, pix.width), dtype=np.uint8,
+                          buffer=samples, strides=(pix.stride, 1))
+
+    img = np.ndarray((pix.height, pix.width, pix.n), dtype=np.uint8,
+                     buffer=samples, strides=(pix.stride, pix.n, 1))
+    if pix.n == 3 and img.flags.writeable:
+        # 原地交换通道，不分配新的整页缓冲区
+        cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=img)
+    elif pix.n == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    return img
+
+
+def pixmap_digest(pix: fitz.Pixmap) -> str:
+    """渲染像素的摘要（须在通道原地转换之前计算）"""
+    h = hashlib.sha256()
+    h.update(f"{pix.width}x{pix.height}x{pix.n}".encode())
+    h.update(pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples)
+    return "px:" + h.hexdigest()
+
+
+def page_image_digest(doc: fitz.Document, page: fitz.Page) -> str:
+    """页面只由一张图片构成（无文字、无表单对象）时，无需渲染即可得到的内容摘要，否则返回 None"""
+    images = page.get_images(full=True)
+    if len(images) != 1 or page.get_fonts() or page.get_xobjects():
+        return None
+    xref, smask = images[0][0], images[0][1]
+    h = hashlib.sha256()
+    h.update(doc.xref_object(xref, compressed=True).encode())
+    h.update(doc.xref_stream_raw(xref))
+    if smask:
+        h.update(doc.xref_stream_raw(smask))
+    h.update(page.read_contents())
+    h.update(repr((tuple(page.rect), page.rotation)).encode())
+    return "xobj:" + h.hexdigest()
+
+
+def render_page(page: fitz.Page, dpi: int) -> fitz.Pixmap:
+    """按配置渲染页面（彩色或灰度，不带透明通道）"""
+    colorspace = fitz.csGRAY if RENDER_GRAYSCALE else fitz.csRGB
+    return page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+
+
+def find_dominant_image(doc: fitz.Document, page: fitz.Page):
+    """页面只是一张摆正的整页扫描图时返回 (xref, 摆放区域, 变换矩阵)，否则返回 None"""
+    if page.rotation:
+        return None
+    images = page.get_images(full=True)
+    # 带软蒙版的图片需要与背景合成，只能走渲染
+    if len(images) != 1 or images[0][1]:
+        return None
+    xref = images[0][0]
+    image_obj = doc.xref_object(xref, compressed=True)
+    # 蒙版图片和带 /Decode 反相数组的图片，原始像素与显示效果不一致
+    if re.search(r'/ImageMask\s*true|/Decode(?![A-Za-z])', image_obj):
+        return None
+    # 允许不可见文字层（已有OCR结果的扫描件），但不能有可见文字、矢量图形或表单对象
+    if any(span['type'] != 3 for span in page.get_texttrace()):
+        return None
+    if page.get_drawings() or page.get_xobjects():
+        return None
+    
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+    # 只处理未旋转、未翻转的图片
+    if abs(matrix.b) > 1e-3 or abs(matrix.c) > 1e-3 or matrix.a <= 0 or matrix.d <= 0:
+        return None
+    if abs(rect & page.rect) < EMBEDDED_IMAGE_MIN_COVERAGE * abs(page.rect):
+        return None
+    return xref, rect, matrix
+
+
+def load_embedded_image(doc: fitz.Document, xref: int) -> fitz.Pixmap:
+    """按原始分辨率解码嵌入图片，并转换为灰度或RGB"""
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if RENDER_GRAYSCALE and pix.n != 1:
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    elif pix.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+
+def map_boxes_to_page(lines: OcrLines, matrix, image_size: tuple, dpi: int) -> OcrLines:
+    """把嵌入图片像素坐标下的识别框，经图片变换矩阵映射为页面在 dpi 下的像素坐标"""
+    if lines.boxes is None or not len(lines):
+        return lines
+    a, b, c, d, e, f = matrix
+    width, height = image_size
+    scale = dpi / 72
+    # 所有行的顶点一次性换算
+    u = lines.boxes[..., 0] / width
+    v = lines.boxes[..., 1] / height
+    return lines.with_boxes(np.stack([(a * u + c * v + e) * scale, (b * u + d * v + f) * scale], axis=-1))
+
+
+def use_tiles(page: fitz.Page, dpi: int) -> bool:
+    """分块模式下页面在 dpi 下的像素数超过 TILE_MIN_PIXELS 时分块处理"""
+    if not TILED_MODE:
+        return False
+    scale = dpi / 72
+    return page.rect.width * scale * page.rect.height * scale > TILE_MIN_PIXELS
+
+
+def page_tile_clips(page: fitz.Page, dpi: int) -> tuple:
+    """返回 (整页像素尺寸, [各块的页面坐标裁剪区域, ...])，块按行优先排列、相邻块重叠 TILE_OVERLAP 像素"""
+    scale = dpi / 72
+    # 与整页渲染相同的像素网格，各块渲染出的像素与整页渲染逐像素一致
+    bbox = (page.rect * fitz.Matrix(scale, scale)).round()
+    clips = [fitz.Rect(bbox.x0 + x0, bbox.y0 + y0, bbox.x0 + x1, bbox.y0 + y1) / scale
+             for x0, y0, x1, y1 in tile_grid(bbox.width, bbox.height, TILE_SIZE, TILE_OVERLAP)]
+    return (bbox.width, bbox.height), clips
+
+
+def iter_page_tiles(page: fitz.Page, dpi: int):
+    """按 TILE_BATCH_SIZE 分批渲染各块，逐批产出 [(Pixmap, 页面坐标裁剪区域, 整页像素矩形), ...]"""
+    colorspace = fitz.csGRAY if RENDER_GRAYSCALE else fitz.csRGB
+    scale = dpi / 72
+    origin = (page.rect * fitz.Matrix(scale, scale)).round()
+    _, clips = page_tile_clips(page, dpi)
+    for start in range(0, len(clips), TILE_BATCH_SIZE):
+        batch = []
+        for clip in clips[start:start + TILE_BATCH_SIZE]:
+            pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False, clip=clip)
+            x0, y0 = pix.x - origin.x0, pix.y - origin.y0
+            batch.append((pix, clip, (x0, y0, x0 + pix.width, y0 + pix.height)))
+        yield batch
+
+
+def encode_page_tiles(page: fitz.Page, dpi: int) -> list:
+    """分块渲染并编码页面图片 [(页面坐标区域, PNG字节), ...]，用于输出PDF时不生成整页图片"""
+    return [(tuple(clip), pix.tobytes("png")) for batch in iter_page_tiles(page, dpi) for pix, clip, _ in batch]
+
+
+def recognize_page_tiles(page: fitz.Page, dpi: int, with_image: bool, profile=NULL_PROFILE) -> tuple:
+    """分块识别超大页面: 逐批渲染、识别，再把各块结果合并为整页像素坐标下的结果
+    返回 (OcrLines, 各块图片 [(页面坐标区域, PNG字节), ...] 或 None)"""
+    # 同一时刻只有一批块的像素缓冲区存活，峰值内存由 TILE_SIZE 和 TILE_BATCH_SIZE 决定
+    page_size, _ = page_tile_clips(page, dpi)
+    parts = []
+    tile_images = [] if with_image else None
+    batches = iter_page_tiles(page, dpi)
+    while True:
+        with profile.stage('render'):
+            batch = next(batches, None)
+        if batch is None:
+            break
+        if with_image:
+            with profile.stage('encode'):
+                # 必须在通道原地转换之前编码
+                tile_images.extend((tuple(clip), pix.tobytes("png")) for pix, clip, _ in batch)
+        with profile.stage('convert'):
+            images = [pixmap_to_ndarray(pix) for pix, _, _ in batch]
+        lines = recognize_batch(images, profile)
+        parts.extend((tile_lines, tile) for tile_lines, (_, _, tile) in zip(lines, batch))
+        del images, batch
+    with profile.stage('merge_tiles'):
+        merged = merge_tile_lines(parts, page_size, TILE_DEDUP_THRESHOLD)
+    return merged, tile_images
 
 
 def call_paddle_ocr_direct(image_bytes: bytes) -> list:
-    """直接调用 PaddleOCR 进行识别"""
+    """解码图片字节流后调用 PaddleOCR 进行识别"""
     try:
         # 将字节流转换为图片
         nparr = np.frombuffer(image_bytes, np.uint8)
@@ -43,107 +373,647 @@ def call_paddle_ocr_direct(image_bytes: bytes) -> list:
         # 检查图片是否成功解码
         if img is None:
             return []
-        
-        # OCR识别（使用新版 predict 方法）
+    except Exception:
+        return []
+
+    return call_paddle_ocr_image(img)
+
+
+def _run_engine(images: list) -> list:
+    """对多张图片执行推理，返回与输入一一对应的原始结果"""
+    engine = get_ocr_engine()
+    if hasattr(engine, 'predict'):
+        # 新版 predict 支持列表输入，整批送入引擎
+        return [[item] for item in engine.predict(images)]
+    # 旧版 ocr 方法只接受单张图片
+    return [engine.ocr(img) for img in images]
+
+
+def recognize_batch(images: list, profile=NULL_PROFILE) -> list:
+    """批量识别多张 NumPy 图像，返回与输入顺序一致的 OcrLines 列表 (已去掉空白行)"""
+    # profile: 记录整批的推理和结果整理耗时 (性能剖析模式)
+    if not images:
+        return []
+    try:
+        with profile.stage('inference'):
+            raw_results = _run_engine(images)
+        if len(raw_results) != len(images):
+            raise ValueError("批量推理结果数量与输入不一致")
+    except Exception:
+        if len(images) == 1:
+            # 静默处理错误，返回空结果
+            return [OcrLines.empty()]
+        # 整批失败时逐张重试，避免一张坏图影响整批
+        return [recognize_batch([img], profile)[0] for img in images]
+
+    normalized = []
+    with profile.stage('format'):
+        for result in raw_results:
+            try:
+                normalized.append(normalize_result(result).drop_blank())
+            except Exception:
+                normalized.append(OcrLines.empty())
+    return normalized
+
+
+def call_paddle_ocr_batch(images: list) -> list:
+    """批量识别多张 NumPy 图像，返回与输入顺序一致的结果列表 (每张为 [{"box", "text", "confidence"}, ...])"""
+    return [lines.to_dicts() for lines in recognize_batch(images)]
+
+
+def call_paddle_ocr_image(img: np.ndarray) -> list:
+    """直接对 NumPy 图像调用 PaddleOCR 进行识别"""
+    return call_paddle_ocr_batch([img])[0]
+
+
+def classify_page(page: fitz.Page) -> str:
+    """判断页面的处理方式: "text"=直接提取文字层, "blank"=空白页, "ocr"=需要OCR"""
+    page_area = abs(page.rect) or 1
+    image_area = sum(abs(fitz.Rect(info['bbox']) & page.rect) for info in page.get_image_info())
+    image_coverage = min(1.0, image_area / page_area)
+    text_chars = len("".join(page.get_text("text").split()))
+    
+    if text_chars >= MIN_NATIVE_TEXT_CHARS and image_coverage < NATIVE_TEXT_MAX_IMAGE_COVERAGE:
+        return "text"
+    
+    if text_chars == 0:
+        # 低分辨率灰度渲染，像素几乎没有起伏即为空白页
+        probe = page.get_pixmap(dpi=BLANK_PROBE_DPI, colorspace=fitz.csGRAY, alpha=False)
+        if float(pixmap_to_ndarray(probe).std()) < BLANK_STD_THRESHOLD:
+            return "blank"
+    return "ocr"
+
+
+def safe_classify_page(page: fitz.Page) -> str:
+    """classify_page，判断出错时按需要OCR处理"""
+    try:
+        return classify_page(page)
+    except Exception:
+        return "ocr"
+
+
+def classify_pages(doc_path: str, page_nums: list, verbose: bool = True) -> dict:
+    """对页面做预分类，返回 {page_num: 处理方式} 并输出各类页数 (verbose=False 时不输出)"""
+    routes = {}
+    with fitz.open(doc_path) as doc:
+        for page_num in tqdm(page_nums, desc="页面预分类", unit="页", disable=not verbose):
+            try:
+                routes[page_num] = safe_classify_page(doc.load_page(page_num))
+            except Exception:
+                routes[page_num] = "ocr"
+    
+    if not verbose:
+        return routes
+    counts = {route: 0 for route in ("text", "blank", "ocr")}
+    for route in routes.values():
+        counts[route] += 1
+    print(f"页面预分类: 文字层直接提取 {counts['text']} 页，空白页 {counts['blank']} 页，"
+          f"需要OCR {counts['ocr']} 页")
+    return routes
+
+
+def extract_native_text(page: fitz.Page, dpi: int) -> list:
+    """从页面自带的文字层提取文本行，坐标换算为 dpi 下的像素坐标（与OCR结果一致）"""
+    scale = dpi / 72
+    results = []
+    for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = (v * scale for v in line["bbox"])
+            results.append({
+                "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+                "text": text,
+                "confidence": 1.0
+            })
+    return results
+
+
+def estimate_text_height(page: fitz.Page) -> float:
+    """估计页面正文字符高度（单位: 点），无法估计时返回 None"""
+    # 有文字层时直接取字号中位数
+    sizes = [
+        span['size']
+        for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+        for line in block.get("lines", [])
+        for span in line["spans"]
+        if span["text"].strip()
+    ]
+    if sizes:
+        return float(np.median(sizes))
+    
+    # 扫描页：低分辨率渲染后二值化，用连通域高度的中位数近似字高
+    probe = page.get_pixmap(dpi=ADAPTIVE_PROBE_DPI, colorspace=fitz.csGRAY, alpha=False)
+    gray = pixmap_to_ndarray(probe)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, cc_stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = cc_stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = cc_stats[1:, cv2.CC_STAT_WIDTH]
+    # 去掉噪点、表格线和大块插图
+    mask = (heights >= 2) & (heights <= gray.shape[0] / 20) & (widths <= gray.shape[1] / 2)
+    if mask.sum() < 10:
+        return None
+    return float(np.median(heights[mask])) * 72 / ADAPTIVE_PROBE_DPI
+
+
+def embedded_image_dpi(page: fitz.Page) -> float:
+    """覆盖大半页面的嵌入图片的原始分辨率（DPI），没有这样的图片时返回 None"""
+    best = None
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info['bbox'])
+        if bbox.width <= 0 or abs(bbox) < 0.5 * abs(page.rect):
+            continue
+        image_dpi = info['width'] * 72 / bbox.width
+        best = image_dpi if best is None else max(best, image_dpi)
+    return best
+
+
+def choose_page_dpi(page: fitz.Page, max_dpi: int) -> int:
+    """选择能让字符高度达到 TARGET_TEXT_HEIGHT_PX 的最低DPI（不超过 max_dpi 和扫描图原始分辨率）"""
+    dpi = float(max_dpi)
+    text_height = estimate_text_height(page)
+    if text_height:
+        dpi = math.ceil(TARGET_TEXT_HEIGHT_PX * 72 / text_height / ADAPTIVE_DPI_STEP) * ADAPTIVE_DPI_STEP
+    # 超过扫描图原始分辨率的渲染不会带来新的细节
+    native_dpi = embedded_image_dpi(page)
+    if native_dpi:
+        dpi = min(dpi, native_dpi)
+    return int(max(min(ADAPTIVE_MIN_DPI, max_dpi), min(max_dpi, dpi)))
+
+
+def _error_result(page_num: int) -> dict:
+    """页面处理失败时的占位结果"""
+    return {
+        'page_num': page_num,
+        'width': 0,
+        'height': 0,
+        'img_bytes': None,
+        'ocr_results': [],
+        'error': True  # 失败的页不写入断点续跑日志，下次运行会重试
+    }
+
+
+def engine_settings(dpi: int) -> dict:
+    """影响单页识别结果的设置，作为结果缓存的键"""
+    return {
+        'dpi': dpi,
+        'grayscale': RENDER_GRAYSCALE,
+        'lang': OCR_LANG,
+        'engine_version': engine_version(),
+    }
+
+
+def tile_settings(dpi: int) -> dict:
+    """分块识别的页面的缓存键设置 (分块方式不同，合并后的结果也不同)"""
+    settings = engine_settings(dpi)
+    settings['tiles'] = [TILE_SIZE, TILE_OVERLAP, TILE_DEDUP_THRESHOLD]
+    return settings
+
+
+def job_settings() -> dict:
+    """影响整个任务识别结果的设置，作为断点续跑日志的键"""
+    settings = engine_settings(DPI)
+    settings['adaptive_dpi'] = TARGET_TEXT_HEIGHT_PX if ADAPTIVE_DPI else None
+    settings['tiles'] = [TILE_MIN_PIXELS, TILE_SIZE, TILE_OVERLAP, TILE_DEDUP_THRESHOLD] if TILED_MODE else None
+    return settings
+
+
+def restore_page_result(doc_path: str, record: dict, dpi: int, with_image: bool) -> dict:
+    """把日志中的页面记录还原为页面结果，需要输出PDF时只重新渲染图片（不做OCR）"""
+    result = dict(record)
+    result['img_bytes'] = None
+    if result.get('dpi') is None:
+        result['dpi'] = dpi
+    if with_image:
+        page = get_thread_doc(doc_path).load_page(record['page_num'])
+        if use_tiles(page, result['dpi']):
+            result['img_tiles'] = encode_page_tiles(page, result['dpi'])
+        else:
+            result['img_bytes'] = render_page(page, result['dpi']).tobytes("png")
+    return result
+
+
+def _track_result(result: dict, journal, stats: dict, profiler=None, index=None):
+    """一页完成后立即写入断点续跑日志和全文检索索引，并统计缓存命中情况和性能剖析数据"""
+    if profiler is not None:
+        profiler.add_page(result)
+    if journal is not None and not result.get('error'):
+        journal.append(result)
+    if index is not None:
+        index.add(result)
+    if result.get('cache_hit') is not None:
+        stats['cache_hits' if result['cache_hit'] else 'cache_misses'] += 1
+    if result.get('adaptive'):
+        _log_adaptive_dpi(result, stats)
+
+
+def _track_results(results, journal, stats: dict, profiler=None, index=None):
+    """逐页跟踪结果 (见 _track_result) 后原样产出"""
+    for result in results:
+        _track_result(result, journal, stats, profiler, index)
+        yield result
+
+
+def open_document_index(input_path: str, total_pages: int, done: dict):
+    """ENABLE_INDEX 时打开全文检索索引中该文档的写入器，并写入断点续跑日志中已完成的页"""
+    index = get_search_index()
+    if index is None:
+        return None
+    doc_index = index.document(input_path, total_pages)
+    for record in done.values():
+        doc_index.add(record)
+    return doc_index
+
+
+def _new_run_stats() -> dict:
+    return {'cache_hits': 0, 'cache_misses': 0,
+            'adaptive_pages': 0, 'adaptive_dpi_sum': 0, 'adaptive_saved_s': 0.0}
+
+
+def _log_adaptive_dpi(result: dict, stats: dict):
+    """记录自适应DPI的选择，按像素数比例估计相对固定DPI节省的时间"""
+    info = result['adaptive']
+    page_dpi = result['dpi']
+    saved = info['work_s'] * ((DPI / page_dpi) ** 2 - 1) - info['probe_s']
+    stats['adaptive_pages'] += 1
+    stats['adaptive_dpi_sum'] += page_dpi
+    stats['adaptive_saved_s'] += saved
+    if ADAPTIVE_DPI_LOG:
+        tqdm.write(f"第 {result['page_num'] + 1} 页: DPI {page_dpi} (上限 {DPI})，"
+                   f"探测 {info['probe_s'] * 1000:.0f} ms，估计节省 {saved:.2f} 秒")
+
+
+def _print_adaptive_stats(stats: dict):
+    """输出自适应DPI的汇总"""
+    if stats['adaptive_pages']:
+        print(f"自适应DPI: {stats['adaptive_pages']} 页平均 DPI "
+              f"{stats['adaptive_dpi_sum'] / stats['adaptive_pages']:.0f}，"
+              f"估计共节省 {stats['adaptive_saved_s']:.1f} 秒")
+
+
+def _print_cache_stats(stats: dict):
+    """输出本次运行的结果缓存命中统计"""
+    lookups = stats['cache_hits'] + stats['cache_misses']
+    if lookups:
+        print(f"结果缓存: 命中 {stats['cache_hits']} 页，未命中 {stats['cache_misses']} 页 "
+              f"(命中率 {stats['cache_hits'] / lookups:.0%})")
+
+
+def _phase(profiler, name: str):
+    """性能剖析模式下为运行级阶段计时，否则什么也不做"""
+    return profiler.phase(name) if profiler is not None else nullcontext()
+
+
+def profile_config() -> dict:
+    """写入性能剖析报告的运行配置"""
+    return {
+        'execution_mode': EXECUTION_MODE,
+        'max_workers': MAX_WORKERS,
+        'worker_cpu_threads': WORKER_CPU_THREADS,
+        'dpi': DPI,
+        'adaptive_dpi': ADAPTIVE_DPI,
+        'page_batch_size': PAGE_BATCH_SIZE,
+        'rec_batch_size': REC_BATCH_SIZE,
+        'grayscale': RENDER_GRAYSCALE,
+        'streaming': STREAMING_MODE,
+        'embedded_images': USE_EMBEDDED_IMAGES,
+        'cache': ENABLE_CACHE,
+        'classify_pages': CLASSIFY_PAGES,
+        'tiled': [TILE_MIN_PIXELS, TILE_SIZE, TILE_OVERLAP, TILE_BATCH_SIZE] if TILED_MODE else None,
+        'engine_version': engine_version(),
+    }
+
+
+def _finish_profile(profiler):
+    """生成并保存性能剖析报告 (须在工作进程退出后调用)"""
+    if profiler is None:
+        return
+    report = profiler.report()
+    save_report(report, PROFILE_REPORT_PATH)
+    print_summary(report)
+    print(f"✅ 性能剖析报告已保存至: {PROFILE_REPORT_PATH}")
+
+
+def _merge_in_page_order(results, done: dict, page_nums: list, doc_path: str, dpi: int, with_image: bool):
+    """将日志中已完成的页与新识别的页（按页码顺序产出）合并为完整的有序结果"""
+    for page_num in page_nums:
+        if page_num in done:
+            yield restore_page_result(doc_path, done[page_num], dpi, with_image)
+        else:
+            yield next(results)
+
+
+def process_pages(doc_path: str, page_nums: list, dpi: int, routes: dict = None,
+                  with_image: bool = None, classify: bool = False) -> list:
+    """批量处理多个页面：逐页渲染后整批送入引擎，再按页码顺序分发结果（线程安全）"""
+    # with_image: 是否保留页面图片用于生成PDF，None 表示按 SAVE_TEXT_ONLY 决定
+    # classify: 没有给出 routes 时，在处理每页之前就地预分类
+    if with_image is None:
+        with_image = not SAVE_TEXT_ONLY
+    cache = get_page_cache()
+    results = []
+    images = []
+    cache_keys = []  # 与 images 一一对应
+    transforms = []  # 与 images 一一对应，嵌入图片的 (变换矩阵, 图片尺寸)，渲染页面为 None
+    pixmaps = []  # 零拷贝数组依赖 Pixmap 的内存，推理完成前必须保持存活
+    
+    for page_num in page_nums:
+        # 性能剖析模式下记录本页各阶段耗时，随结果带回主进程
+        profile = PageProfile() if PROFILE_MODE else NULL_PROFILE
         try:
-            result = ocr_engine.predict(img)
-        except AttributeError:
-            # 如果 predict 不存在，回退到 ocr 方法
-            result = ocr_engine.ocr(img)
-        
-        # 格式化结果 - 处理多种返回格式
-        formatted_results = []
-        
-        if result:
-            ocr_result = result[0] if isinstance(result, list) and len(result) > 0 else result
+            # 使用线程局部的文档对象
+            with profile.stage('load'):
+                doc = get_thread_doc(doc_path)
+                page = doc.load_page(page_num)
+            result = {
+                'page_num': page_num,
+                'width': page.rect.width,
+                'height': page.rect.height,
+                'img_bytes': None,  # 只保存文本时为 None
+                'ocr_results': None,
+                'cache_hit': None if cache is None else False,
+                'route': (routes.get(page_num, "ocr") if routes
+                          else safe_classify_page(page) if classify else "ocr"),
+                'dpi': dpi,  # ocr_results 中的坐标是该DPI下的像素坐标
+                'profile': profile
+            }
             
-            # 方式1: 字典格式 (新版PaddleOCR)
-            if isinstance(ocr_result, dict):
-                if 'rec_texts' in ocr_result and 'rec_scores' in ocr_result:
-                    rec_texts = ocr_result['rec_texts']
-                    rec_scores = ocr_result['rec_scores']
-                    rec_boxes = ocr_result.get('rec_boxes', [None] * len(rec_texts))
-                    
-                    for text, score, box in zip(rec_texts, rec_scores, rec_boxes):
-                        if text and text.strip():
-                            formatted_results.append({
-                                "box": box,
-                                "text": text,
-                                "confidence": float(score)
-                            })
+            # 已有文字层或空白的页面不需要OCR
+            if result['route'] != "ocr":
+                if result['route'] == "text":
+                    with profile.stage('extract_text'):
+                        result['ocr_results'] = extract_native_text(page, dpi)
+                else:
+                    result['ocr_results'] = []
+                if with_image and use_tiles(page, dpi):
+                    with profile.stage('render'):
+                        result['img_tiles'] = encode_page_tiles(page, dpi)
+                elif with_image:
+                    with profile.stage('render'):
+                        pix = render_page(page, dpi)
+                    with profile.stage('encode'):
+                        result['img_bytes'] = pix.tobytes("png")
+                result['cache_hit'] = None
+                results.append(result)
+                continue
             
-            # 方式2: 对象属性格式
-            elif hasattr(ocr_result, 'rec_texts') and hasattr(ocr_result, 'rec_scores'):
-                rec_texts = ocr_result.rec_texts
-                rec_scores = ocr_result.rec_scores
-                rec_boxes = getattr(ocr_result, 'rec_boxes', [None] * len(rec_texts))
-                
-                for text, score, box in zip(rec_texts, rec_scores, rec_boxes):
-                    if text and text.strip():
-                        formatted_results.append({
-                            "box": box,
-                            "text": text,
-                            "confidence": float(score)
-                        })
+            # 自适应DPI：按字高选择本页的渲染分辨率
+            if ADAPTIVE_DPI:
+                t0 = time.perf_counter()
+                with profile.stage('adaptive_dpi'):
+                    result['dpi'] = choose_page_dpi(page, dpi)
+                result['adaptive'] = {'probe_s': time.perf_counter() - t0, 'work_s': 0.0}
+            page_dpi = result['dpi']
             
-            # 方式3: 标准列表格式 [[[box], (text, score)], ...]
-            elif isinstance(ocr_result, list):
-                for line in ocr_result:
-                    try:
-                        if line and len(line) >= 2:
-                            box = line[0]
-                            text_info = line[1]
-                            if isinstance(text_info, (tuple, list)) and len(text_info) >= 2:
-                                text = text_info[0]
-                                if text and text.strip():
-                                    formatted_results.append({
-                                        "box": box,
-                                        "text": text,
-                                        "confidence": text_info[1]
-                                    })
-                    except Exception:
-                        continue
-        
-        return formatted_results
-        
-    except Exception as e:
-        # 静默处理错误，返回空结果
-        return []
+            tiled = use_tiles(page, page_dpi)
+            
+            # 纯图片页面先按图片对象查缓存，命中且不需要输出PDF时连渲染也省掉
+            cache_key, cached = None, None
+            if cache is not None:
+                with profile.stage('cache_lookup'):
+                    digest = page_image_digest(doc, page)
+                    if digest:
+                        settings = tile_settings(page_dpi) if tiled else engine_settings(page_dpi)
+                        cache_key = make_cache_key(digest, settings)
+                        cached = cache.get(cache_key)
+            if cached is not None and not with_image:
+                result.update(ocr_results=cached, cache_hit=True)
+                results.append(result)
+                continue
+            
+            # 超大页面分块渲染识别，不生成整页图片，不参与跨页批量推理
+            if tiled:
+                embedded = find_dominant_image(doc, page) if USE_EMBEDDED_IMAGES and with_image else None
+                if embedded:
+                    # 输出PDF时仍然复用原始扫描图数据，不需要解码
+                    with profile.stage('encode'):
+                        result['img_bytes'] = doc.extract_image(embedded[0])['image']
+                        result['img_rect'] = tuple(embedded[1])
+                if cached is not None:
+                    if not embedded:
+                        with profile.stage('render'):
+                            result['img_tiles'] = encode_page_tiles(page, page_dpi)
+                    result.update(ocr_results=cached, cache_hit=True)
+                    results.append(result)
+                    continue
+                t0 = time.perf_counter()
+                lines, tile_images = recognize_page_tiles(page, page_dpi, with_image and not embedded, profile)
+                result['img_tiles'] = tile_images
+                with profile.stage('format'):
+                    result['ocr_results'] = lines.to_dicts()
+                if result.get('adaptive'):
+                    result['adaptive']['work_s'] = time.perf_counter() - t0
+                # 没有图片对象摘要的页面不缓存: 计算像素摘要需要先渲染出整页
+                if cache_key is not None and result['ocr_results']:
+                    with profile.stage('cache_store'):
+                        cache.put(cache_key, result['ocr_results'])
+                results.append(result)
+                continue
+            
+            # 渲染页面；整页扫描图直接按原始分辨率取出，不再重新栅格化
+            t0 = time.perf_counter()
+            with profile.stage('render'):
+                embedded = find_dominant_image(doc, page) if USE_EMBEDDED_IMAGES else None
+                if embedded:
+                    xref, img_rect, matrix = embedded
+                    pix = load_embedded_image(doc, xref)
+                else:
+                    pix = render_page(page, page_dpi)
+            if with_image:
+                with profile.stage('encode'):
+                    if embedded:
+                        # 输出PDF时直接复用原始图片数据（JPEG 等不重新编码）
+                        result['img_bytes'] = doc.extract_image(xref)['image']
+                        result['img_rect'] = tuple(img_rect)
+                    else:
+                        # 只有生成PDF时才需要编码图片（必须在通道原地转换之前编码）
+                        result['img_bytes'] = pix.tobytes("png")
+            
+            if cache is not None and cache_key is None:
+                with profile.stage('cache_lookup'):
+                    cache_key = make_cache_key(pixmap_digest(pix), engine_settings(page_dpi))
+                    cached = cache.get(cache_key)
+            if cached is not None:
+                result.update(ocr_results=cached, cache_hit=True)
+                results.append(result)
+                continue
+            
+            # OCR识别：直接使用像素缓冲区，省去 PNG 编码/解码
+            with profile.stage('convert'):
+                img = pixmap_to_ndarray(pix)
+                transform = None
+                if embedded:
+                    # 原图分辨率高于目标DPI时缩小到目标DPI，不做放大
+                    native_dpi = pix.width * 72 / img_rect.width
+                    if native_dpi > page_dpi:
+                        factor = page_dpi / native_dpi
+                        img = cv2.resize(img, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+                    transform = (tuple(matrix), (img.shape[1], img.shape[0]))
+            images.append(img)
+            transforms.append(transform)
+            if result.get('adaptive'):
+                result['adaptive']['work_s'] = time.perf_counter() - t0
+            cache_keys.append(cache_key)
+            pixmaps.append(pix)
+            results.append(result)
+        except Exception as e:
+            print(f"\n页面 {page_num + 1} 处理出错: {e}")
+            results.append(_error_result(page_num))
+    
+    # 把本批识别结果按顺序分发回各页
+    pending = [r for r in results if r['ocr_results'] is None]
+    batch_profile = PageProfile() if PROFILE_MODE else NULL_PROFILE
+    t0 = time.perf_counter()
+    batch_results = recognize_batch(images, batch_profile)
+    ocr_share = (time.perf_counter() - t0) / max(1, len(images))
+    for result, cache_key, transform, lines in zip(pending, cache_keys, transforms, batch_results):
+        profile = result['profile']
+        # 整批推理的耗时平均分摊到各页
+        profile.add_share(batch_profile, 1 / len(images))
+        if transform is not None:
+            with profile.stage('map_boxes'):
+                lines = map_boxes_to_page(lines, transform[0], transform[1], result['dpi'])
+        with profile.stage('format'):
+            ocr_results = lines.to_dicts()
+        result['ocr_results'] = ocr_results
+        if result.get('adaptive'):
+            result['adaptive']['work_s'] += ocr_share
+        # 识别失败时也会返回空结果，空结果不写入缓存以免固化错误
+        if cache is not None and ocr_results:
+            with profile.stage('cache_store'):
+                cache.put(cache_key, ocr_results)
+    
+    for result in results:
+        profile = result.pop('profile', None)
+        if PROFILE_MODE and profile is not None:
+            result['profile'] = profile.to_dict()
+    return results
 
 
 def process_page(doc_path: str, page_num: int, dpi: int) -> dict:
     """处理单个页面（线程安全）"""
-    try:
-        # 使用线程局部的文档对象
-        doc = get_thread_doc(doc_path)
-        page = doc.load_page(page_num)
-        
-        # 渲染页面
-        pix = page.get_pixmap(dpi=dpi)
-        img_bytes = pix.tobytes("png")
+    return process_pages(doc_path, [page_num], dpi)[0]
+
+
+def iter_page_results(executor, doc_path: str, page_nums: list, dpi: int,
+                      max_in_flight: int = None, ordered: bool = False, routes: dict = None,
+                      with_image: bool = None, classify: bool = False):
+    """分批提交页面并逐页产出结果（ordered=True 时按 page_nums 顺序产出，否则按完成顺序）"""
+    # max_in_flight 限制已提交但尚未产出的页数（含重排缓冲区中的页），None 表示一次性全部提交
+    # classify=True 且没有 routes 时，各批在处理前才预分类，第一页不必等待整个文档分类完成
+    batch_size = max(1, PAGE_BATCH_SIZE)
+    batches = [page_nums[i:i + batch_size] for i in range(0, len(page_nums), batch_size)]
+    limit = max_in_flight or len(page_nums)
+    
+    futures = {}
+    buffered = {}  # 重排缓冲区: page_num -> result
+    next_batch = 0
+    next_index = 0  # ordered 模式下下一个应产出的页在 page_nums 中的位置
+    in_flight = 0
+    
+    while True:
+        # 在限额内继续提交后续批次
+        while next_batch < len(batches) and (
+                in_flight == 0 or in_flight + len(batches[next_batch]) <= limit):
+            batch = batches[next_batch]
+            batch_routes = {p: routes[p] for p in batch if p in routes} if routes else None
+            futures[executor.submit(process_pages, doc_path, batch, dpi, batch_routes, with_image,
+                                    classify)] = batch
+            in_flight += len(batch)
+            next_batch += 1
         
-        # OCR识别
-        ocr_results = call_paddle_ocr_direct(img_bytes)
+        if not futures:
+            break
         
-        result = {
-            'page_num': page_num,
-            'width': page.rect.width,
-            'height': page.rect.height,
-            'img_bytes': img_bytes if not SAVE_TEXT_ONLY else None,  # 只保存文本时不需要图片
-            'ocr_results': ocr_results
-        }
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = futures.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"\n页面 {batch[0] + 1}-{batch[-1] + 1} 处理失败: {e}")
+                results = [_error_result(page_num) for page_num in batch]
+            
+            for result in results:
+                if ordered:
+                    buffered[result['page_num']] = result
+                else:
+                    in_flight -= 1
+                    yield result
         
-        return result
+        # 前面的页全部完成后，按顺序放出缓冲区中的页
+        while next_index < len(page_nums) and page_nums[next_index] in buffered:
+            in_flight -= 1
+            yield buffered.pop(page_nums[next_index])
+            next_index += 1
+
+
+def write_page_text(f, result: dict) -> int:
+    """写入单页文本，返回写入的文本行数"""
+    total_text_lines = 0
     
-    except Exception as e:
-        print(f"\n页面 {page_num + 1} 处理出错: {e}")
-        return {
-            'page_num': page_num,
-            'width': 0,
-            'height': 0,
-            'img_bytes': None,
-            'ocr_results': []
-        }
+    page_num = result['page_num']
+    f.write(f"{'='*60}\n")
+    f.write(f"第 {page_num + 1} 页\n")
+    f.write(f"{'='*60}\n\n")
+    
+    if result['ocr_results']:
+        for item in result['ocr_results']:
+            text = item.get("text", "").strip()
+            if text:
+                f.write(f"{text}\n")
+                total_text_lines += 1
+    else:
+        f.write("(此页无文本内容)\n")
+    
+    f.write("\n")
+    return total_text_lines
+
+
+def add_pdf_page(out_pdf: fitz.Document, result: dict) -> bool:
+    """向输出PDF追加一页：原图 + 不可见文本层，没有图片时跳过"""
+    tiles = result.get('img_tiles')
+    if result['img_bytes'] is None and not tiles:
+        return False
+    
+    new_page = out_pdf.new_page(width=result['width'], height=result['height'])
+    if tiles:
+        # 分块处理的页面逐块插入，重叠区两块的像素相同
+        for rect, img_bytes in tiles:
+            new_page.insert_image(fitz.Rect(rect), stream=img_bytes)
+    else:
+        # 复用原始扫描图时按原摆放区域插入，否则铺满整页
+        img_rect = result.get('img_rect') or (0, 0, result['width'], result['height'])
+        new_page.insert_image(
+            fitz.Rect(img_rect), 
+            stream=result['img_bytes']
+        )
+    
+    # 识别坐标是渲染DPI下的像素坐标，换算为页面坐标（点）
+    scale = 72 / result.get('dpi', DPI)
+    
+    if result['ocr_results']:
+        for item in result['ocr_results']:
+            text = item.get("text", "")
+            box = item.get("box")
+            
+            if box and text:
+                try:
+                    x_coords = [p[0] * scale for p in box]
+                    y_coords = [p[1] * scale for p in box]
+                    bbox = fitz.Rect(min(x_coords), min(y_coords), max(x_coords), max(y_coords))
+                    
+                    # 按行高设置字号并从基线写入，文本框放不下时 insert_textbox 会静默丢弃文字
+                    new_page.insert_text(
+                        fitz.Point(bbox.x0, bbox.y1 - bbox.height * 0.2), text,
+                        fontsize=max(1, bbox.height * 0.8),
+                        fontname="helv",
+                        render_mode=3  # 不可见文本
+                    )
+                except:
+                    pass
+    return True
 
 
 def save_as_text(page_results: list, output_path: str):
@@ -158,28 +1028,181 @@ def save_as_text(page_results: list, output_path: str):
     
     with open(output_path, 'w', encoding='utf-8') as f:
         for result in tqdm(valid_results, desc="写入文本", unit="页"):
-            page_num = result['page_num']
-            f.write(f"{'='*60}\n")
-            f.write(f"第 {page_num + 1} 页\n")
-            f.write(f"{'='*60}\n\n")
-            
-            if result['ocr_results']:
-                for item in result['ocr_results']:
-                    text = item.get("text", "").strip()
-                    if text:
-                        f.write(f"{text}\n")
-                        total_text_lines += 1
-            else:
-                f.write("(此页无文本内容)\n")
-            
-            f.write("\n")
+            total_text_lines += write_page_text(f, result)
     
     print(f"✅ 文本文件已保存至: {output_path}")
     print(f"✅ 成功保存 {len(valid_results)} 页内容，共 {total_text_lines} 行文本")
 
 
-def create_searchable_pdf(input_path: str, output_text_path: str, output_pdf_path: str = None):
+def save_as_pdf(page_results: list, output_path: str):
+    """将页面图片和OCR结果组装为可搜索PDF"""
+    print("\n正在生成可搜索PDF...")
+    out_pdf = fitz.open()
+    
+    # 按页码顺序组装PDF
+    sorted_results = sorted([r for r in page_results if r is not None], key=lambda x: x['page_num'])
+    
+    for result in tqdm(sorted_results, desc="组装PDF", unit="页"):
+        add_pdf_page(out_pdf, result)
+
+    print("正在保存PDF文件...")
+    out_pdf.save(output_path, garbage=4, deflate=True, clean=True)
+    out_pdf.close()
+    print(f"✅ 可搜索的PDF已保存至: {output_path}")
+
+
+class JsonResultWriter:
+    """逐页写入识别结果 JSON: {"pages": [{page_num, width, height, dpi, ocr_results}, ...]}"""
+
+    def __init__(self, output_path: str):
+        self.file = open(output_path, 'w', encoding='utf-8')
+        self.file.write('{"pages": [\n')
+        self.page_count = 0
+
+    def add(self, result: dict):
+        record = {name: result.get(name) for name in PageJournal.FIELDS}
+        if self.page_count:
+            self.file.write(",\n")
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.page_count += 1
+
+    def close(self):
+        self.file.write("\n]}\n")
+        self.file.close()
+
+
+def save_as_json(page_results: list, output_path: str):
+    """将OCR结果 (含坐标和置信度) 保存为JSON文件"""
+    writer = JsonResultWriter(output_path)
+    for result in sorted([r for r in page_results if r is not None], key=lambda x: x['page_num']):
+        writer.add(result)
+    writer.close()
+    print(f"✅ JSON结果已保存至: {output_path}")
+
+
+def save_as_store(page_results: list, output_path: str):
+    """将OCR结果保存为列式结果文件 (.ocrs，见 ocr_store.py)，可按页码随机读取"""
+    with OcrStoreWriter(output_path) as writer:
+        for result in sorted([r for r in page_results if r is not None], key=lambda x: x['page_num']):
+            writer.add(result)
+    print(f"✅ 结果文件已保存至: {output_path}")
+
+
+def export_store_text(store_path: str, output_text_path: str):
+    """由列式结果文件重新生成文本文件 (格式与直接识别输出的文本相同)，不需要重新识别"""
+    total_text_lines = 0
+    with OcrStore(store_path) as store, open(output_text_path, 'w', encoding='utf-8') as f:
+        for result in store.iter_pages():
+            total_text_lines += write_page_text(f, result)
+        page_count = len(store)
+    print(f"✅ 文本文件已保存至: {output_text_path} ({page_count} 页，{total_text_lines} 行文本)")
+
+
+class StreamingPdfWriter:
+    """边识别边写入的可搜索PDF：每累计 flush_pages 页增量保存并重新打开，已写入的页面不再驻留内存"""
+
+    def __init__(self, output_path: str, flush_pages: int):
+        self.output_path = output_path
+        self.flush_pages = max(1, flush_pages)
+        self.doc = fitz.open()
+        self.on_disk = False
+        self.unsaved = 0
+        self.page_count = 0
+
+    def add(self, result: dict):
+        if not add_pdf_page(self.doc, result):
+            return
+        self.page_count += 1
+        self.unsaved += 1
+        if self.unsaved >= self.flush_pages:
+            self.flush()
+
+    def flush(self):
+        if not self.unsaved:
+            return
+        if self.on_disk:
+            self.doc.saveIncr()
+        else:
+            self.doc.save(self.output_path)
+            self.on_disk = True
+        # 重新打开后页面内容按需从磁盘读取，释放已写入页面占用的内存
+        self.doc.close()
+        self.doc = fitz.open(self.output_path)
+        self.unsaved = 0
+
+    def close(self):
+        self.flush()
+        self.doc.close()
+        if not self.on_disk:
+            return
+        # 增量保存会留下旧对象，最后重写一次以压缩体积
+        tmp_path = self.output_path + ".tmp"
+        with fitz.open(self.output_path) as doc:
+            doc.save(tmp_path, garbage=4, deflate=True, clean=True)
+        os.replace(tmp_path, self.output_path)
+
+
+def write_results_streaming(results, total_pages: int, output_text_path: str,
+                            output_pdf_path: str = None, output_json_path: str = None,
+                            progress=None, profiler=None, output_store_path: str = None):
+    """按页码顺序消费结果，每页完成后立即写入文本文件、JSON、结果文件和PDF"""
+    pdf_writer = StreamingPdfWriter(output_pdf_path, PDF_FLUSH_PAGES) if output_pdf_path else None
+    json_writer = JsonResultWriter(output_json_path) if output_json_path else None
+    store_writer = OcrStoreWriter(output_store_path) if output_store_path else None
+    total_text_lines = 0
+    page_count = 0
+    
+    try:
+        with open(output_text_path, 'w', encoding='utf-8') as f:
+            with tqdm(total=total_pages, desc="OCR处理进度", unit="页") as pbar:
+                for result in results:
+                    with _phase(profiler, 'write'):
+                        total_text_lines += write_page_text(f, result)
+                        f.flush()
+                        if json_writer is not None:
+                            json_writer.add(result)
+                        if store_writer is not None:
+                            store_writer.add(result)
+                        if pdf_writer is not None:
+                            pdf_writer.add(result)
+                    page_count += 1
+                    pbar.update(1)
+                    if progress is not None:
+                        progress(page_count, total_pages)
+    except BaseException:
+        # 中途出错时不生成残缺的结果文件，保留之前完整的文件
+        if store_writer is not None:
+            store_writer.abort()
+        raise
+    
+    print(f"✅ 文本文件已保存至: {output_text_path}")
+    print(f"✅ 成功保存 {page_count} 页内容，共 {total_text_lines} 行文本")
+    
+    if json_writer is not None:
+        with _phase(profiler, 'write'):
+            json_writer.close()
+        print(f"✅ JSON结果已保存至: {output_json_path}")
+    
+    if store_writer is not None:
+        with _phase(profiler, 'write'):
+            store_writer.close()
+        print(f"✅ 结果文件已保存至: {output_store_path}")
+    
+    if pdf_writer is not None:
+        print("正在保存PDF文件...")
+        with _phase(profiler, 'write'):
+            pdf_writer.close()
+        print(f"✅ 可搜索的PDF已保存至: {output_pdf_path}")
+
+
+def create_searchable_pdf(input_path: str, output_text_path: str, output_pdf_path: str = None,
+                          output_json_path: str = None, save_text_only: bool = None, progress=None,
+                          output_store_path: str = None):
     """创建可搜索的PDF或纯文本"""
+    # save_text_only 为 None 时使用 SAVE_TEXT_ONLY；progress(已完成页数, 总页数) 在每页完成后调用
+    # output_store_path: 同时输出可按页随机读取的列式结果文件 (.ocrs)
+    if save_text_only is None:
+        save_text_only = SAVE_TEXT_ONLY
     
     if not os.path.exists(input_path):
         print(f"错误: 输入文件不存在 -> {input_path}")
@@ -191,86 +1214,404 @@ def create_searchable_pdf(input_path: str, output_text_path: str, output_pdf_pat
     doc.close()
     
     print(f"PDF共有 {total_pages} 页")
-    print(f"使用 {MAX_WORKERS} 个线程并发处理...")
-    print(f"DPI设置: {DPI}")
-    print(f"输出模式: {'仅文本' if SAVE_TEXT_ONLY else '文本+PDF'}")
+    mode_name = "进程" if EXECUTION_MODE == "process" else "线程"
+    print(f"使用 {MAX_WORKERS} 个{mode_name}并发处理...")
+    print(f"DPI设置: {DPI}" + (f" (自适应，最低 {ADAPTIVE_MIN_DPI})" if ADAPTIVE_DPI else ""))
+    if PAGE_BATCH_SIZE > 1:
+        print(f"跨页批量推理: 每批 {PAGE_BATCH_SIZE} 页")
+    print(f"输出模式: {'仅文本' if save_text_only else '文本+PDF'}")
+    if STREAMING_MODE:
+        print(f"流式写入: 最多 {MAX_PAGES_IN_FLIGHT} 页同时在处理中")
+    if PROFILE_MODE:
+        print(f"性能剖析: 报告输出至 {PROFILE_REPORT_PATH}")
     
-    page_results = [None] * total_pages
+    page_nums = list(range(total_pages))
+    pdf_path = output_pdf_path if output_pdf_path and not save_text_only else None
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(process_page, input_path, page_num, DPI): page_num 
-            for page_num in range(total_pages)
-        }
+    # 断点续跑：跳过日志中已完成的页
+    journal = None
+    done = {}
+    if ENABLE_JOURNAL:
+        journal = PageJournal.for_input(JOURNAL_DIR, input_path, job_settings())
+        done = {p: r for p, r in journal.load().items() if 0 <= p < total_pages}
+        if done:
+            print(f"断点续跑: 日志中已有 {len(done)} 页，本次识别剩余 {total_pages - len(done)} 页")
+    todo = [p for p in page_nums if p not in done]
+    index = open_document_index(input_path, total_pages, done)
+    stats = _new_run_stats()
+    profiler = RunProfiler(profile_config()) if PROFILE_MODE else None
+    
+    # 预分类：文字层页和空白页不进入OCR
+    with _phase(profiler, 'classify'):
+        routes = classify_pages(input_path, todo) if CLASSIFY_PAGES and todo else None
+    if progress is not None:
+        progress(len(done), total_pages)
+    
+    try:
+        if STREAMING_MODE:
+            # 流式模式下识别与写盘交错进行，pipeline 阶段包含写盘 (write 阶段单独列出)
+            with _phase(profiler, 'pipeline'), create_executor(input_path) as executor:
+                results = iter_page_results(executor, input_path, todo, DPI,
+                                            max_in_flight=MAX_PAGES_IN_FLIGHT, ordered=True,
+                                            routes=routes, with_image=bool(pdf_path))
+                results = _track_results(results, journal, stats, profiler, index)
+                results = _merge_in_page_order(results, done, page_nums, input_path, DPI, bool(pdf_path))
+                write_results_streaming(results, total_pages, output_text_path, pdf_path,
+                                        output_json_path, progress, profiler, output_store_path)
+            _print_cache_stats(stats)
+            _print_adaptive_stats(stats)
+            _finish_profile(profiler)
+            print(f"\n✅ 全部处理完成！")
+            return
         
-        with tqdm(total=total_pages, desc="OCR处理进度", unit="页") as pbar:
-            for future in as_completed(futures):
-                page_num = futures[future]
-                try:
-                    result = future.result()
-                    page_results[page_num] = result
-                except Exception as e:
-                    print(f"\n页面 {page_num + 1} 处理失败: {e}")
-                    page_results[page_num] = None
-                pbar.update(1)
-    
-    # 保存为文本文件
-    save_as_text(page_results, output_text_path)
-    
-    # 如果需要，同时生成PDF
-    if output_pdf_path and not SAVE_TEXT_ONLY:
-        print("\n正在生成可搜索PDF...")
-        out_pdf = fitz.open()
+        page_results = [None] * total_pages
+        
+        with _phase(profiler, 'ocr'), create_executor(input_path) as executor:
+            with tqdm(total=total_pages, initial=len(done), desc="OCR处理进度", unit="页") as pbar:
+                results = iter_page_results(executor, input_path, todo, DPI, routes=routes,
+                                            with_image=bool(pdf_path))
+                for result in _track_results(results, journal, stats, profiler, index):
+                    page_results[result['page_num']] = result
+                    pbar.update(1)
+                    if progress is not None:
+                        progress(pbar.n, total_pages)
+    finally:
+        if journal is not None:
+            journal.close()
+    
+    _print_cache_stats(stats)
+    _print_adaptive_stats(stats)
+    
+    # 已完成的页直接取自日志
+    for page_num, record in done.items():
+        page_results[page_num] = restore_page_result(input_path, record, DPI, bool(pdf_path))
+    
+    with _phase(profiler, 'write'):
+        # 保存为文本文件
+        save_as_text(page_results, output_text_path)
         
-        # 按页码顺序组装PDF
-        sorted_results = sorted([r for r in page_results if r is not None], key=lambda x: x['page_num'])
+        if output_json_path:
+            save_as_json(page_results, output_json_path)
         
-        for result in tqdm(sorted_results, desc="组装PDF", unit="页"):
-            if result['img_bytes'] is None:
-                continue
-                
-            new_page = out_pdf.new_page(width=result['width'], height=result['height'])
-            new_page.insert_image(
-                fitz.Rect(0, 0, result['width'], result['height']), 
-                stream=result['img_bytes']
-            )
-            
-            if result['ocr_results']:
-                for item in result['ocr_results']:
-                    text = item.get("text", "")
-                    box = item.get("box")
+        if output_store_path:
+            save_as_store(page_results, output_store_path)
+        
+        # 如果需要，同时生成PDF
+        if pdf_path:
+            save_as_pdf(page_results, pdf_path)
+    
+    _finish_profile(profiler)
+    print(f"\n✅ 全部处理完成！")
+
+
+
+# --- 多文档处理 ---
+
+def expand_input_paths(inputs: list) -> list:
+    """把文件、目录 (递归查找其中的 .pdf) 和通配符模式展开为去重后的 PDF 路径列表"""
+    paths = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            # 跳过上次运行输出到同一目录的可搜索PDF
+            matches = sorted(path for path in glob.glob(os.path.join(item, '**', '*'), recursive=True)
+                             if path.lower().endswith('.pdf')
+                             and not os.path.splitext(path)[0].endswith(SEARCHABLE_PDF_SUFFIX))
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item, recursive=True))
+        else:
+            matches = [item]
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+def document_output_base(input_path: str, output_dir: str = None, used: set = None) -> str:
+    """文档输出文件的路径前缀 (不含扩展名): 默认与输入文件同目录同名；output_dir 中重名时追加序号"""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    base = os.path.join(output_dir or os.path.dirname(input_path), stem)
+    if used is not None:
+        candidate, index = base, 2
+        while os.path.abspath(candidate) in used:
+            candidate = f"{base}_{index}"
+            index += 1
+        base = candidate
+        used.add(os.path.abspath(base))
+    return base
+
+
+class DocumentRun:
+    """多文档处理中的一个文档: 待识别的页、重排缓冲区，以及按页码顺序逐页写出的输出文件"""
+
+    def __init__(self, input_path: str, total_pages: int, output_text_path: str,
+                 output_pdf_path: str = None, output_json_path: str = None, output_store_path: str = None):
+        self.input_path = input_path
+        self.total_pages = total_pages
+        self.output_text_path = output_text_path
+        self.output_pdf_path = output_pdf_path
+        self.output_json_path = output_json_path
+        self.output_store_path = output_store_path
+        self.journal = None
+        self.index = None
+        self.done = {}  # 断点续跑日志中已完成的页
+        self.todo = []
+        self.routes = None
+        self.buffered = {}  # 已识别但前面还有页未完成: page_num -> result
+        self.next_page = 0
+        self.text_lines = 0
+        self.started = None
+        self._text_file = None
+        self._pdf_writer = None
+        self._json_writer = None
+        self._store_writer = None
+
+    def prepare(self):
+        """读取断点续跑日志、预分类页面并打开输出文件"""
+        self.started = time.perf_counter()
+        if ENABLE_JOURNAL:
+            self.journal = PageJournal.for_input(JOURNAL_DIR, self.input_path, job_settings())
+            self.done = {p: r for p, r in self.journal.load().items() if 0 <= p < self.total_pages}
+        self.index = open_document_index(self.input_path, self.total_pages, self.done)
+        self.todo = [p for p in range(self.total_pages) if p not in self.done]
+        if CLASSIFY_PAGES and self.todo:
+            self.routes = classify_pages(self.input_path, self.todo, verbose=False)
+        self._text_file = open(self.output_text_path, 'w', encoding='utf-8')
+        if self.output_pdf_path:
+            self._pdf_writer = StreamingPdfWriter(self.output_pdf_path, PDF_FLUSH_PAGES)
+        if self.output_json_path:
+            self._json_writer = JsonResultWriter(self.output_json_path)
+        if self.output_store_path:
+            self._store_writer = OcrStoreWriter(self.output_store_path)
+
+    def batches(self):
+        """按 PAGE_BATCH_SIZE 切分待识别的页，产出 (页码列表, 这些页的预分类结果)"""
+        batch_size = max(1, PAGE_BATCH_SIZE)
+        for i in range(0, len(self.todo), batch_size):
+            batch = self.todo[i:i + batch_size]
+            yield batch, ({p: self.routes[p] for p in batch if p in self.routes} if self.routes else None)
+
+    def add(self, result: dict):
+        self.buffered[result['page_num']] = result
+
+    def flush(self) -> int:
+        """按页码顺序写出所有已就绪的页 (含日志中已完成的页)，返回写出的页数"""
+        written = 0
+        while self.next_page < self.total_pages:
+            page_num = self.next_page
+            if page_num in self.buffered:
+                result = self.buffered.pop(page_num)
+            elif page_num in self.done:
+                result = restore_page_result(self.input_path, self.done.pop(page_num), DPI,
+                                             self._pdf_writer is not None)
+            else:
+                break
+            self.text_lines += write_page_text(self._text_file, result)
+            if self._json_writer is not None:
+                self._json_writer.add(result)
+            if self._store_writer is not None:
+                self._store_writer.add(result)
+            if self._pdf_writer is not None:
+                self._pdf_writer.add(result)
+            self.next_page += 1
+            written += 1
+        return written
+
+    @property
+    def finished(self) -> bool:
+        return self.next_page >= self.total_pages
+
+    def close(self):
+        self._text_file.close()
+        if self._json_writer is not None:
+            self._json_writer.close()
+        if self._store_writer is not None:
+            # 未写完全部页面 (处理出错或中断) 时放弃结果文件，不替换之前完整的文件
+            if self.finished:
+                self._store_writer.close()
+            else:
+                self._store_writer.abort()
+        if self._pdf_writer is not None:
+            self._pdf_writer.close()
+        if self.journal is not None:
+            self.journal.close()
+
+    def summary(self) -> dict:
+        return {
+            'input': self.input_path,
+            'pages': self.total_pages,
+            'text_lines': self.text_lines,
+            'outputs': [path for path in (self.output_text_path, self.output_pdf_path, self.output_json_path,
+                                          self.output_store_path) if path],
+            'elapsed_s': round(time.perf_counter() - self.started, 3) if self.started else None,
+        }
+
+
+def process_documents(input_paths: list, output_dir: str = None, save_text_only: bool = None,
+                      save_json: bool = False, save_store: bool = False) -> list:
+    """用同一个线程池/进程池 (引擎只加载一次) 识别多个PDF，各文档的页面混合调度，结果分别写入各自的输出文件"""
+    # 输出: <文件名>.txt，可选 <文件名>_searchable.pdf、<文件名>.json 和 <文件名>.ocrs；返回各文档的摘要
+    if save_text_only is None:
+        save_text_only = SAVE_TEXT_ONLY
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    runs = []
+    used = set()
+    for path in input_paths:
+        try:
+            with fitz.open(path) as doc:
+                total_pages = len(doc)
+        except Exception as e:
+            print(f"跳过无法打开的文件: {path} ({e})")
+            continue
+        base = document_output_base(path, output_dir, used)
+        runs.append(DocumentRun(path, total_pages, base + ".txt",
+                                None if save_text_only else base + SEARCHABLE_PDF_SUFFIX + ".pdf",
+                                base + ".json" if save_json else None,
+                                base + ".ocrs" if save_store else None))
+    if not runs:
+        print("没有可处理的PDF文件")
+        return []
+    
+    total_pages = sum(run.total_pages for run in runs)
+    mode_name = "进程" if EXECUTION_MODE == "process" else "线程"
+    print(f"共 {len(runs)} 个PDF，{total_pages} 页，使用 {MAX_WORKERS} 个{mode_name}并发处理 (所有文档共用)")
+    print(f"DPI设置: {DPI}，输出模式: {'仅文本' if save_text_only else '文本+PDF'}"
+          + (f"，输出目录: {output_dir}" if output_dir else ""))
+    
+    stats = _new_run_stats()
+    profiler = RunProfiler(profile_config()) if PROFILE_MODE else None
+    # 已提交但尚未写出的页数 (含各文档重排缓冲区中的页) 上限，所有文档共用
+    limit = max(MAX_PAGES_IN_FLIGHT, MAX_WORKERS * max(1, PAGE_BATCH_SIZE))
+    open_runs = []
+    futures = {}
+    
+    def document_batches():
+        """按文档顺序产出待提交的批次，轮到某个文档时才读取日志、预分类并打开输出"""
+        for run in runs:
+            with _phase(profiler, 'classify'):
+                run.prepare()
+            open_runs.append(run)
+            finish(run, run.flush())
+            for batch, routes in run.batches():
+                yield run, batch, routes
+    
+    def finish(run, written: int):
+        pbar.update(written)
+        if run.finished and run in open_runs:
+            open_runs.remove(run)
+            run.close()
+            tqdm.write(f"✅ {run.input_path}: {run.total_pages} 页，{run.text_lines} 行文本 -> "
+                       f"{', '.join(run.summary()['outputs'])}")
+    
+    with tqdm(total=total_pages, desc="OCR处理进度", unit="页") as pbar:
+        try:
+            with _phase(profiler, 'pipeline'), create_executor() as executor:
+                batches = document_batches()
+                exhausted = False
+                while True:
+                    # 在限额内继续提交，前一个文档的页提交完立即提交下一个文档的页，工作线程/进程不空闲
+                    in_flight = sum(len(batch) for _, batch in futures.values())
+                    in_flight += sum(len(run.buffered) for run in open_runs)
+                    while not exhausted and (not futures or in_flight < limit):
+                        item = next(batches, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        run, batch, routes = item
+                        future = executor.submit(process_pages, run.input_path, batch, DPI, routes,
+                                                 run.output_pdf_path is not None)
+                        futures[future] = (run, batch)
+                        in_flight += len(batch)
+                    
+                    if not futures:
+                        break
                     
-                    if box and text:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        run, batch = futures.pop(future)
                         try:
-                            x_coords = [p[0] for p in box]
-                            y_coords = [p[1] for p in box]
-                            bbox = fitz.Rect(min(x_coords), min(y_coords), max(x_coords), max(y_coords))
-                            
-                            new_page.insert_textbox(
-                                bbox, text,
-                                fontsize=10,
-                                fontname="helv",
-                                render_mode=3  # 不可见文本
-                            )
-                        except:
-                            pass
-
-        print("正在保存PDF文件...")
-        out_pdf.save(output_pdf_path, garbage=4, deflate=True, clean=True)
-        out_pdf.close()
-        print(f"✅ 可搜索的PDF已保存至: {output_pdf_path}")
+                            results = future.result()
+                        except Exception as e:
+                            print(f"\n{run.input_path} 第 {batch[0] + 1}-{batch[-1] + 1} 页处理失败: {e}")
+                            results = [_error_result(page_num) for page_num in batch]
+                        for result in results:
+                            _track_result(result, run.journal, stats, profiler, run.index)
+                            run.add(result)
+                        with _phase(profiler, 'write'):
+                            finish(run, run.flush())
+        finally:
+            for run in open_runs:
+                run.close()
     
-    print(f"\n✅ 全部处理完成！")
+    _print_cache_stats(stats)
+    _print_adaptive_stats(stats)
+    _finish_profile(profiler)
+    print(f"\n✅ 全部处理完成！共 {len(runs)} 个文档")
+    return [run.summary() for run in runs]
 
 
-if __name__ == "__main__":
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="PDF OCR 批量识别工具: 识别一个或多个PDF，输出文本 (可选可搜索PDF、JSON和列式结果文件)")
+    parser.add_argument("inputs", nargs="*",
+                        help="PDF 文件、目录 (递归查找 .pdf) 或通配符如 'scans/*.pdf'；不指定时处理 INPUT_PDF_PATH")
+    parser.add_argument("-o", "--output-dir", default=None, help="输出目录 (默认与各输入文件同目录)")
+    parser.add_argument("--pdf", action="store_true", help="同时生成可搜索PDF (<文件名>_searchable.pdf)")
+    parser.add_argument("--json", action="store_true", help="同时输出含坐标和置信度的JSON")
+    parser.add_argument("--store", action="store_true",
+                        help="同时输出可按页随机读取的列式结果文件 (<文件名>.ocrs)")
+    parser.add_argument("--export-text", metavar="OCRS", nargs="+", default=None,
+                        help="不做识别，由已有的 .ocrs 结果文件重新生成文本文件 (<文件名>.txt)")
+    parser.add_argument("--dpi", type=int, default=DPI, help="渲染DPI")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="线程数/进程数")
+    parser.add_argument("--mode", choices=("thread", "process"), default=EXECUTION_MODE, help="执行方式")
+    parser.add_argument("--batch-size", type=int, default=PAGE_BATCH_SIZE, help="跨页批量推理的页数")
+    parser.add_argument("--no-journal", action="store_true", help="不读写断点续跑日志")
+    parser.add_argument("--no-cache", action="store_true", help="不使用结果缓存")
+    parser.add_argument("--index", action="store_true",
+                        help="每页识别完成后写入全文检索索引 (INDEX_PATH)，用 ocr_index.py search 检索")
+    parser.add_argument("--profile", action="store_true", help="输出性能剖析报告")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global DPI, MAX_WORKERS, EXECUTION_MODE, PAGE_BATCH_SIZE, ENABLE_JOURNAL, ENABLE_CACHE, PROFILE_MODE, ENABLE_INDEX
+    args = parse_args(argv)
+    DPI, MAX_WORKERS, EXECUTION_MODE, PAGE_BATCH_SIZE = args.dpi, args.workers, args.mode, args.batch_size
+    ENABLE_JOURNAL = ENABLE_JOURNAL and not args.no_journal
+    ENABLE_CACHE = ENABLE_CACHE and not args.no_cache
+    PROFILE_MODE = PROFILE_MODE or args.profile
+    ENABLE_INDEX = ENABLE_INDEX or args.index
+    
     start_time = time.time()
     print("=" * 60)
     print("PDF OCR 批量识别工具")
     print("=" * 60)
     
-    create_searchable_pdf(INPUT_PDF_PATH, OUTPUT_TEXT_PATH, OUTPUT_PDF_PATH)
+    if args.export_text:
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        for store_path in args.export_text:
+            export_store_text(store_path, document_output_base(store_path, args.output_dir) + ".txt")
+    elif args.inputs:
+        input_paths = expand_input_paths(args.inputs)
+        process_documents(input_paths, args.output_dir, save_text_only=False if args.pdf else None,
+                          save_json=args.json, save_store=args.store)
+    else:
+        output_base = os.path.splitext(OUTPUT_TEXT_PATH)[0]
+        create_searchable_pdf(INPUT_PDF_PATH, OUTPUT_TEXT_PATH, OUTPUT_PDF_PATH,
+                              output_base + ".json" if args.json else None,
+                              save_text_only=False if args.pdf else None,
+                              output_store_path=output_base + ".ocrs" if args.store else None)
     
     elapsed = time.time() - start_time
     print(f"\n总耗时: {elapsed/60:.1f} 分钟 ({elapsed:.1f} 秒)")
     print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from ocr_index import OcrIndex, index_store, normalize_text, query_tokens, tokenize
+from ocr_store import OcrStoreWriter
+
+
+def page(page_num, *texts, dpi=144):
+    box = [[0, 0], [144, 0], [144, 72], [0, 72]]
+    return {'page_num': page_num, 'width': 595.0, 'height': 842.0, 'dpi': dpi,
+            'ocr_results': [{'box': box, 'text': text, 'confidence': 0.9} for text in texts]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = OcrIndex(str(tmp_path / "index" / "search.sqlite"))
+    yield index
+    index.close()
+
+
+def found(hits) -> list:
+    return [(hit['page_num'], hit['text']) for hit in hits]
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    assert tokenize(normalize_text("中华人民 OCR2 Test")) == {"中华", "华人", "人民", "民", "ocr2", "test"}
+    # 单字段只有它自己
+    assert tokenize("字") == {"字"}
+
+
+def test_query_tokens():
+    assert query_tokens("人民币") == [("人民", False), ("民币", False)]
+    assert query_tokens("民") == [("民", True)]
+    assert query_tokens("prog") == [("prog", True)]
+
+
+def test_normalize_text_folds_width_and_case():
+    assert normalize_text("ＡＢＣ  Ｄｅｆ\t１２") == "abc def 12"
+
+
+def test_search_cjk_phrase(index):
+    doc = index.document("a.pdf")
+    doc.add(page(0, "中华人民共和国", "其他内容"))
+    doc.add(page(1, "人民日报"))
+    assert found(index.search("人民共和")) == [(0, "中华人民共和国")]
+    assert found(index.search("人民")) == [(0, "中华人民共和国"), (1, "人民日报")]
+
+
+def test_bigrams_from_different_lines_do_not_match(index):
+    # 页内有 "中国" 和 "国人" 两个二元组，但原文中没有连续的 "中国人"
+    index.document("a.pdf").add(page(0, "中国", "国人"))
+    assert index.search("中国人") == []
+
+
+def test_single_character_matches_any_position(index):
+    index.document("a.pdf").add(page(0, "甲乙丙"))
+    for char in "甲乙丙":
+        assert found(index.search(char)) == [(0, "甲乙丙")]
+    assert index.search("丁") == []
+
+
+def test_word_prefix_and_all_terms_required(index):
+    doc = index.document("a.pdf")
+    doc.add(page(0, "Programming in Python"))
+    doc.add(page(1, "Python 教程"))
+    assert found(index.search("prog")) == [(0, "Programming in Python")]
+    # 英文不能从单词中间开始匹配
+    assert index.search("gramming") == []
+    assert found(index.search("python 教程")) == [(1, "Python 教程")]
+
+
+def test_hit_fields(index, tmp_path):
+    index.document(str(tmp_path / "a.pdf")).add(page(3, "发票号码"))
+    hit, = index.search("发票")
+    assert hit['document'] == str(tmp_path / "a.pdf")
+    # 144 DPI 下的像素坐标换算为页面坐标 (点)
+    assert hit['bbox'] == [0.0, 0.0, 72.0, 36.0]
+    assert (hit['line_no'], hit['confidence']) == (0, 0.9)
+
+
+def test_replacing_a_page_removes_old_postings(index):
+    doc = index.document("a.pdf")
+    doc.add(page(0, "旧的内容"))
+    doc.add(page(0, "新的文字"))
+    assert index.search("旧的") == []
+    assert found(index.search("新的")) == [(0, "新的文字")]
+    stats = index.stats()
+    assert (stats['pages'], stats['lines'], stats['postings']) == (1, 1, len(tokenize("新的文字")))
+
+
+def test_reindexing_shorter_document_deletes_extra_pages(index):
+    doc = index.document("a.pdf")
+    for page_num in range(3):
+        doc.add(page(page_num, f"第{page_num}页 关键词"))
+    index.document("a.pdf", total_pages=1)
+    assert [hit['page_num'] for hit in index.search("关键词")] == [0]
+    assert index.stats()['pages'] == 1
+
+
+def test_error_pages_are_not_indexed(index):
+    index.document("a.pdf").add(dict(page(0, "失败的页"), error=True))
+    assert index.search("失败") == []
+
+
+def test_document_filter_and_limit(index):
+    for name in ("a.pdf", "b.pdf"):
+        doc = index.document(name)
+        for page_num in range(3):
+            doc.add(page(page_num, "重复的关键词"))
+    assert len(index.search("关键词")) == 6
+    assert len(index.search("关键词", limit=2)) == 2
+    assert {hit['document'] for hit in index.search("关键词", document="b.pdf")} == {os.path.abspath("b.pdf")}
+
+
+def test_index_store(index, tmp_path):
+    store_path = str(tmp_path / "doc.ocrs")
+    with OcrStoreWriter(store_path) as writer:
+        writer.add(page(0, "第一页的标题"))
+        writer.add(page(1))
+        writer.add(page(2, "结尾"))
+    assert index_store(index, store_path, document="doc.pdf") == 3
+    assert found(index.search("标题")) == [(0, "第一页的标题")]
+    assert found(index.search("结尾")) == [(2, "结尾")]
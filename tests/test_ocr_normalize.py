@@ -0,0 +1,47 @@
+import fitz
+import numpy as np
+
+import paddle_ocr
+from ocr_normalize import OcrLines, normalize_result
+
+BOX = [[0, 0], [10, 0], [10, 5], [0, 5]]
+
+
+def test_all_blank_lines_give_no_results():
+    # 2.x 格式，每行文字都是空白
+    lines = normalize_result([[[BOX, (" ", 0.9)], [BOX, ("\t", 0.8)]]]).drop_blank()
+    assert len(lines) == 0
+    assert lines.to_dicts() == []
+    assert lines.to_dicts(with_box=False) == []
+
+
+def test_to_dicts_with_empty_box_list():
+    assert OcrLines([], np.zeros(0), []).to_dicts() == []
+
+
+def test_select_keeps_boxes_aligned():
+    lines = normalize_result([[[BOX, ("a", 0.9)], [BOX, (" ", 0.8)], [[[1, 1], [2, 1], [2, 2], [1, 2]], ("b", 0.7)]]])
+    kept = lines.drop_blank()
+    assert [item['text'] for item in kept.to_dicts()] == ["a", "b"]
+    assert kept.to_dicts()[1]['box'] == [[1, 1], [2, 1], [2, 2], [1, 2]]
+
+
+class BlankEngine:
+    """每张图片只识别出一行空白文字的 2.x 假引擎"""
+
+    def ocr(self, img, **kwargs):
+        return [[[BOX, ("   ", 0.9)]]]
+
+
+def test_page_with_only_blank_lines(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "blank.pdf")
+    with fitz.open() as doc:
+        doc.new_page().draw_rect(fitz.Rect(50, 50, 200, 200), fill=(0, 0, 0))
+        doc.save(pdf_path)
+    monkeypatch.setattr(paddle_ocr, 'ocr_engine', BlankEngine())
+    monkeypatch.setattr(paddle_ocr, 'ENABLE_CACHE', False)
+    monkeypatch.setattr(paddle_ocr, 'CLASSIFY_PAGES', False)
+    monkeypatch.setattr(paddle_ocr, 'USE_EMBEDDED_IMAGES', False)
+    result, = paddle_ocr.process_pages(pdf_path, [0], 72, with_image=False)
+    assert result['ocr_results'] == []
+    assert not result.get('error')
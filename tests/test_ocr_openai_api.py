@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import ocr_openai_api
+
+
+class FakePaddleOCR2:
+    """按 PaddleOCR 2.7 ocr() 的输入约定返回结果的假引擎 (没有 text_recognizer):
+    det=False 时列表表示多张图片，每张各返回一组结果"""
+
+    def __init__(self):
+        self.rec_calls = []
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        if det:
+            h, w = img.shape[:2]
+            # 故意按从下到上的顺序返回，检查阅读顺序排序
+            return [[[[10, 60], [w - 10, 60], [w - 10, 90], [10, 90]],
+                     [[10, 10], [w - 10, 10], [w - 10, 40], [10, 40]]]]
+        images = img if isinstance(img, list) else [img]
+        for image in images:
+            # 真实引擎的识别器只接受图片数组
+            assert isinstance(image, np.ndarray), "识别输入应为图片数组"
+        self.rec_calls.append(len(images))
+        return [[_recognize(image)] for image in images]
+
+
+class FakeRecognizerOCR(FakePaddleOCR2):
+    """带 text_recognizer 的 2.x 假引擎: 一组行图片整批识别"""
+
+    def text_recognizer(self, crops):
+        self.rec_calls.append(len(crops))
+        return [list(_recognize(crop)) for crop in crops], 0.01
+
+
+def _recognize(crop):
+    return (f"行{crop.shape[1]}x{crop.shape[0]}", 0.9)
+
+
+@pytest.fixture(params=[FakePaddleOCR2, FakeRecognizerOCR])
+def fake_engine(request, monkeypatch):
+    fake = request.param()
+    monkeypatch.setattr(ocr_openai_api.engine, 'get', lambda: fake)
+    return fake
+
+
+def test_recognize_crops_returns_one_result_per_crop(fake_engine):
+    crops = [np.zeros((20, 40 + i, 3), np.uint8) for i in range(3)]
+    results = ocr_openai_api.recognize_crops(crops)
+    assert results == [("行40x20", 0.9), ("行41x20", 0.9), ("行42x20", 0.9)]
+    # 有 text_recognizer 时整批识别，否则逐行调用 ocr
+    expected = [3] if isinstance(fake_engine, FakeRecognizerOCR) else [1, 1, 1]
+    assert fake_engine.rec_calls == expected
+
+
+def test_detect_text_sorts_boxes_top_to_bottom(fake_engine):
+    boxes = ocr_openai_api.detect_text(np.zeros((100, 200, 3), np.uint8))
+    assert [float(box[0][1]) for box in boxes] == [10.0, 60.0]
+
+
+def test_iter_recognized_lines_groups_crops(fake_engine, monkeypatch):
+    monkeypatch.setattr(ocr_openai_api, 'STREAM_LINE_GROUP', 4)
+    lines = list(ocr_openai_api.iter_recognized_lines(np.zeros((100, 200, 3), np.uint8)))
+    # 两个框的裁剪尺寸相同，识别文字相同，连续重复的行只产出一次
+    assert lines == ["行180x30"]
+    # 第一组只识别一行，其余行再按组识别
+    assert fake_engine.rec_calls == [1, 1]
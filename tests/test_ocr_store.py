@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from ocr_store import OcrStore, OcrStoreWriter
+
+
+def page(page_num, ocr_results, **extra):
+    return {'page_num': page_num, 'width': 595.0, 'height': 842.0, 'dpi': 200,
+            'ocr_results': ocr_results, **extra}
+
+
+BOX = [[10.0, 20.0], [110.0, 20.0], [110.0, 40.0], [10.0, 40.0]]
+PAGES = [
+    page(0, [{'box': BOX, 'text': "第一行", 'confidence': 0.5},
+             {'box': None, 'text': "文字层的行", 'confidence': 1.0},
+             {'box': BOX, 'text': "emoji 😀 and ascii", 'confidence': 0.25}]),
+    page(1, []),  # 空白页
+    page(2, [{'box': None, 'text': "没有坐标", 'confidence': 0.75}]),
+    page(3, [], error=True),
+]
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "doc.ocrs")
+    with OcrStoreWriter(path) as writer:
+        # 乱序写入
+        for result in reversed(PAGES):
+            writer.add(result)
+    return path
+
+
+def test_round_trip(store_path):
+    with OcrStore(store_path) as store:
+        assert len(store) == 4
+        assert store.page_nums == [0, 1, 2, 3]
+        pages = list(store.iter_pages())
+    for written, read in zip(PAGES, pages):
+        assert read['page_num'] == written['page_num']
+        assert (read['width'], read['height'], read['dpi']) == (595.0, 842.0, 200)
+        assert read.get('error', False) == written.get('error', False)
+        assert read['ocr_results'] == written['ocr_results']
+
+
+def test_lines_without_boxes_come_back_as_none(store_path):
+    with OcrStore(store_path) as store:
+        boxes = [item['box'] for item in store.page(0)['ocr_results']]
+        assert boxes == [BOX, None, BOX]
+        assert store.lines(2).boxes is None
+        assert [item['box'] for item in store.page(2)['ocr_results']] == [None]
+
+
+def test_blank_page(store_path):
+    with OcrStore(store_path) as store:
+        lines = store.lines(1)
+        assert len(lines) == 0
+        assert store.page(1)['ocr_results'] == []
+
+
+def test_random_access_and_missing_pages(store_path):
+    with OcrStore(store_path) as store:
+        lines = store.lines(0)
+        assert lines.texts[2] == "emoji 😀 and ascii"
+        assert lines.scores.tolist() == [0.5, 1.0, 0.25]
+        assert 4 not in store and -1 not in store
+        with pytest.raises(KeyError):
+            store.page(4)
+
+
+def test_last_write_wins_and_non_quad_boxes(tmp_path):
+    path = str(tmp_path / "doc.ocrs")
+    with OcrStoreWriter(path) as writer:
+        writer.add(page(5, [{'box': BOX, 'text': "旧", 'confidence': 0.1}]))
+        writer.add(page(5, [{'box': [[0, 0], [4, 1], [2, 6]], 'text': "新", 'confidence': 0.2}]))
+    with OcrStore(path) as store:
+        assert store.page_nums == [5]
+        assert 0 not in store
+        result = store.page(5)['ocr_results']
+        assert [item['text'] for item in result] == ["新"]
+        # 非四边形取外接矩形
+        assert result[0]['box'] == [[0.0, 0.0], [4.0, 0.0], [4.0, 6.0], [0.0, 6.0]]
+
+
+def test_unfinished_writer_leaves_no_file(tmp_path):
+    path = tmp_path / "doc.ocrs"
+    writer = OcrStoreWriter(str(path))
+    writer.add(PAGES[0])
+    assert not path.exists()
+    writer.close()
+    assert path.exists() and not (tmp_path / "doc.ocrs.tmp").exists()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not.ocrs"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        OcrStore(str(path))
+
+
+def test_failed_write_keeps_previous_file(store_path):
+    before = open(store_path, 'rb').read()
+    with pytest.raises(RuntimeError):
+        with OcrStoreWriter(store_path) as writer:
+            writer.add(page(0, [{'box': None, 'text': "一半", 'confidence': 0.5}]))
+            raise RuntimeError("处理中断")
+    assert open(store_path, 'rb').read() == before
+    assert not os.path.exists(store_path + ".tmp")
+    with OcrStore(store_path) as store:
+        assert len(store) == 4
+
+
+def test_abort_without_previous_file(tmp_path):
+    path = tmp_path / "doc.ocrs"
+    writer = OcrStoreWriter(str(path))
+    writer.add(PAGES[0])
+    writer.abort()
+    writer.close()  # 放弃后再关闭不做任何事
+    assert list(tmp_path.iterdir()) == []
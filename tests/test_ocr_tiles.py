@@ -0,0 +1,80 @@
+import numpy as np
+
+from ocr_normalize import OcrLines
+from ocr_tiles import merge_tile_lines, tile_grid
+
+# 两块水平相邻、重叠 200 像素的块: 左块 [0, 1000)，右块 [800, 1800)，页面 1800 x 500
+PAGE = (1800, 500)
+LEFT = (0, 0, 1000, 500)
+RIGHT = (800, 0, 1800, 500)
+
+
+def rect(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def tile_lines(tile, lines):
+    """lines 为 [(整页坐标矩形, 文字), ...]，换算为块内坐标的 OcrLines"""
+    x0, y0 = tile[:2]
+    boxes = np.array([rect(bx0 - x0, by0 - y0, bx1 - x0, by1 - y0)
+                      for (bx0, by0, bx1, by1), _ in lines], dtype=np.float32)
+    return OcrLines(boxes, np.full(len(lines), 0.9), [text for _, text in lines])
+
+
+def bounds(lines: OcrLines) -> list:
+    return [[float(v) for v in (*box.min(axis=0), *box.max(axis=0))] for box in lines.boxes]
+
+
+def test_tile_grid_covers_page_with_overlap():
+    tiles = tile_grid(3000, 1000, 1600, 200)
+    xs = sorted({(x0, x1) for x0, _, x1, _ in tiles})
+    assert xs[0][0] == 0 and xs[-1][1] == 3000
+    assert all(prev[1] - cur[0] >= 200 for prev, cur in zip(xs, xs[1:]))
+    assert all(y0 == 0 and y1 == 1000 for _, y0, _, y1 in tiles)
+
+
+def test_duplicate_in_overlap_is_kept_once():
+    left = tile_lines(LEFT, [((850, 100, 950, 130), "重复")])
+    right = tile_lines(RIGHT, [((850, 100, 950, 130), "重复")])
+    merged = merge_tile_lines([(left, LEFT), (right, RIGHT)], PAGE)
+    assert merged.texts == ["重复"]
+    assert bounds(merged) == [[850, 100, 950, 130]]
+
+
+def test_cut_box_loses_to_complete_box():
+    # 左块中这一行被块的右边缘截断，右块完整识别了整行
+    left = tile_lines(LEFT, [((880, 200, 1000, 230), "跨界甲")])
+    right = tile_lines(RIGHT, [((880, 200, 1100, 230), "跨界甲乙")])
+    merged = merge_tile_lines([(left, LEFT), (right, RIGHT)], PAGE)
+    assert merged.texts == ["跨界甲乙"]
+    assert bounds(merged) == [[880, 200, 1100, 230]]
+
+
+def test_line_split_across_seam_is_joined():
+    # 比重叠区还长的行被两块各截断一段，重叠区内的文字被识别了两次
+    left = tile_lines(LEFT, [((700, 300, 1000, 330), "长行前半部分重叠")])
+    right = tile_lines(RIGHT, [((800, 301, 1400, 331), "重叠部分后半")])
+    merged = merge_tile_lines([(left, LEFT), (right, RIGHT)], PAGE)
+    assert merged.texts == ["长行前半部分重叠部分后半"]
+    assert bounds(merged) == [[700, 300, 1400, 331]]
+    assert merged.scores.tolist() == [0.9]
+
+
+def test_reading_order_across_tiles():
+    # 右块中的行在上方，同一行内左块的框在左边
+    left = tile_lines(LEFT, [((100, 400, 300, 430), "第三行"), ((100, 50, 300, 80), "第一行左")])
+    right = tile_lines(RIGHT, [((1200, 52, 1500, 82), "第一行右"), ((1200, 220, 1500, 250), "第二行")])
+    merged = merge_tile_lines([(right, RIGHT), (left, LEFT)], PAGE)
+    assert merged.texts == ["第一行左", "第一行右", "第二行", "第三行"]
+
+
+def test_page_edges_are_not_cuts():
+    # 贴着页面边缘 (而非块边缘) 的框不算截断，不会被拼接或抑制
+    left = tile_lines(LEFT, [((0, 0, 200, 30), "左上角")])
+    right = tile_lines(RIGHT, [((1600, 470, 1800, 500), "右下角")])
+    merged = merge_tile_lines([(left, LEFT), (right, RIGHT)], PAGE)
+    assert merged.texts == ["左上角", "右下角"]
+
+
+def test_empty_tiles():
+    assert len(merge_tile_lines([(OcrLines.empty(), LEFT), (OcrLines.empty(), RIGHT)], PAGE)) == 0